@@ -1,24 +1,335 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
-import subprocess
+import atexit
 import threading
 import json
 import os
+import re
+import time
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from check_profiler import PROFILE_DIR, ProfileStore, request_profile
+from scheduler import FairScheduler
+from snapshot_table import snapshot_table
+from watch_jobs import JobReaper, WatchJob
+from watch_journal import JOURNAL_FILE, WatchJournal
+from watch_log import LEVELS, JobLog
+
 app = Flask(__name__)
 CORS(app)  # Flutter uygulamasından gelen isteklere izin ver
 
-# Global değişkenler
-watching_process = None
-watching_params = None
-last_status = {"watching": False, "ticket_found": False, "wagon_not_found": False, "message": ""}
+# İzleyici satırlarından yalnızca bu seviye ve üstü sunucu çıktısına da yazılır
+WATCHER_ECHO_LEVEL = os.getenv("WATCHER_ECHO_LEVEL", "WARNING").upper()
+STATUS_LOG_LINES = 20   # /api/status yanıtındaki son satırlar
+MAX_LOG_PAGE = 500
+DEFAULT_USER = 'default'         # user_id göndermeyen istemciler (tek kullanıcılı mobil uygulama)
+DEFAULT_INTERVAL = 1.5           # dakika
+MIN_INTERVAL = 0.5
+# Profil uçları için yönetici anahtarı (X-Admin-Token); boşsa uçlar açıktır
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# İzleyiciler bu betiğin dizininde çalışır; göreli PROFILE_DIR oraya göre çözülür
+PROFILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), PROFILE_DIR)
+CHECK_DURATION_PATTERN = re.compile(r'Kontrol #\d+ tamamlandı \(([\d.]+) sn\)')
+# Açılışta günlükten geri yüklenen izlemeler arasındaki bekleme; site aynı anda yüklenmez
+RESTART_STAGGER = float(os.getenv("RESTART_STAGGER", "2"))   # saniye
+# Arka plan işlerini (günlükten geri yükleme, reaper) başlatan sürecin pid dosyası;
+# flock ile tutulur, aynı dağıtımda ikinci bir süreç bu işleri başlatmaz
+PID_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_server.pid')
+
+# Kullanıcı başına izleme oturumu: job, params, log, status
+# Her kullanıcının tek izlemesi olur; yeni istek yalnızca o kullanıcının önceki izlemesini değiştirir
+sessions = {}
+sessions_lock = threading.RLock()
+scheduler = FairScheduler()
+# İzleme tanımları ve son durumları; yeniden başlatmada izlemeler geri yüklenir (bkz. watch_journal.py)
+journal = WatchJournal(os.path.join(os.path.dirname(os.path.abspath(__file__)), JOURNAL_FILE) if JOURNAL_FILE else '')
+shutting_down = False
+
+# Canlı işlerin kaynak kullanımını örnekler, yetim browser süreçlerini temizler (bkz. start_background)
+reaper = JobReaper(lambda: [session['job'] for session in list(sessions.values()) if session.get('job')])
+_background_lock = threading.Lock()
+_pid_file = None   # Süreç yaşadıkça açık tutulan kilitli pid dosyası
+
+
+@atexit.register
+def _stop_active_jobs():
+    """Sunucu kapanırken izleyicileri browser'larıyla birlikte kapat"""
+    global shutting_down
+    # Kapanışta durdurulan izlemeler günlükte canlı kalır; açılışta geri yüklenir
+    shutting_down = True
+    for session in list(sessions.values()):
+        job = session.get('job')
+        if job and job.running:
+            job.stop()
+    journal.close()
+
+
+def _request_user() -> str:
+    """İsteği yapan kullanıcı: JSON user_id, ?user_id= veya X-User-Id başlığı"""
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('user_id') or request.args.get('user_id') or request.headers.get('X-User-Id')
+    return str(user_id) if user_id else DEFAULT_USER
+
+
+def _empty_status(message: str = "") -> dict:
+    return {"watching": False, "ticket_found": False, "wagon_not_found": False, "message": message}
+
+
+def _queue_session(user_id: str, params: dict, decision):
+    """Kuyruğa alınan izlemenin oturum kaydı (kilit altında çağrılır)"""
+    sessions[user_id] = {'job': None, 'params': params, 'log': None, 'status': dict(
+        _empty_status(f"Sırada: {decision.position}. sıra (tahmini {decision.estimated_wait / 60:.0f} dk)"),
+        queued=True, params=params, queue_position=decision.position)}
+
+
+def _start_queued(started):
+    """Zamanlayıcının kuyruktan kabul ettiği izlemeleri başlat"""
+    for user_id, interval, params in started:
+        print(f"[INFO] Kuyruktaki izleme başlatılıyor: kullanıcı {user_id}, aralık {interval:g} dk")
+        _launch(user_id, params, interval)
+
+
+def _launch(user_id: str, params: dict, interval: float, restored: dict = None):
+    """
+    Kullanıcının izleyici sürecini başlat ve çıktısını izleyen thread'i aç
+
+    restored: Günlükten geri yüklenen son durum (kontrol sayısı kaldığı yerden sürer)
+    """
+    # Python scriptini çalıştır
+    python_path = r"C:\Users\weberkan\AppData\Local\Programs\Python\Python312\python.exe"
+    script_path = "tcdd_watcher.py"
+
+    cmd = [
+        python_path,
+        '-u',  # Unbuffered output
+        script_path,
+        '--from', params['from'],
+        '--to', params['to'],
+        '--date', params['date'],
+        '--wagon-type', params['wagon_type'],
+        '--passengers', str(params['passengers']),
+        '--watch',  # Sürekli izleme modu
+        '--warm',  # Arama sayfasını açık tut, aramayı yerinde tekrarla
+        '--interval', f"{interval:g}",  # Zamanlayıcının verdiği aralık (dakika)
+        # Burst bütçesi süreç başına; her iş ayrı süreç olduğundan burst'te de bu aralığın altına inilmez
+        '--min-interval', f"{interval:g}",
+        # read_output "Kontrol #", "BİLET BULUNDU" gibi INFO/SUCCESS satırlarını okur;
+        # LOG_LEVEL ortamdan WARNING gelse bile bu satırlar süzülmemeli
+        '--log-level', 'INFO'
+    ]
+    if params.get('max_price'):
+        cmd += ['--max-price', f"{params['max_price']:g}"]  # Fiyat tavanı (TL)
+
+    # UTF-8 encoding için environment variable
+    env = os.environ.copy()
+    env['PYTHONIOENCODING'] = 'utf-8'
+
+    # Arkaplan süreciyle başlat - PIPE kullanarak, kendi süreç grubunda
+    job = WatchJob(cmd, cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+
+    # İş başına sınırlı halka tampon (bkz. watch_log.py); /api/logs ile sayfalanır
+    logs = JobLog()
+    echo_threshold = LEVELS.get(WATCHER_ECHO_LEVEL, LEVELS['WARNING'])
+    status = {
+        "watching": True,
+        "ticket_found": False,
+        "wagon_not_found": False,
+        "message": f"İzleme başlatıldı: {params['from']} → {params['to']}",
+        "params": params,
+        "interval": interval,
+        "degraded": interval > params['requested_interval'],
+        "check_count": 0,
+        "last_check_time": "",
+        "logs": logs
+    }
+    if restored:
+        status.update(restored)
+        status["watching"] = True
+        status["message"] = f"İzleme geri yüklendi: {params['from']} → {params['to']}"
+    with sessions_lock:
+        sessions[user_id] = {'job': job, 'params': params, 'log': logs, 'status': status}
+
+    # Thread ile watcher process'ini izle
+    def read_output():
+        check_count = status["check_count"]
+
+        try:
+            print(f"[INFO] Watcher process başlatıldı (kullanıcı {user_id}), stdout okunuyor...")
+
+            # Stdout'u satır satır oku - readline ile
+            for line in iter(job.process.stdout.readline, ''):
+                line = line.strip()
+                if line:
+                    # Log tamponuna ekle (kopyalama yok, eski satırlar otomatik düşer)
+                    record = logs.append(line)
+                    if LEVELS[record.level] >= echo_threshold:
+                        print(f"[WATCHER:{user_id}] {line}")
+
+                    # Kontrol süresi kapasite modeline gider
+                    duration = CHECK_DURATION_PATTERN.search(line)
+                    if duration:
+                        scheduler.capacity.record_check(float(duration.group(1)))
+                        journal.state(user_id, status)
+
+                    # Kontrol sayısını ve zamanı takip et
+                    elif "Kontrol #" in line:
+                        check_count += 1
+                        if " - " in line:
+                            time_part = line.split(" - ")[-1].strip(" =")
+                            status["last_check_time"] = time_part
+                        status["check_count"] = check_count
+
+                    # Bilet bulundu kontrolü (Log üzerinden)
+                    if "BİLET BULUNDU" in line or "MÜSAİT durumunda" in line or "BİLET AÇILDI" in line:
+                        print(f"[INFO] Logdan tespit edildi: Bilet Bulundu! (kullanıcı {user_id})")
+                        status["ticket_found"] = True
+                        journal.state(user_id, status)
+
+                        # Detaylı vagon bilgisi parse et
+                        if "BİLET BULUNDU" in line and "(" in line and ")" in line:
+                            try:
+                                start = line.find("(") + 1
+                                end = line.find(")")
+                                wagons_str = line[start:end]
+                                status["message"] = f"Bilet Bulundu! ({wagons_str})"
+                            except:
+                                status["message"] = f"Bilet Bulundu! ({params['wagon_type']})"
+                        elif params['wagon_type'] != 'ALL':
+                            status["message"] = f"Bilet Bulundu! ({params['wagon_type']})"
+                        else:
+                            status["message"] = "Bilet Bulundu! (Detaylar logda)"
+
+                    # Vagon bulunamadı kontrolü (Log üzerinden) - Sadece watcher uyarısı ile
+                    if "Vagon tipi mevcut değil" in line or "State'e vagon bulunamadı durumu kaydedildi" in line:
+                        if params['wagon_type'] != 'ALL':
+                            status["wagon_not_found"] = True
+
+            job.finish()
+            print(f"[INFO] Watcher process tamamlandı! Kaynak kullanımı: {job.usage()}")
+            status["watching"] = False
+
+            # Process bittikten sonra state dosyasını oku ve sonucu işle
+            print(f"[INFO] State dosyası okunuyor...")
+            try:
+                import json
+                import time
+                time.sleep(1)  # State dosyasının yazılmasını bekle
+                state_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state.json')
+                if os.path.exists(state_file):
+                    with open(state_file, 'r', encoding='utf-8') as f:
+                        state_data = json.load(f)
+
+                        # state_key formatı: FROM_TO_DATE_WAGONTYPE_Np
+                        # Watcher orijinal haliyle (upper olmadan) kaydediyor olabilir, o yüzden önce direkt dene
+                        state_key = f"{params['from']}_{params['to']}_{params['date']}_{params['wagon_type']}_{params['passengers']}p"
+
+                        print(f"[DEBUG] read_output - Aranan key (orijinal): {state_key}")
+
+                        # Önce direkt eşleşme dene
+                        wagon_state = None
+                        if state_key in state_data:
+                            wagon_state = state_data[state_key]
+                            print(f"[DEBUG] read_output - Direkt eşleşme bulundu: {state_key}")
+                        else:
+                            # Bulunamazsa normalizasyon ile dene (eski kayıtlar için)
+                            # Türkçe karakter normalizasyonu
+                            def normalize_turkish(s):
+                                replacements = {
+                                    'ı': 'I', 'İ': 'I', 'i': 'I',
+                                    'ğ': 'G', 'Ğ': 'G',
+                                    'ü': 'U', 'Ü': 'U',
+                                    'ş': 'S', 'Ş': 'S',
+                                    'ö': 'O', 'Ö': 'O',
+                                    'ç': 'C', 'Ç': 'C'
+                                }
+                                result = s.upper()
+                                for old, new in replacements.items():
+                                    result = result.replace(old, new)
+                                return result
+
+                            # Normalize edilmiş state key oluştur
+                            from_normalized = normalize_turkish(params['from'])
+                            to_normalized = normalize_turkish(params['to'])
+                            search_key = f"{from_normalized}_{to_normalized}_{params['date']}_{params['wagon_type']}_{params['passengers']}p"
+
+                            print(f"[DEBUG] read_output - Aranan key (normalize): {search_key}")
+
+                            # Fuzzy match ile state'den bul
+                            for key in state_data.keys():
+                                normalized_key = normalize_turkish(key)
+                                if normalized_key == search_key:
+                                    wagon_state = state_data[key]
+                                    print(f"[DEBUG] read_output - Fuzzy match bulundu: {key}")
+                                    break
+
+                        if wagon_state:
+                            print(f"[DEBUG] State data: {wagon_state}")
+                            # Önce wagon_not_found flag'ini kontrol et
+                            if wagon_state.get('wagon_not_found') == True:
+                                print(f"[INFO] ✅ State'de wagon_not_found=True - {params['wagon_type']} vagonu bu hatta yok!")
+                                status["wagon_not_found"] = True
+                                wagon_display = params['wagon_type'] if params['wagon_type'] != 'ALL' else 'İstenen'
+                                status["message"] = f"Bu güzergahta {wagon_display} koltuk bulunmamaktadır."
+                            # Eğer status DOLU ve price None ise, vagon bulunamadı demektir
+                            elif wagon_state.get('status') == 'DOLU' and wagon_state.get('price') is None:
+                                print(f"[INFO] ✅ State'e göre {params['wagon_type']} vagonu bu hatta yok!")
+                                status["wagon_not_found"] = True
+                                wagon_display = params['wagon_type'] if params['wagon_type'] != 'ALL' else 'İstenen'
+                                status["message"] = f"Bu güzergahta {wagon_display} koltuk bulunmamaktadır."
+                            else:
+                                print(f"[INFO] Vagon mevcut: status={wagon_state.get('status')}, price={wagon_state.get('price')}")
+                        else:
+                            # State'de key bulunamadı = vagon yok (ANCAK ALL değilse)
+                            if params['wagon_type'] != 'ALL':
+                                print(f"[INFO] ✅ State'de eşleşen key bulunamadı - vagon bu güzergahta mevcut değil!")
+                                status["wagon_not_found"] = True
+                                wagon_display = params['wagon_type']
+                                status["message"] = f"Bu güzergahta {wagon_display} koltuk bulunmamaktadır."
+                            else:
+                                print(f"[INFO] State'de ALL key'i yok ama normal, tek tek vagonlar kontrol ediliyor.")
+            except Exception as e:
+                print(f"[WARNING] State dosyası okunamadı: {e}")
+                import traceback
+                traceback.print_exc()
+
+            # wagon_not_found zaten set edilmişse, mesajı ASLA değiştirme
+            if not status.get("wagon_not_found"):
+                # Sadece vagon bulundu AMA bilet bulunamadıysa genel mesaj göster
+                if not status.get("ticket_found") and not status.get("message"):
+                    status["message"] = "İzleme tamamlandı."
+                    print(f"[INFO] İzleme bitti. {params['wagon_type']} için bilet kontrolü tamamlandı.")
+
+        except Exception as e:
+            print(f"[ERROR] Output okuma hatası: {e}")
+            status["watching"] = False
+        finally:
+            # Boşalan kapasite kuyruktaki isteklere verilir
+            with sessions_lock:
+                started = scheduler.release(user_id, params)
+                # Kendiliğinden biten izleme açılışta yeniden başlatılmaz
+                # (yerine yenisi başlatıldıysa veya sunucu kapanıyorsa günlüğe dokunulmaz)
+                if not shutting_down and sessions.get(user_id, {}).get('job') is job:
+                    journal.stop(user_id)
+            _start_queued(started)
+
+    threading.Thread(target=read_output, daemon=True).start()
+    return job
+
 
 @app.route('/api/watch', methods=['POST'])
 def start_watching():
-    """İzlemeyi başlat"""
-    global watching_process, watching_params, last_status
-    
+    """
+    İzlemeyi başlat
+
+    İstek adil paylaşımlı zamanlayıcıdan geçer (bkz. scheduler.py): kapasite
+    varsa hemen (gerekirse daha uzun aralıkla) başlatılır, yoksa kuyruğa
+    alınır (202), kuyruk da doluysa 429 döner.
+    """
     try:
         data = request.json
         from_station = data.get('from')
@@ -26,227 +337,85 @@ def start_watching():
         date = data.get('date')
         wagon_type = data.get('wagon_type', 'ALL')
         passengers = data.get('passengers', 1)
+        user_id = _request_user()
+        try:
+            interval = max(float(data.get('interval', DEFAULT_INTERVAL)), MIN_INTERVAL)
+        except (TypeError, ValueError):
+            interval = DEFAULT_INTERVAL
         
         if not all([from_station, to_station, date]):
             return jsonify({
                 'status': 'error',
                 'message': 'Eksik parametreler'
             }), 400
+
+        # İsteğe bağlı fiyat tavanı (TL); üstündeki açılışlar bildirilmez
+        max_price = data.get('max_price')
+        if max_price not in (None, ''):
+            try:
+                max_price = float(max_price)
+                if max_price <= 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Geçersiz fiyat tavanı'
+                }), 400
+        else:
+            max_price = None
         
-        # Önceki izleme varsa durdur
-        if watching_process and watching_process.poll() is None:
-            watching_process.terminate()
+        # Kullanıcının önceki izlemesi varsa durdur (browser kapanana kadar beklenir)
+        with sessions_lock:
+            previous = sessions.pop(user_id, None)
+        if previous and previous.get('job') and previous['job'].running:
+            previous['job'].stop()
         
         # Yeni izlemeyi başlat
-        watching_params = {
+        params = {
             'from': from_station,
             'to': to_station,
             'date': date,
             'wagon_type': wagon_type,
-            'passengers': passengers
-        }
-        
-        # Python scriptini çalıştır
-        python_path = r"C:\Users\weberkan\AppData\Local\Programs\Python\Python312\python.exe"
-        script_path = "tcdd_watcher.py"
-        
-        cmd = [
-            python_path,
-            '-u',  # Unbuffered output
-            script_path,
-            '--from', from_station,
-            '--to', to_station,
-            '--date', date,
-            '--wagon-type', wagon_type,
-            '--passengers', str(passengers),
-            '--watch',  # Sürekli izleme modu
-            '--interval', '1.5'  # 1.5 dakika (90 saniye) - artık float destekli
-        ]
-        
-        # UTF-8 encoding için environment variable
-        env = os.environ.copy()
-        env['PYTHONIOENCODING'] = 'utf-8'
-        
-        # Arkaplan süreciyle başlat - PIPE kullanarak
-        watching_process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            encoding='utf-8',
-            errors='replace',
-            bufsize=1,  # Line buffered
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-            env=env
-        )
-        
-        # Thread ile watcher process'ini izle
-        def read_output():
-            global last_status
-            check_count = 0
-            logs = []
-            
-            try:
-                print(f"[INFO] Watcher process başlatıldı, stdout okunuyor...")
-                
-                # Stdout'u satır satır oku - readline ile
-                for line in iter(watching_process.stdout.readline, ''):
-                    line = line.strip()
-                    if line:
-                        print(f"[WATCHER] {line}")
-                        # Log listesine ekle
-                        logs.append(line)
-                        if len(logs) > 20:
-                            logs.pop(0)
-                        last_status["logs"] = logs.copy()
-                        
-                        # Kontrol sayısını ve zamanı takip et
-                        if "Kontrol #" in line:
-                            check_count += 1
-                            if " - " in line:
-                                time_part = line.split(" - ")[-1].strip()
-                                last_status["last_check_time"] = time_part
-                            last_status["check_count"] = check_count
-                            
-                        # Bilet bulundu kontrolü (Log üzerinden)
-                        if "BİLET BULUNDU" in line or "MÜSAİT durumunda" in line or "BİLET AÇILDI" in line:
-                            print(f"[INFO] Logdan tespit edildi: Bilet Bulundu!")
-                            last_status["ticket_found"] = True
-                            
-                            # Detaylı vagon bilgisi parse et
-                            if "BİLET BULUNDU" in line and "(" in line and ")" in line:
-                                try:
-                                    start = line.find("(") + 1
-                                    end = line.find(")")
-                                    wagons_str = line[start:end]
-                                    last_status["message"] = f"Bilet Bulundu! ({wagons_str})"
-                                except:
-                                    last_status["message"] = f"Bilet Bulundu! ({watching_params['wagon_type']})"
-                            elif watching_params['wagon_type'] != 'ALL':
-                                last_status["message"] = f"Bilet Bulundu! ({watching_params['wagon_type']})"
-                            else:
-                                last_status["message"] = "Bilet Bulundu! (Detaylar logda)"
-                            
-                        # Vagon bulunamadı kontrolü (Log üzerinden) - Sadece watcher uyarısı ile
-                        if "Vagon tipi mevcut değil" in line or "State'e vagon bulunamadı durumu kaydedildi" in line:
-                            if watching_params['wagon_type'] != 'ALL':
-                                last_status["wagon_not_found"] = True
-                
-                print(f"[INFO] Watcher process tamamlandı!")
-                last_status["watching"] = False
-                
-                # Process bittikten sonra state dosyasını oku ve sonucu işle
-                print(f"[INFO] State dosyası okunuyor...")
-                try:
-                    import json
-                    import time
-                    time.sleep(1)  # State dosyasının yazılmasını bekle
-                    state_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state.json')
-                    if os.path.exists(state_file):
-                        with open(state_file, 'r', encoding='utf-8') as f:
-                            state_data = json.load(f)
-                            
-                            # state_key formatı: FROM_TO_DATE_WAGONTYPE_Np
-                            # Watcher orijinal haliyle (upper olmadan) kaydediyor olabilir, o yüzden önce direkt dene
-                            state_key = f"{watching_params['from']}_{watching_params['to']}_{watching_params['date']}_{watching_params['wagon_type']}_{watching_params['passengers']}p"
-                            
-                            print(f"[DEBUG] read_output - Aranan key (orijinal): {state_key}")
-                            
-                            # Önce direkt eşleşme dene
-                            wagon_state = None
-                            if state_key in state_data:
-                                wagon_state = state_data[state_key]
-                                print(f"[DEBUG] read_output - Direkt eşleşme bulundu: {state_key}")
-                            else:
-                                # Bulunamazsa normalizasyon ile dene (eski kayıtlar için)
-                                # Türkçe karakter normalizasyonu
-                                def normalize_turkish(s):
-                                    replacements = {
-                                        'ı': 'I', 'İ': 'I', 'i': 'I',
-                                        'ğ': 'G', 'Ğ': 'G',
-                                        'ü': 'U', 'Ü': 'U',
-                                        'ş': 'S', 'Ş': 'S',
-                                        'ö': 'O', 'Ö': 'O',
-                                        'ç': 'C', 'Ç': 'C'
-                                    }
-                                    result = s.upper()
-                                    for old, new in replacements.items():
-                                        result = result.replace(old, new)
-                                    return result
-                                
-                                # Normalize edilmiş state key oluştur
-                                from_normalized = normalize_turkish(watching_params['from'])
-                                to_normalized = normalize_turkish(watching_params['to'])
-                                search_key = f"{from_normalized}_{to_normalized}_{watching_params['date']}_{watching_params['wagon_type']}_{watching_params['passengers']}p"
-                                
-                                print(f"[DEBUG] read_output - Aranan key (normalize): {search_key}")
-                                
-                                # Fuzzy match ile state'den bul
-                                for key in state_data.keys():
-                                    normalized_key = normalize_turkish(key)
-                                    if normalized_key == search_key:
-                                        wagon_state = state_data[key]
-                                        print(f"[DEBUG] read_output - Fuzzy match bulundu: {key}")
-                                        break
-                            
-                            if wagon_state:
-                                print(f"[DEBUG] State data: {wagon_state}")
-                                # Önce wagon_not_found flag'ini kontrol et
-                                if wagon_state.get('wagon_not_found') == True:
-                                    print(f"[INFO] ✅ State'de wagon_not_found=True - {watching_params['wagon_type']} vagonu bu hatta yok!")
-                                    last_status["wagon_not_found"] = True
-                                    wagon_display = watching_params['wagon_type'] if watching_params['wagon_type'] != 'ALL' else 'İstenen'
-                                    last_status["message"] = f"Bu güzergahta {wagon_display} koltuk bulunmamaktadır."
-                                # Eğer status DOLU ve price None ise, vagon bulunamadı demektir
-                                elif wagon_state.get('status') == 'DOLU' and wagon_state.get('price') is None:
-                                    print(f"[INFO] ✅ State'e göre {watching_params['wagon_type']} vagonu bu hatta yok!")
-                                    last_status["wagon_not_found"] = True
-                                    wagon_display = watching_params['wagon_type'] if watching_params['wagon_type'] != 'ALL' else 'İstenen'
-                                    last_status["message"] = f"Bu güzergahta {wagon_display} koltuk bulunmamaktadır."
-                                else:
-                                    print(f"[INFO] Vagon mevcut: status={wagon_state.get('status')}, price={wagon_state.get('price')}")
-                            else:
-                                # State'de key bulunamadı = vagon yok (ANCAK ALL değilse)
-                                if watching_params['wagon_type'] != 'ALL':
-                                    print(f"[INFO] ✅ State'de eşleşen key bulunamadı - vagon bu güzergahta mevcut değil!")
-                                    last_status["wagon_not_found"] = True
-                                    wagon_display = watching_params['wagon_type']
-                                    last_status["message"] = f"Bu güzergahta {wagon_display} koltuk bulunmamaktadır."
-                                else:
-                                    print(f"[INFO] State'de ALL key'i yok ama normal, tek tek vagonlar kontrol ediliyor.")
-                except Exception as e:
-                    print(f"[WARNING] State dosyası okunamadı: {e}")
-                    import traceback
-                    traceback.print_exc()
-                
-                # wagon_not_found zaten set edilmişse, mesajı ASLA değiştirme
-                if not last_status.get("wagon_not_found"):
-                    # Sadece vagon bulundu AMA bilet bulunamadıysa genel mesaj göster
-                    if not last_status.get("ticket_found") and not last_status.get("message"):
-                        last_status["message"] = "İzleme tamamlandı."
-                        print(f"[INFO] İzleme bitti. {wagon_type} için bilet kontrolü tamamlandı.")
-                    
-            except Exception as e:
-                print(f"[ERROR] Output okuma hatası: {e}")
-                last_status["watching"] = False
-        
-        threading.Thread(target=read_output, daemon=True).start()
-        
-        last_status = {
-            "watching": True,
-            "ticket_found": False,
-            "wagon_not_found": False,
-            "message": f"İzleme başlatıldı: {from_station} → {to_station}",
-            "params": watching_params,
-            "check_count": 0,
-            "last_check_time": "",
-            "logs": []
+            'passengers': passengers,
+            'max_price': max_price,
+            'requested_interval': interval
         }
-        
+
+        with sessions_lock:
+            decision = scheduler.admit(user_id, interval, params)
+            if decision.outcome == 'queued':
+                _queue_session(user_id, params, decision)
+
+        if decision.outcome == 'rejected':
+            journal.stop(user_id)
+            response = jsonify({
+                'status': 'error',
+                'message': 'Sunucu kapasitesi dolu, lütfen daha sonra tekrar deneyin',
+                'estimated_wait_seconds': round(decision.estimated_wait)
+            })
+            response.headers['Retry-After'] = str(round(decision.estimated_wait))
+            return response, 429
+
+        journal.start(user_id, params, interval)
+        if decision.outcome == 'queued':
+            return jsonify({
+                'status': 'queued',
+                'message': 'İzleme kuyruğa alındı',
+                'params': params,
+                'queue_position': decision.position,
+                'estimated_wait_seconds': round(decision.estimated_wait)
+            }), 202
+
+        _launch(user_id, params, decision.interval)
+        message = 'İzleme başlatıldı'
+        if decision.degraded:
+            message += f" (yoğunluk nedeniyle {decision.interval:g} dakikada bir)"
         return jsonify({
             'status': 'success',
-            'message': 'İzleme başlatıldı',
-            'params': watching_params
+            'message': message,
+            'params': params,
+            'interval': decision.interval,
+            'degraded': decision.degraded
         })
         
     except Exception as e:
@@ -258,23 +427,31 @@ def start_watching():
 @app.route('/api/watch', methods=['DELETE'])
 def stop_watching():
     """İzlemeyi durdur"""
-    global watching_process, last_status
-    
     try:
-        if watching_process and watching_process.poll() is None:
-            watching_process.terminate()
-            watching_process = None
+        user_id = _request_user()
+        with sessions_lock:
+            session = sessions.pop(user_id, None)
+            scheduler.cancel(user_id)
+        journal.stop(user_id)
+
+        resources = None
+        job = session.get('job') if session else None
+        if job:
+            # İşbirlikçi iptal; süre aşılırsa süreç ağacı öldürülür
+            job.stop()
+            resources = job.usage()
+            with sessions_lock:
+                started = scheduler.release(user_id, session['params'])
+            _start_queued(started)
         
-        last_status = {
-            "watching": False,
-            "ticket_found": False,
-            "wagon_not_found": False,
-            "message": "İzleme durduruldu"
-        }
+        with sessions_lock:
+            sessions[user_id] = {'job': None, 'params': None, 'log': session.get('log') if session else None,
+                                 'status': _empty_status("İzleme durduruldu")}
         
         return jsonify({
             'status': 'success',
-            'message': 'İzleme durduruldu'
+            'message': 'İzleme durduruldu',
+            'resources': resources
         })
     except Exception as e:
         return jsonify({
@@ -284,18 +461,29 @@ def stop_watching():
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    """Mevcut durumu döndür"""
-    global last_status, watching_process, watching_params
+    """Kullanıcının mevcut durumunu döndür"""
+    user_id = _request_user()
+    with sessions_lock:
+        session = sessions.get(user_id)
+        if session is None:
+            session = sessions[user_id] = {'job': None, 'params': None, 'log': None, 'status': _empty_status()}
+        if session['status'].get('queued'):
+            position = scheduler.position(user_id)
+            if position is not None:
+                session['status']['queue_position'] = position
+    status = session['status']
+    params = session['params']
+    job = session['job']
     
     # Process hala çalışıyor mu kontrol et
-    if watching_process:
-        is_running = watching_process.poll() is None
-        last_status["watching"] = is_running
+    if job:
+        is_running = job.running
+        status["watching"] = is_running
         
         # Process bitti ve henüz wagon_not_found/ticket_found set edilmediyse
         # State dosyasını doğrudan kontrol et (race condition fix)
-        if not is_running and watching_params:
-            if not last_status.get("wagon_not_found") and not last_status.get("ticket_found"):
+        if not is_running and params:
+            if not status.get("wagon_not_found") and not status.get("ticket_found"):
                 try:
                     state_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state.json')
                     if os.path.exists(state_file):
@@ -303,7 +491,7 @@ def get_status():
                             state_data = json.load(f)
                             
                             # Önce direkt eşleşme dene (upper olmadan)
-                            state_key = f"{watching_params['from']}_{watching_params['to']}_{watching_params['date']}_{watching_params['wagon_type']}_{watching_params['passengers']}p"
+                            state_key = f"{params['from']}_{params['to']}_{params['date']}_{params['wagon_type']}_{params['passengers']}p"
                             wagon_state = None
                             
                             if state_key in state_data:
@@ -326,9 +514,9 @@ def get_status():
                                     return result
                             
                                 # Normalize edilmiş state key oluştur
-                                from_normalized = normalize_turkish(watching_params['from'])
-                                to_normalized = normalize_turkish(watching_params['to'])
-                                search_key = f"{from_normalized}_{to_normalized}_{watching_params['date']}_{watching_params['wagon_type']}_{watching_params['passengers']}p"
+                                from_normalized = normalize_turkish(params['from'])
+                                to_normalized = normalize_turkish(params['to'])
+                                search_key = f"{from_normalized}_{to_normalized}_{params['date']}_{params['wagon_type']}_{params['passengers']}p"
                                 
                                 print(f"[DEBUG] Aranan key (normalize): {search_key}")
                                 
@@ -344,13 +532,13 @@ def get_status():
                                 print(f"[DEBUG] State data: {wagon_state}")
                                 # wagon_not_found flag'ini kontrol et
                                 if wagon_state.get('wagon_not_found') == True:
-                                    last_status["wagon_not_found"] = True
-                                    wagon_display = watching_params['wagon_type'] if watching_params['wagon_type'] != 'ALL' else 'İstenen'
-                                    last_status["message"] = f"Bu güzergahta {wagon_display} koltuk bulunmamaktadır."
+                                    status["wagon_not_found"] = True
+                                    wagon_display = params['wagon_type'] if params['wagon_type'] != 'ALL' else 'İstenen'
+                                    status["message"] = f"Bu güzergahta {wagon_display} koltuk bulunmamaktadır."
                                 elif wagon_state.get('status') == 'DOLU' and wagon_state.get('price') is None:
-                                    last_status["wagon_not_found"] = True
-                                    wagon_display = watching_params['wagon_type'] if watching_params['wagon_type'] != 'ALL' else 'İstenen'
-                                    last_status["message"] = f"Bu güzergahta {wagon_display} koltuk bulunmamaktadır."
+                                    status["wagon_not_found"] = True
+                                    wagon_display = params['wagon_type'] if params['wagon_type'] != 'ALL' else 'İstenen'
+                                    status["message"] = f"Bu güzergahta {wagon_display} koltuk bulunmamaktadır."
                             else:
                                 print(f"[WARNING] State'de eşleşen key bulunamadı!")
                 except Exception as e:
@@ -359,11 +547,144 @@ def get_status():
                     traceback.print_exc()
                 
                 # Hala wagon_not_found yoksa varsayılan mesaj
-                if not last_status.get("wagon_not_found") and not last_status.get("ticket_found"):
-                    if not last_status.get("message") or "başlatıldı" in last_status.get("message", ""):
-                        last_status["message"] = "İzleme tamamlandı"
+                if not status.get("wagon_not_found") and not status.get("ticket_found"):
+                    if not status.get("message") or "başlatıldı" in status.get("message", ""):
+                        status["message"] = "İzleme tamamlandı"
     
-    return jsonify(last_status)
+    # Log halka tamponu yalnızca yanıt oluşturulurken listeye çevrilir
+    response = dict(status)
+    if "logs" in response:
+        response["logs"] = response["logs"].tail(STATUS_LOG_LINES)
+    if job:
+        response["resources"] = job.usage()
+    # Hattın son durumu; aynı hattı izleyen başka bir süreç daha yeni sonuç getirmiş olabilir
+    table = snapshot_table()
+    if table is not None and params:
+        snapshot = table.get(params['from'], params['to'], params['date'])
+        if snapshot is not None:
+            response["snapshot"] = snapshot.to_dict()
+    response["scheduler"] = scheduler.status()
+    return jsonify(response)
+
+@app.route('/api/snapshots', methods=['GET'])
+def get_snapshots():
+    """
+    Paylaşımlı tablodaki hat durumları (bkz. snapshot_table.py)
+
+    Query: from, to, date (üçü birlikte verilirse tek hat), max_age (saniye)
+    """
+    table = snapshot_table()
+    if table is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Anlık görüntü tablosu kapalı'
+        }), 503
+    max_age = request.args.get('max_age', type=float)
+    from_station, to_station, date = (request.args.get(name) for name in ('from', 'to', 'date'))
+    if from_station and to_station and date:
+        snapshot = table.get(from_station, to_station, date, max_age=max_age)
+        if snapshot is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Bu hat için anlık görüntü yok'
+            }), 404
+        return jsonify(snapshot.to_dict())
+    snapshots = sorted(table.snapshots(max_age), key=lambda snapshot: snapshot.updated_at, reverse=True)
+    return jsonify({'snapshots': [snapshot.to_dict() for snapshot in snapshots], 'slots': table.slots})
+
+@app.route('/api/logs', methods=['GET'])
+def get_logs():
+    """
+    Kullanıcının izleyici loglarını sayfalı döndür
+
+    Query: after (bu sıra numarasından sonrası; verilmezse en son sayfa),
+    limit (varsayılan 100, en fazla 500), level (en düşük seviye).
+    Yeni satırları takip etmek için yanıttaki next_after bir sonraki
+    istekte after olarak gönderilir.
+    """
+    try:
+        after = request.args.get('after', type=int)
+        limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_LOG_PAGE)
+        level = request.args.get('level', 'DEBUG')
+        if level.upper() not in LEVELS:
+            return jsonify({
+                'status': 'error',
+                'message': f"Geçersiz seviye: {level}"
+            }), 400
+
+        session = sessions.get(_request_user()) or {}
+        logs = session.get('log')
+        if logs is None:
+            page = {'records': [], 'next_after': after or 0, 'first_seq': 1, 'last_seq': 0, 'dropped': 0}
+        else:
+            page = logs.page(after, limit, level)
+        job = session.get('job')
+        page['watching'] = bool(job and job.running)
+        return jsonify(page)
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/api/scheduler', methods=['GET'])
+def get_scheduler():
+    """Kapasite, kuyruk derinliği ve tahmini bekleme süresi"""
+    with sessions_lock:
+        return jsonify(scheduler.status())
+
+def _admin_denied():
+    """ADMIN_TOKEN ayarlıysa ve başlık eşleşmiyorsa 403 yanıtı"""
+    if ADMIN_TOKEN and request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'status': 'error', 'message': 'Yetkisiz'}), 403
+    return None
+
+@app.route('/api/profile', methods=['POST'])
+def start_profile():
+    """
+    Kullanıcının çalışan izlemesinin sonraki N kontrolünü profille
+
+    Body: {"checks": 3, "screenshots": false}. İzleyici isteği bir sonraki
+    kontrolden önce alır; çıktılar /api/profiles altında listelenir.
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    session = sessions.get(_request_user()) or {}
+    job = session.get('job')
+    if not job or not job.running:
+        return jsonify({'status': 'error', 'message': 'Çalışan izleme yok'}), 404
+    try:
+        checks = request_profile(job.pid, data.get('checks', 1), bool(data.get('screenshots', False)),
+                                 PROFILES_PATH)
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Geçersiz kontrol sayısı'}), 400
+    return jsonify({
+        'status': 'success',
+        'message': f"Sonraki {checks} kontrol profillenecek",
+        'checks': checks
+    })
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """Kayıtlı kontrol profilleri (en yeniden eskiye)"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    return jsonify({'profiles': ProfileStore(PROFILES_PATH).list()})
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    """Profil arşivini indir (.zip: steps.json, profile.txt/.pstats, trace-N.zip)"""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    path = ProfileStore(PROFILES_PATH).path(profile_id)
+    if path is None:
+        return jsonify({'status': 'error', 'message': 'Profil bulunamadı'}), 404
+    return send_file(path, mimetype='application/zip', as_attachment=True,
+                     download_name=os.path.basename(path))
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -373,6 +694,84 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
+def _recover_watches():
+    """
+    Günlükteki izlemeleri geri yükle
+
+    Oturumlar hemen (son gözlenen durumlarıyla) görünür olur; izleyiciler
+    RESTART_STAGGER arayla, en eski başlatılan önce ve zamanlayıcıdan
+    geçerek başlatılır. Böylece yeniden başlatma siteye ani yük bindirmez.
+    """
+    entries = journal.replay()
+    if not entries:
+        return
+    print(f"[INFO] Günlükten {len(entries)} izleme geri yükleniyor ({RESTART_STAGGER:g} sn arayla)")
+    with sessions_lock:
+        for entry in entries:
+            status = dict(_empty_status("İzleme geri yükleniyor"), **entry['status'])
+            status.update(watching=True, restoring=True, params=entry['params'])
+            sessions[entry['user']] = {'job': None, 'params': entry['params'], 'log': None, 'status': status}
+
+    def relaunch():
+        for index, entry in enumerate(entries):
+            if index:
+                time.sleep(RESTART_STAGGER)
+            user_id, params = entry['user'], entry['params']
+            with sessions_lock:
+                session = sessions.get(user_id)
+                # Bu arada kullanıcı izlemeyi durdurduysa veya yenisini başlattıysa dokunma
+                if session is None or session['params'] is not params:
+                    continue
+                decision = scheduler.admit(user_id, entry['interval'], params)
+                if decision.outcome == 'queued':
+                    _queue_session(user_id, params, decision)
+                elif decision.outcome == 'rejected':
+                    sessions[user_id] = {'job': None, 'params': None, 'log': None,
+                                         'status': _empty_status("Sunucu kapasitesi dolu, izleme geri yüklenemedi")}
+            if decision.outcome == 'admitted':
+                _launch(user_id, params, decision.interval, restored=entry['status'])
+            elif decision.outcome == 'rejected':
+                print(f"[WARNING] Kapasite dolu, izleme geri yüklenemedi: kullanıcı {user_id}")
+                journal.stop(user_id)
+
+    threading.Thread(target=relaunch, daemon=True).start()
+
+
+def start_background() -> bool:
+    """
+    Arka plan işlerini başlat: reaper thread'i ve günlükten geri yükleme
+
+    İçe aktarmada değil, sunucu başlarken açıkça çağrılır (`python api_server.py`
+    veya gunicorn.conf.py'deki post_worker_init). Süreç içinde tekrar
+    çağrılırsa etkisizdir. PID_FILE başka bir canlı süreçte kilitliyse izlemeler
+    iki kez başlatılmasın diye hiçbir şey yapmaz ve False döner.
+    """
+    global _pid_file
+    with _background_lock:
+        if _pid_file is not None:
+            return True
+        pid_file = open(PID_FILE, 'a+')
+        if fcntl is not None:
+            try:
+                fcntl.flock(pid_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                pid_file.seek(0)
+                owner = pid_file.read().strip() or '?'
+                pid_file.close()
+                print(f"[WARNING] Arka plan işleri başka bir süreçte çalışıyor (pid {owner}); "
+                      f"günlük geri yüklenmedi")
+                return False
+        pid_file.seek(0)
+        pid_file.truncate()
+        pid_file.write(f"{os.getpid()}\n")
+        pid_file.flush()
+        _pid_file = pid_file
+
+    reaper.start()
+    _recover_watches()
+    return True
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("TCDD Backend API Server")
@@ -382,7 +781,13 @@ if __name__ == '__main__':
     print("  POST   /api/watch   - İzleme başlat")
     print("  DELETE /api/watch   - İzlemeyi durdur")
     print("  GET    /api/status  - Durum sorgula")
+    print("  GET    /api/logs    - İzleyici logları (sayfalı)")
+    print("  GET    /api/scheduler - Kapasite ve kuyruk durumu")
+    print("  GET    /api/snapshots - Süreçler arası hat durumları")
+    print("  POST   /api/profile - Sonraki kontrolleri profille")
+    print("  GET    /api/profiles - Kontrol profilleri (indirme: /api/profiles/<id>)")
     print("  GET    /api/health  - Sağlık kontrolü")
     print("=" * 60)
-    
+
+    start_background()
     app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
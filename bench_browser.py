@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Chromium başlatma profili ölçümü
+
+Bir konteynere sığan eşzamanlı izleme sayısını browser başına bellek
+belirler. Bu script her başlatma seçeneğini (tcdd_watcher.LAUNCH_OPTIONS)
+tek başına ve "minimal" profilini "default" ile karşılaştırır:
+
+    1. Browser başlatılır, --pages kadar context + sayfa açılıp içerik yüklenir
+    2. Tüm sayfalar açıkken browser süreç ağacının toplam RSS ve PSS değeri
+       (/proc üzerinden) ölçülür
+    3. Başlatma + yükleme boyunca harcanan CPU süresi (utime + stime) raporlanır
+
+Varsayılan olarak sayfalar siteye gitmeden, capture_store.py'deki en yeni
+yakalama ile (yoksa küçük bir örnek sayfa ile) doldurulur; --url ile gerçek
+site ölçülebilir. Yalnızca Linux'ta çalışır.
+
+KULLANIM:
+    python bench_browser.py --pages 4 --runs 3
+    python bench_browser.py --url https://ebilet.tcddtasimacilik.gov.tr --profiles default,minimal
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+os.environ.setdefault("HISTORY_ENABLED", "0")
+
+from tcdd_watcher import LAUNCH_OPTIONS, launch_options
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+FALLBACK_HTML = '<!DOCTYPE html><html><body>' + '<div class="col-md-12"><button>EKONOMİ</button><span class="price">850,00 TL</span></div>' * 50 + '</body></html>'
+
+
+def _read_stat(pid: int):
+    """(ppid, cpu saniye, rss bayt) - /proc/<pid>/stat"""
+    with open(f'/proc/{pid}/stat', 'rb') as f:
+        stat = f.read().decode('utf-8', 'replace')
+    fields = stat[stat.rfind(')') + 2:].split()
+    return int(fields[1]), (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, int(fields[21]) * PAGE_SIZE
+
+
+def _read_pss(pid: int) -> int:
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _find_root(marker: str) -> int:
+    """Başlatma argümanlarında marker olan Chromium ana süreci"""
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                if marker.encode() in f.read():
+                    return int(entry)
+        except OSError:
+            continue
+    raise RuntimeError("Chromium süreci bulunamadı")
+
+
+def _tree_usage(root: int):
+    """Süreç ağacının toplam (cpu saniye, rss, pss, süreç sayısı) değeri"""
+    stats = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                stats[int(entry)] = _read_stat(int(entry))
+            except OSError:
+                continue
+    children = {}
+    for pid, (ppid, _, _) in stats.items():
+        children.setdefault(ppid, []).append(pid)
+
+    cpu = rss = pss = count = 0
+    pending = [root]
+    while pending:
+        pid = pending.pop()
+        if pid not in stats:
+            continue
+        _, pid_cpu, pid_rss = stats[pid]
+        cpu += pid_cpu
+        rss += pid_rss
+        pss += _read_pss(pid)
+        count += 1
+        pending.extend(children.get(pid, ()))
+    return cpu, rss, pss, count
+
+
+def _load_html() -> str:
+    try:
+        from capture_store import CAPTURE_DIR, CaptureStore
+        if os.path.isdir(CAPTURE_DIR):
+            records = list(CaptureStore(CAPTURE_DIR))
+            if records:
+                return records[-1]['html']
+    except Exception:
+        pass
+    return FALLBACK_HTML
+
+
+async def measure(playwright, profile: str, pages: int, url: str, html: str):
+    options = launch_options(profile)
+    marker = f'--tcdd-bench={uuid.uuid4().hex}'  # Chromium bilinmeyen anahtarları yok sayar
+    options['args'].append(marker)
+
+    started = time.perf_counter()
+    browser = await playwright.chromium.launch(**options)
+    try:
+        root = _find_root(marker)
+        contexts = []
+        for _ in range(pages):
+            context = await browser.new_context()
+            page = await context.new_page()
+            if url:
+                await page.goto(url, wait_until='domcontentloaded')
+            else:
+                await context.route('**/*', lambda route: route.abort())
+                await page.set_content(html, wait_until='domcontentloaded')
+            contexts.append(context)
+        await asyncio.sleep(1)  # Arka plan işlerinin oturması için
+        cpu, rss, pss, count = _tree_usage(root)
+        elapsed = time.perf_counter() - started
+    finally:
+        await browser.close()
+    return {'rss': rss, 'pss': pss, 'cpu': cpu, 'wall': elapsed, 'processes': count}
+
+
+async def run(profiles, pages: int, runs: int, url: str):
+    from playwright.async_api import async_playwright
+
+    html = None if url else _load_html()
+    results = {}
+    async with async_playwright() as p:
+        for profile in profiles:
+            samples = [await measure(p, profile, pages, url, html) for _ in range(runs)]
+            results[profile] = {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TCDD İzleyici Chromium başlatma profili ölçümü')
+    parser.add_argument('--profiles', default=None,
+                        help='Virgülle ayrılmış profiller (varsayılan: default, her seçenek tek başına, minimal)')
+    parser.add_argument('--pages', type=int, default=4, help='Browser başına açık sayfa (varsayılan: 4)')
+    parser.add_argument('--runs', type=int, default=3, help='Profil başına çalıştırma sayısı')
+    parser.add_argument('--url', default=None, help='Çevrimdışı içerik yerine bu adresi yükle')
+    args = parser.parse_args()
+
+    if not sys.platform.startswith('linux'):
+        print("[ERROR] Süreç ölçümü /proc gerektirir (yalnızca Linux)")
+        sys.exit(2)
+
+    profiles = args.profiles.split(',') if args.profiles else ['default', *LAUNCH_OPTIONS, 'minimal']
+    results = asyncio.run(run(profiles, args.pages, args.runs, args.url))
+
+    baseline = results.get('default')
+    print(f"{'Profil':<20} {'RSS (MB)':>10} {'PSS (MB)':>10} {'CPU (s)':>8} {'Süre (s)':>9} {'Süreç':>6} {'PSS farkı':>10}")
+    for profile, r in results.items():
+        delta = f"{(r['pss'] - baseline['pss']) / baseline['pss'] * 100:+.1f}%" if baseline and baseline['pss'] else '-'
+        print(f"{profile:<20} {r['rss'] / 1048576:>10.1f} {r['pss'] / 1048576:>10.1f} {r['cpu']:>8.2f} "
+              f"{r['wall']:>9.2f} {r['processes']:>6.0f} {delta:>10}")
+
+
+if __name__ == "__main__":
+    main()
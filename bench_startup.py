@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Başlangıç süresi ölçümü
+
+Cron modunda (README: */3 * * * *) her çalıştırmada yorumlayıcı başlatma ve
+modül yükleme maliyeti yeniden ödenir. Bu script:
+
+    1. Boş yorumlayıcı başlatma süresini
+    2. tcdd_watcher modülünün içe aktarma süresini
+    3. Karşılaştırma için Playwright + firebase_admin'in doğrudan içe
+       aktarılma süresini (eski, eager import davranışı)
+
+her biri için N çalıştırmanın medyanı olarak raporlar ve -X importtime
+çıktısından en pahalı modülleri listeler. `import tcdd_watcher` sonrasında
+LAZY_MODULES'tan biri yüklenmişse çıkış kodu 1'dir (CI'da gerileme kontrolü).
+
+KULLANIM:
+    python bench_startup.py --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = (
+    ('yorumlayıcı', 'pass'),
+    ('import tcdd_watcher', 'import tcdd_watcher'),
+    ('eager playwright+firebase', 'import playwright.async_api, firebase_admin.messaging'),
+)
+
+# İlk kullanımlarına kadar içe aktarılmaması gereken ağır modüller
+LAZY_MODULES = ('numpy', 'playwright', 'firebase_admin')
+
+
+def _run(code: str, env: dict) -> float:
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', code], cwd=HERE, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.decode('utf-8', 'replace').strip().splitlines()[-1])
+    return elapsed
+
+
+def _top_imports(code: str, env: dict, top: int):
+    """-X importtime çıktısından kümülatif süreye göre en pahalı modüller"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=HERE, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    rows = []
+    for line in proc.stderr.decode('utf-8', 'replace').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # Biçim: "import time: <self us> | <cumulative us> | <modül>"
+        _, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def eager_modules(env: dict) -> list:
+    """`import tcdd_watcher` sonrasında yüklenmiş olan LAZY_MODULES"""
+    code = ('import sys, tcdd_watcher; '
+            f'print("eager:" + ",".join(m for m in {LAZY_MODULES!r} if m in sys.modules))')
+    proc = subprocess.run([sys.executable, '-c', code], cwd=HERE, env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.decode('utf-8', 'replace').strip().splitlines()[-1])
+    # Modülün kendi uyarıları da stdout'a yazıldığı için işaretli satır okunur
+    line = next(l for l in proc.stdout.decode('utf-8').splitlines() if l.startswith('eager:'))
+    return [m for m in line[len('eager:'):].split(',') if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TCDD İzleyici başlangıç süresi ölçümü')
+    parser.add_argument('--runs', type=int, default=10, help='Senaryo başına çalıştırma sayısı')
+    parser.add_argument('--top', type=int, default=10, help='Listelenecek en pahalı modül sayısı')
+    args = parser.parse_args()
+
+    env = os.environ.copy()
+    env['HISTORY_ENABLED'] = '0'
+
+    print(f"{'Senaryo':<28} {'medyan (ms)':>12} {'min (ms)':>10}")
+    for name, code in SCENARIOS:
+        try:
+            samples = [_run(code, env) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:<28} {'atlandı':>12}  ({e})")
+            continue
+        print(f"{name:<28} {statistics.median(samples) * 1000:>12.1f} {min(samples) * 1000:>10.1f}")
+
+    print(f"\nimport tcdd_watcher - en pahalı {args.top} modül (kümülatif):")
+    for cumulative_us, name in _top_imports('import tcdd_watcher', env, args.top):
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
+
+    eager = eager_modules(env)
+    if eager:
+        print(f"\n[ERROR] import tcdd_watcher şu modülleri erkenden yüklüyor: {', '.join(eager)}")
+        sys.exit(1)
+    print(f"\n[INFO] Tembel modüller yüklenmedi: {', '.join(LAZY_MODULES)}")
+
+
+if __name__ == "__main__":
+    main()
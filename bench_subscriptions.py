@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Abonelik modeli bellek karşılaştırması
+
+Eski temsil (metin state anahtarı + parametre dict'i) ile çalışma
+zamanının kullandığı kompakt temsil (Subscription NamedTuple) için N
+abonelik başına tracemalloc ile ölçülen bellek kullanımını raporlar. Durum
+kayıtları her iki modelde de state.json dict'leri olduğundan ölçülmez.
+
+KULLANIM:
+    python bench_subscriptions.py --count 100000
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+from datetime import date, timedelta
+
+from subscriptions import SAMPLE_STATIONS, Subscription, WAGON_NAMES
+
+
+def _workload(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    start = date(2026, 1, 1)
+    for _ in range(count):
+        from_station, to_station = rng.sample(SAMPLE_STATIONS, 2)
+        travel_date = (start + timedelta(days=rng.randrange(90))).isoformat()
+        # İstek gövdesinden gelmiş gibi her seferinde yeni metin nesneleri
+        yield ("".join(from_station), "".join(to_station), travel_date,
+               rng.choice(WAGON_NAMES[:4]), rng.randint(1, 4))
+
+
+def build_legacy(count: int):
+    """api_server/watcher'daki dict + metin anahtar temsili"""
+    subscriptions = {}
+    for from_station, to_station, travel_date, wagon, passengers in _workload(count):
+        params = {'from': from_station, 'to': to_station, 'date': travel_date,
+                  'wagon_type': wagon, 'passengers': passengers}
+        subscriptions[f"{from_station}_{to_station}_{travel_date}_{wagon}_{passengers}p"] = params
+    return subscriptions
+
+
+def build_compact(count: int):
+    """subscriptions.py temsili"""
+    return [Subscription.create(from_station, to_station, travel_date, wagon, passengers)
+            for from_station, to_station, travel_date, wagon, passengers in _workload(count)]
+
+
+def measure(builder, count: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    data = builder(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Abonelik modeli bellek karşılaştırması')
+    parser.add_argument('--count', type=int, default=100_000, help='Abonelik sayısı (varsayılan: 100000)')
+    args = parser.parse_args()
+
+    print(f"{'Model':<10} {'Toplam (MB)':>12} {'Abonelik başına (B)':>20}")
+    results = {}
+    for name, builder in (('legacy', build_legacy), ('compact', build_compact)):
+        total = measure(builder, args.count)
+        results[name] = total
+        print(f"{name:<10} {total / 1024 / 1024:>12.1f} {total / args.count:>20.0f}")
+    print(f"\nKazanç: x{results['legacy'] / results['compact']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+TCDD İzleyici - Browser Durumu ve Statik Dosya Önbelleği
+
+Her kontrol storage_state'siz ve önbelleksiz yeni bir context açtığı için
+sitenin JS/CSS paketleri, fontları ve çerez onayı (consent) durumu her
+seferinde yeniden indirilip işleniyordu. İki isteğe bağlı katman:
+
+STORAGE_STATE_FILE:
+    Başarılı bir kontrolden sonra context'in localStorage'ı (ör. çerez onayı)
+    dosyaya alınır; her yeni context bununla başlar. Çerezler alınmaz: site
+    oturumu session_pool.SessionJar'ın işidir ve oturumu yenileyen context'in
+    eski çerezlerle başlamaması gerekir. STORAGE_STATE_MAX_AGE saniyeden eski
+    anlık görüntü yenilenir. Context'ler yine birbirinden izoledir; yalnızca
+    başlangıç durumu ortaktır.
+
+ASSET_CACHE=1:
+    Script, stil, font ve görsel istekleri context.route ile yakalanır ve
+    süreçler arasında paylaşılan disk önbelleğinden (ASSET_CACHE_DIR)
+    karşılanır. Önbellek ASSET_CACHE_MAX_BYTES'ı aşınca en eski girdiler
+    silinir; ASSET_CACHE_MAX_AGE'den eski veya no-store işaretli yanıtlar
+    kullanılmaz. Site yeni sürüm yayınladığında (sayfanın yüklediği script ve
+    stil adresleri değiştiğinde) önbellek tamamen temizlenir.
+"""
+
+import hashlib
+import json
+import os
+import re
+import struct
+import time
+from typing import Dict, Optional, Tuple
+
+
+# Konfigürasyon
+STORAGE_STATE_FILE = os.getenv("STORAGE_STATE_FILE", "")                 # boş = kapalı
+STORAGE_STATE_MAX_AGE = float(os.getenv("STORAGE_STATE_MAX_AGE", "86400"))
+ASSET_CACHE_ENABLED = os.getenv("ASSET_CACHE", "0") == "1"
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", "asset_cache")
+ASSET_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+ASSET_CACHE_MAX_AGE = float(os.getenv("ASSET_CACHE_MAX_AGE", "86400"))
+
+# Yalnızca statik dosya istekleri route'a düşer; belge ve XHR istekleri dokunulmadan geçer
+ASSET_URL_PATTERN = re.compile(r'\.(js|mjs|css|woff2?|ttf|otf|eot|png|jpe?g|gif|svg|ico|webp)(\?.*)?$', re.IGNORECASE)
+# Gövde çözülmüş olarak saklandığı için aktarım başlıkları tutulmaz
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'set-cookie'}
+
+# Sitenin sürümü: sayfanın yüklediği script ve stil adresleri
+BUILD_FINGERPRINT_JS = '''() => [...document.querySelectorAll('script[src], link[rel="stylesheet"][href]')]
+    .map(el => el.src || el.href).sort().join('\\n')'''
+
+ENTRY_SUFFIX = '.asset'
+ENTRY_HEADER = struct.Struct('<dHI')   # kayıt zamanı, HTTP durum kodu, meta uzunluğu
+BUILD_FILE = 'BUILD'
+
+
+class AssetCache:
+    """Süreçler arasında paylaşılan, boyut sınırlı statik dosya önbelleği"""
+
+    def __init__(self, directory: str = ASSET_CACHE_DIR, max_bytes: int = ASSET_CACHE_MAX_BYTES,
+                 max_age: float = ASSET_CACHE_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+        self._total = sum(size for _, _, size in self._files())
+        self._build: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _files(self):
+        """(mtime, yol, boyut) listesi, en eskiden yeniye"""
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # Başka bir süreç sildi
+                continue
+            files.append((stat.st_mtime, path, stat.st_size))
+        return sorted(files)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + ENTRY_SUFFIX)
+
+    def get(self, url: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """
+        (durum kodu, başlıklar, gövde) veya None
+
+        Kesik veya bozuk girdide struct.error / ValueError fırlatır.
+        """
+        try:
+            with open(self._path(url), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        stored_at, status, meta_length = ENTRY_HEADER.unpack_from(data)
+        if time.time() - stored_at > self.max_age:
+            return None
+        offset = ENTRY_HEADER.size
+        if offset + meta_length > len(data):
+            raise ValueError(f"Kesik önbellek girdisi ({len(data)} bayt)")
+        headers = json.loads(data[offset:offset + meta_length].decode('utf-8'))
+        if not isinstance(headers, dict):
+            raise ValueError("Önbellek girdisinin başlıkları okunamadı")
+        return status, headers, data[offset + meta_length:]
+
+    def discard(self, url: str):
+        """Girdiyi sil (yoksa bir şey yapmaz)"""
+        path = self._path(url)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        self._total = max(self._total - size, 0)
+
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        headers = {k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS}
+        meta = json.dumps(headers).encode('utf-8')
+        data = ENTRY_HEADER.pack(time.time(), status, len(meta)) + meta + body
+
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self._total += len(data)
+        if self._total > self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        """Toplam boyut sınırın altına inene kadar en eski girdileri sil"""
+        files = self._files()
+        total = sum(size for _, _, size in files)
+        for _, path, size in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total = total
+
+    def clear(self):
+        for _, path, _ in self._files():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._total = 0
+
+    def check_build(self, fingerprint: str) -> bool:
+        """
+        Sitenin sürümünü kaydet; değiştiyse önbelleği temizle
+
+        Returns:
+            bool: Önbellek geçersiz kılındı mı?
+        """
+        if not fingerprint or fingerprint == self._build:
+            return False
+        digest = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+        build_path = os.path.join(self.directory, BUILD_FILE)
+        try:
+            with open(build_path, 'r') as f:
+                previous = f.read().strip()
+        except FileNotFoundError:
+            previous = None
+
+        invalidated = previous is not None and previous != digest
+        if invalidated:
+            print(f"[INFO] Site sürümü değişti, statik dosya önbelleği temizleniyor ({len(self._files())} girdi)")
+            self.clear()
+        if previous != digest:
+            tmp_path = f"{build_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(digest)
+            os.replace(tmp_path, build_path)
+        self._build = fingerprint
+        return invalidated
+
+    @staticmethod
+    def _cacheable(headers: Dict[str, str]) -> bool:
+        cache_control = headers.get('cache-control', '').lower()
+        return 'no-store' not in cache_control and 'private' not in cache_control
+
+    async def _handle(self, route):
+        request = route.request
+        if request.method != 'GET':
+            await route.continue_()
+            return
+
+        try:
+            entry = self.get(request.url)
+        except (struct.error, ValueError) as e:
+            # Bozuk girdi silinir; istek bu sefer önbelleksiz ağdan gider
+            print(f"[WARNING] Bozuk önbellek girdisi silindi ({request.url}): {e}")
+            self.discard(request.url)
+            await route.continue_()
+            return
+        if entry is not None:
+            self.hits += 1
+            status, headers, body = entry
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        self.misses += 1
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            await route.continue_()
+            return
+        if response.status == 200 and self._cacheable(response.headers):
+            try:
+                self.put(request.url, response.status, response.headers, body)
+            except OSError as e:
+                print(f"[WARNING] Statik dosya önbelleğe yazılamadı: {e}")
+        await route.fulfill(response=response, body=body)
+
+    async def attach(self, context):
+        """Context'in statik dosya isteklerini önbellekten karşıla"""
+        await context.route(ASSET_URL_PATTERN, self._handle)
+
+
+_asset_cache: Optional[AssetCache] = None
+
+
+def asset_cache() -> Optional[AssetCache]:
+    """Süreç genelindeki önbellek (ASSET_CACHE=1 değilse None)"""
+    global _asset_cache
+    if ASSET_CACHE_ENABLED and _asset_cache is None:
+        _asset_cache = AssetCache()
+    return _asset_cache
+
+
+_storage_state: Optional[Dict] = None
+_storage_state_mtime = 0.0
+
+
+def _origins_only(state: Dict) -> Dict:
+    """storage_state'in çerezsiz hâli (yalnızca origin/localStorage)"""
+    return {'cookies': [], 'origins': state.get('origins', [])}
+
+
+def load_storage_state() -> Optional[Dict]:
+    """Kayıtlı storage_state, çerezsiz (kapalıysa, yoksa veya eskiyse None)"""
+    global _storage_state, _storage_state_mtime
+    if not STORAGE_STATE_FILE:
+        return None
+    try:
+        mtime = os.path.getmtime(STORAGE_STATE_FILE)
+    except OSError:
+        return None
+    if time.time() - mtime > STORAGE_STATE_MAX_AGE:
+        return None
+    if mtime != _storage_state_mtime:
+        # Dosya değiştiyse (ör. başka bir süreç yeniledi) yeniden okunur
+        try:
+            with open(STORAGE_STATE_FILE, 'r', encoding='utf-8') as f:
+                # Eski sürümlerin yazdığı dosyalardaki çerezler de atılır
+                _storage_state = _origins_only(json.load(f))
+            _storage_state_mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] storage_state okunamadı: {e}")
+            return None
+    return _storage_state
+
+
+async def observe_page(page):
+    """
+    Başarılı bir kontrolden sonra çağrılır: gerekirse storage_state anlık
+    görüntüsünü al ve sitenin sürümünü önbellekle karşılaştır
+    """
+    global _storage_state, _storage_state_mtime
+    if STORAGE_STATE_FILE and load_storage_state() is None:
+        state = _origins_only(await page.context.storage_state())
+        tmp_path = f"{STORAGE_STATE_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, STORAGE_STATE_FILE)
+        _storage_state, _storage_state_mtime = state, os.path.getmtime(STORAGE_STATE_FILE)
+        print(f"[INFO] storage_state kaydedildi: {STORAGE_STATE_FILE} ({len(state['origins'])} origin)")
+
+    cache = asset_cache()
+    if cache is not None:
+        cache.check_build(await page.evaluate(BUILD_FINGERPRINT_JS))
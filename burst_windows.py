@@ -0,0 +1,209 @@
+"""
+TCDD İzleyici - Burst Pencereleri (Takvimli Ön Isıtma ve Sık Kontrol)
+
+TCDD yeni tarihlerin satışını ve iade edilen yataklı koltukları tahmin
+edilebilir saatlerde açıyor; sabit aralıklı izleme döngüsü bu anları
+göremiyordu. Bu modül takvimden okunan "burst pencereleri" tanımlar:
+
+    ÖN ISITMA   Pencere başlamadan `prewarm` dakika önce izleyici uyanır,
+                browser'ı açar ve arama sayfasını (istasyonlar seçili)
+                hazırlar; ilk kontrol sıcak oturumla yapılır.
+    BURST       Pencere boyunca kontrol aralığı pencerenin `interval`
+                değerine indirilir. Aynı anda burst'te olan hat sayısı
+                BURST_RATE_BUDGET'ı (dakikadaki kontrol) aşarsa aralık
+                bütçeye göre uzatılır; BURST_MIN_INTERVAL'ın altına inmez.
+                Bütçe süreç başınadır: api_server'ın her izleyicisi ayrı
+                süreç olduğundan orada aralık ayrıca zamanlayıcının verdiği
+                aralıkla (--min-interval) sınırlanır.
+    SONRA       Pencere bitince normal aralığa dönülür, ek browser kapatılır.
+
+BURST_WINDOWS_FILE (JSON veya YAML) örneği:
+
+    {"windows": [
+        {"name": "Yeni tarih satışı", "at": "00:00", "duration": 20,
+         "interval": 0.25, "prewarm": 5, "date_offset": 30},
+        {"name": "Cuma iadeleri", "at": "18:00", "weekdays": [4], "duration": 15,
+         "interval": 0.5, "routes": [{"from": "Ankara Gar", "to": "İzmir (Basmane)"}]}
+    ]}
+
+`at` "SS:DD" ise her gün (weekdays verilmişse yalnızca o günler, 0 =
+Pazartesi), "YYYY-AA-GG SS:DD" ise tek seferliktir. `routes` verilmezse
+pencere tüm hatlara uygulanır; `date_offset` verilirse yalnızca pencerenin
+başladığı günden o kadar gün sonraki sefer tarihleri etkilenir. Saatler
+sunucunun yerel saatidir.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+# Konfigürasyon
+BURST_WINDOWS_FILE = os.getenv("BURST_WINDOWS_FILE", "")                  # boş = kapalı
+BURST_PREWARM_MINUTES = float(os.getenv("BURST_PREWARM_MINUTES", "3"))
+BURST_RATE_BUDGET = float(os.getenv("BURST_RATE_BUDGET", "12"))           # dakikadaki kontrol
+BURST_MIN_INTERVAL = float(os.getenv("BURST_MIN_INTERVAL", "0.25"))       # dakika
+
+Route = Tuple[str, str, str]   # (from, to, date)
+
+
+def _normalize(name: str) -> str:
+    """Türkçe karakter duyarlı küçük harf (İ → i, I → ı)"""
+    return name.strip().replace('İ', 'i').replace('I', 'ı').lower()
+
+
+class BurstWindow(NamedTuple):
+    """Takvimdeki tek pencere tanımı"""
+    name: str
+    at: str
+    duration: float                          # dakika
+    interval: float                          # burst sırasındaki kontrol aralığı (dakika)
+    prewarm: float = BURST_PREWARM_MINUTES   # dakika
+    weekdays: Optional[Tuple[int, ...]] = None
+    routes: Tuple[Tuple[str, str, Optional[str]], ...] = ()
+    date_offset: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'BurstWindow':
+        for field in ('at', 'duration', 'interval'):
+            if data.get(field) in (None, ''):
+                raise ValueError(f"Burst penceresinde eksik alan: {field}")
+        at = str(data['at']).strip()
+        datetime.strptime(at, '%Y-%m-%d %H:%M' if ' ' in at else '%H:%M')   # biçim kontrolü
+        weekdays = data.get('weekdays')
+        return cls(
+            name=data.get('name') or at,
+            at=at,
+            duration=float(data['duration']),
+            interval=float(data['interval']),
+            prewarm=float(data.get('prewarm', BURST_PREWARM_MINUTES)),
+            weekdays=tuple(int(day) for day in weekdays) if weekdays else None,
+            routes=tuple((_normalize(r['from']), _normalize(r['to']), r.get('date'))
+                         for r in data.get('routes', [])),
+            date_offset=int(data['date_offset']) if data.get('date_offset') is not None else None
+        )
+
+    def starts(self, around: datetime) -> List[datetime]:
+        """Verilen anın bir gün öncesi ile bir gün sonrası arasındaki başlangıçlar"""
+        if ' ' in self.at:
+            return [datetime.strptime(self.at, '%Y-%m-%d %H:%M')]
+        clock = datetime.strptime(self.at, '%H:%M').time()
+        starts = []
+        for offset in (-1, 0, 1):
+            day = (around + timedelta(days=offset)).date()
+            if self.weekdays is None or day.weekday() in self.weekdays:
+                starts.append(datetime.combine(day, clock))
+        return starts
+
+    def applies_to(self, route: Route, start: datetime) -> bool:
+        from_station, to_station, date = route
+        if self.date_offset is not None:
+            if date != (start + timedelta(days=self.date_offset)).strftime('%Y-%m-%d'):
+                return False
+        if not self.routes:
+            return True
+        for r_from, r_to, r_date in self.routes:
+            if r_from == _normalize(from_station) and r_to == _normalize(to_station) \
+                    and (r_date is None or r_date == date):
+                return True
+        return False
+
+
+class BurstPhase(NamedTuple):
+    """Bir pencerenin belirli bir günkü gerçekleşmesi"""
+    window: BurstWindow
+    prewarm_at: datetime
+    start: datetime
+    end: datetime
+
+    def bursting(self, now: datetime) -> bool:
+        return self.start <= now < self.end
+
+
+class BurstCalendar:
+    """Hatların burst pencerelerini ve burst sırasındaki aralıkları hesaplar"""
+
+    def __init__(self, windows: List[BurstWindow], rate_budget: float = BURST_RATE_BUDGET,
+                 min_interval: float = BURST_MIN_INTERVAL):
+        self.windows = windows
+        self.rate_budget = max(rate_budget, 0.01)
+        self.min_interval = min_interval
+
+    def _phases(self, route: Route, now: datetime) -> List[BurstPhase]:
+        phases = []
+        for window in self.windows:
+            for start in window.starts(now):
+                if window.applies_to(route, start):
+                    phases.append(BurstPhase(window, start - timedelta(minutes=window.prewarm), start,
+                                             start + timedelta(minutes=window.duration)))
+        return sorted(phases, key=lambda phase: phase.prewarm_at)
+
+    def phase(self, route: Route, now: Optional[datetime] = None) -> Optional[BurstPhase]:
+        """Hat şu an ön ısıtmada veya burst'te mi? (en erken biten pencere)"""
+        now = now or datetime.now()
+        current = [phase for phase in self._phases(route, now) if phase.prewarm_at <= now < phase.end]
+        return min(current, key=lambda phase: phase.end) if current else None
+
+    def upcoming(self, route: Route, now: Optional[datetime] = None) -> Optional[BurstPhase]:
+        """Hattın bir sonraki penceresi (ön ısıtması henüz başlamamış)"""
+        now = now or datetime.now()
+        for phase in self._phases(route, now):
+            if phase.prewarm_at > now:
+                return phase
+        return None
+
+    def interval(self, route: Route, base: float, now: Optional[datetime] = None, load: int = 1,
+                 floor: Optional[float] = None) -> float:
+        """
+        Hattın şu anki kontrol aralığı (dakika)
+
+        Args:
+            base: Normal aralık
+            load: Aynı süreçte şu an burst'te olan hat sayısı (bütçe bunlara bölünür)
+            floor: Burst'te bile inilmeyecek aralık (ör. zamanlayıcının verdiği aralık)
+        """
+        now = now or datetime.now()
+        phase = self.phase(route, now)
+        if phase is None or not phase.bursting(now):
+            return base
+        budgeted = max(phase.window.interval, max(load, 1) / self.rate_budget, self.min_interval, floor or 0.0)
+        return min(base, budgeted)
+
+    def wait_seconds(self, route: Route, base: float, now: Optional[datetime] = None, load: int = 1,
+                     floor: Optional[float] = None) -> float:
+        """
+        Bir sonraki kontrole kadar beklenecek süre
+
+        Normal aralık, yaklaşan ön ısıtma veya pencere başlangıcı geçilmeyecek
+        şekilde kısaltılır; böylece ilk burst kontrolü tam başlangıçta yapılır.
+        """
+        now = now or datetime.now()
+        wait = self.interval(route, base, now, load, floor) * 60
+        phase = self.phase(route, now)
+        if phase is not None and now < phase.start:
+            wait = min(wait, (phase.start - now).total_seconds())
+        upcoming = self.upcoming(route, now)
+        if upcoming is not None:
+            wait = min(wait, (upcoming.prewarm_at - now).total_seconds())
+        return max(wait, 0.0)
+
+
+def load_burst_calendar(path: str = BURST_WINDOWS_FILE) -> Optional[BurstCalendar]:
+    """BURST_WINDOWS_FILE'ı oku (ayarlı değilse veya okunamazsa None)"""
+    if not path:
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.lower().endswith(('.yaml', '.yml')):
+                import yaml
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+        items = data.get('windows', []) if isinstance(data, dict) else (data or [])
+        windows = [BurstWindow.from_dict(item) for item in items]
+    except Exception as e:
+        print(f"[WARNING] Burst takvimi okunamadı ({path}): {e}")
+        return None
+    print(f"[INFO] Burst takvimi yüklendi: {len(windows)} pencere")
+    return BurstCalendar(windows)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+TCDD İzleyici - Arama Sonucu Yakalama Deposu
+
+_search_trips sonuç beklerken zaman aşımına uğradığında veya
+_check_all_wagon_availability hiç vagon bulamadığında yalnızca bir uyarı
+basılıyordu ve sayfanın o anki hali kayboluyordu. Bu modül sonuç sayfasının
+DOM'unu (script etiketleri çıkarılmış olarak) gzip ile sıkıştırıp kontrol
+ID'si ile yerel bir dizine kaydeder.
+
+DEPOLAMA DÜZENİ (CAPTURE_DIR):
+    20260120T101500-1234-0001.json.gz   Tek yakalama: meta veri + html
+
+    Dizinin toplam boyutu CAPTURE_MAX_BYTES'ı aşınca en eski yakalamalar
+    silinir (rotasyon).
+
+YAKALAMA MODU (CAPTURE_MODE):
+    off      Kapalı (varsayılan)
+    errors   Yalnızca zaman aşımı ve boş sonuçlar
+    all      Her yeni (değişmiş) sonuç sayfası
+
+Kaydedilen yakalamalar reparse_captures.py ile siteye gitmeden ayrıştırıcıdan
+tekrar geçirilebilir.
+
+KULLANIM:
+    python capture_store.py --reason empty
+    python capture_store.py --show 20260120T101500-1234-0001 > sayfa.html
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+
+# Konfigürasyon
+CAPTURE_MODE = os.getenv("CAPTURE_MODE", "off")
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "captures")
+CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+CAPTURE_MODES = ('off', 'errors', 'all')
+CAPTURE_SUFFIX = '.json.gz'
+
+# Sayfanın o anki DOM'u; script etiketleri çevrimdışı tekrar oynatmada
+# sitenin uygulama kodunun sayfayı değiştirmemesi için çıkarılır
+SNAPSHOT_JS = '''() => {
+    const root = document.documentElement.cloneNode(true);
+    root.querySelectorAll('script').forEach(el => el.remove());
+    return '<!DOCTYPE html>' + root.outerHTML;
+}'''
+
+_sequence = itertools.count(1)
+
+
+def new_check_id() -> str:
+    """Zamana göre sıralanabilir, süreçler arasında çakışmayan kontrol ID'si"""
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(_sequence):04d}"
+
+
+class CaptureStore:
+    """Boyut sınırlı, dönen (rotating) yakalama deposu"""
+
+    def __init__(self, directory: str = CAPTURE_DIR, max_bytes: int = CAPTURE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._total = sum(size for _, _, size in self._files())
+
+    def _files(self) -> List[tuple]:
+        """(mtime, yol, boyut) listesi, en eskiden yeniye"""
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(CAPTURE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # Başka bir süreç rotasyonda sildi
+                continue
+            files.append((stat.st_mtime, path, stat.st_size))
+        return sorted(files)
+
+    def _path(self, check_id: str) -> str:
+        return os.path.join(self.directory, check_id + CAPTURE_SUFFIX)
+
+    def save(self, check_id: str, html: str, meta: Dict) -> str:
+        """
+        Yakalamayı kaydet ve gerekirse en eski yakalamaları sil
+
+        Args:
+            check_id: Kontrol ID'si (dosya adı)
+            html: Sonuç sayfasının DOM'u
+            meta: Hat, tarih, yakalama nedeni, o anki ayrıştırma sonucu vb.
+
+        Returns:
+            str: Yazılan dosyanın yolu
+        """
+        record = dict(meta, check_id=check_id, html=html)
+        data = gzip.compress(json.dumps(record, ensure_ascii=False).encode('utf-8'), compresslevel=6)
+
+        path = self._path(check_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self._total += len(data)
+        if self._total > self.max_bytes:
+            self._rotate()
+        return path
+
+    def _rotate(self):
+        """Toplam boyut sınırın altına inene kadar en eski yakalamaları sil"""
+        # Diğer süreçlerin yazdıkları da hesaba katılsın diye dizinden yeniden say
+        files = self._files()
+        total = sum(size for _, _, size in files)
+        for _, path, size in files[:-1]:  # En yeni yakalama her zaman kalır
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total = total
+
+    def load(self, check_id: str) -> Dict:
+        with gzip.open(self._path(check_id), 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Tüm yakalamalar, en eskiden yeniye"""
+        for _, path, _ in self._files():
+            try:
+                with gzip.open(path, 'rb') as f:
+                    yield json.loads(f.read().decode('utf-8'))
+            except (OSError, ValueError) as e:
+                print(f"[WARNING] Yakalama okunamadı ({path}): {e}")
+
+    def __len__(self) -> int:
+        return len(self._files())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TCDD İzleyici - Yakalama Deposu')
+    parser.add_argument('--dir', dest='directory', default=CAPTURE_DIR, help='Yakalama dizini')
+    parser.add_argument('--reason', default=None, help='Yalnızca bu nedenle alınan yakalamalar (timeout, empty, all)')
+    parser.add_argument('--show', dest='check_id', default=None, help='Bu kontrol ID\'sinin HTML\'ini yazdır')
+    args = parser.parse_args()
+
+    store = CaptureStore(args.directory)
+    if args.check_id:
+        sys.stdout.write(store.load(args.check_id)['html'])
+        sys.exit(0)
+
+    for record in store:
+        if args.reason and record.get('reason') != args.reason:
+            continue
+        print(f"{record['check_id']}  {record.get('reason', '-'):<8} "
+              f"{record.get('from')} → {record.get('to')} {record.get('date')} "
+              f"({len(record.get('wagons') or {})} vagon)")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+TCDD İzleyici - İsteğe Bağlı Kontrol Profili
+
+Bir kontrol aniden yavaşladığında elimizdeki tek araç [INFO] satırlarıydı.
+Bu modül, bir izleyicinin sonraki N kontrolü için şunları kaydeder:
+
+    steps.json     Adım süreleri (_step bütçeleri ve sonuçlarıyla) ve
+                   istasyon seçimi gibi alt adımlar
+    profile.txt    Python tarafının cProfile özeti (kümülatif süreye göre)
+    profile.pstats Ham cProfile verisi (python -m pstats / snakeviz ile açılır)
+    trace-N.zip    Kontrolün kullandığı her context'in Playwright trace'i
+                   (ağ + DOM anlık görüntüleri; ekran görüntüsü varsayılan kapalı)
+                   npx playwright show-trace trace-1.zip ile açılır
+
+Her kontrolün çıktıları PROFILE_DIR altında tek bir .zip'te toplanır. Dizin
+PROFILE_MAX_BYTES'ı aşınca veya dosyalar PROFILE_MAX_AGE'den eskiyince en
+eskiler silinir.
+
+ETKİNLEŞTİRME:
+    - CLI: tcdd_watcher.py --watch ... --profile 3 [--profile-screenshots]
+    - API: POST /api/profile {"checks": 3} (çalışan izleyiciye istek dosyası
+      bırakılır; izleyici bir sonraki kontrolden önce okur)
+
+KULLANIM:
+    python check_profiler.py              # Kayıtlı profiller
+    python check_profiler.py --steps ID   # Bir profilin adım süreleri
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# cProfile, pstats, tempfile ve zipfile yalnızca profil alınırken/okunurken
+# içe aktarılır (tcdd_watcher bu modülü her başlangıçta yükler)
+
+
+# Konfigürasyon
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", str(200 * 1024 * 1024)))
+PROFILE_MAX_AGE = float(os.getenv("PROFILE_MAX_AGE", str(7 * 86400)))    # saniye
+MAX_PROFILE_CHECKS = 20        # Tek istekte profillenebilecek kontrol sayısı
+PROFILE_TOP_FUNCTIONS = 40     # profile.txt'deki satır sayısı
+
+PROFILE_SUFFIX = '.zip'
+REQUEST_PREFIX = 'request-'    # request-<pid>.json: çalışan izleyiciye profil isteği
+
+
+def request_path(pid: int, directory: str = PROFILE_DIR) -> str:
+    return os.path.join(directory, f"{REQUEST_PREFIX}{pid}.json")
+
+
+def request_profile(pid: int, checks: int, screenshots: bool = False, directory: str = PROFILE_DIR) -> int:
+    """
+    Çalışan bir izleyiciden sonraki kontrollerinin profilini iste
+
+    Returns:
+        int: Profillenecek kontrol sayısı (MAX_PROFILE_CHECKS ile sınırlı)
+    """
+    checks = max(1, min(int(checks), MAX_PROFILE_CHECKS))
+    os.makedirs(directory, exist_ok=True)
+    path = request_path(pid, directory)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'checks': checks, 'screenshots': bool(screenshots)}, f)
+    os.replace(tmp_path, path)
+    return checks
+
+
+class ProfileStore:
+    """Boyut ve yaş sınırlı profil arşivi dizini"""
+
+    def __init__(self, directory: str = PROFILE_DIR, max_bytes: int = PROFILE_MAX_BYTES,
+                 max_age: float = PROFILE_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def _files(self) -> List[tuple]:
+        """(mtime, yol, boyut) listesi, en eskiden yeniye"""
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(PROFILE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # Başka bir süreç rotasyonda sildi
+                continue
+            files.append((stat.st_mtime, path, stat.st_size))
+        return sorted(files)
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """Profil arşivinin yolu (yoksa veya ad geçersizse None)"""
+        if os.path.basename(profile_id) != profile_id or profile_id.startswith('.'):
+            return None
+        path = os.path.join(self.directory, profile_id + PROFILE_SUFFIX)
+        return path if os.path.exists(path) else None
+
+    def rotate(self):
+        """Eskimiş profilleri ve boyut sınırını aşan en eski profilleri sil"""
+        files = self._files()
+        total = sum(size for _, _, size in files)
+        now = time.time()
+        for index, (mtime, path, size) in enumerate(files):
+            # En yeni profil her zaman kalır
+            if index == len(files) - 1 or (total <= self.max_bytes and now - mtime <= self.max_age):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def list(self) -> List[Dict]:
+        """Kayıtlı profiller, en yeniden eskiye"""
+        profiles = []
+        for mtime, path, size in reversed(self._files()):
+            profile_id = os.path.basename(path)[:-len(PROFILE_SUFFIX)]
+            meta = {}
+            import zipfile
+            try:
+                with zipfile.ZipFile(path) as archive:
+                    meta = json.loads(archive.read('meta.json').decode('utf-8'))
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+                pass
+            profiles.append(dict(meta, id=profile_id, size=size,
+                                 created=datetime.fromtimestamp(mtime).isoformat(timespec='seconds')))
+        return profiles
+
+
+class CheckProfile:
+    """Tek bir kontrolün adım süreleri, cProfile verisi ve Playwright trace'leri"""
+
+    # cProfile aynı anda tek profilleyiciye izin verir; eşzamanlı kontrollerde
+    # (shard worker) yalnızca ilki Python profili alır
+    _python_profile_active = False
+
+    def __init__(self, profile_id: str, label: str, screenshots: bool = False):
+        import cProfile
+        import tempfile
+
+        self.profile_id = profile_id
+        self.label = label
+        self.screenshots = screenshots
+        self.steps: List[Dict] = []
+        self._started = time.monotonic()
+        self._tmpdir = tempfile.mkdtemp(prefix='tcdd-profile-')
+        self._traces: Dict[int, object] = {}   # id(context) -> context
+        self._trace_files: List[str] = []
+        self._profiler: Optional[cProfile.Profile] = None
+        if not CheckProfile._python_profile_active:
+            CheckProfile._python_profile_active = True
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    async def trace(self, context):
+        """Context'in trace kaydını başlat (kontrol içinde ilk kullanımında)"""
+        if id(context) in self._traces:
+            return
+        self._traces[id(context)] = context
+        try:
+            await context.tracing.start(screenshots=self.screenshots, snapshots=True)
+        except Exception as e:
+            print(f"[WARNING] Trace başlatılamadı: {e}")
+            self._traces[id(context)] = None
+
+    async def stop_trace(self, context):
+        """Context kapanmadan önce trace'i dosyaya yaz"""
+        if self._traces.get(id(context)) is None:
+            return
+        self._traces[id(context)] = None
+        path = os.path.join(self._tmpdir, f"trace-{len(self._trace_files) + 1}.zip")
+        try:
+            await context.tracing.stop(path=path)
+            self._trace_files.append(path)
+        except Exception as e:
+            print(f"[WARNING] Trace kaydedilemedi: {e}")
+
+    def record_step(self, step: str, started: float, budget: Optional[float], outcome: str):
+        self.steps.append({
+            'step': step,
+            'offset': round(started - self._started, 3),
+            'duration': round(time.monotonic() - started, 3),
+            'budget': round(budget, 1) if budget is not None else None,
+            'outcome': outcome
+        })
+
+    @contextmanager
+    def span(self, name: str):
+        """Adım içindeki bir alt işlemin süresi (ör. kalkış istasyonu seçimi)"""
+        started = time.monotonic()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        finally:
+            self.record_step(name, started, None, outcome)
+
+    def _python_profile(self) -> Optional[tuple]:
+        """(özet metni, ham pstats dosyası)"""
+        if self._profiler is None:
+            return None
+        self._profiler.disable()
+        CheckProfile._python_profile_active = False
+        import pstats
+
+        text = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=text)
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        raw_path = os.path.join(self._tmpdir, 'profile.pstats')
+        stats.dump_stats(raw_path)
+        return text.getvalue(), raw_path
+
+    async def finish(self, outcome: str, store: Optional[ProfileStore] = None) -> Optional[str]:
+        """
+        Açık trace'leri kapat ve profili arşive yaz
+
+        Returns:
+            Optional[str]: Yazılan .zip yolu (yazılamadıysa None)
+        """
+        for context in list(self._traces.values()):
+            if context is not None:
+                await self.stop_trace(context)
+        python_profile = self._python_profile()
+
+        store = store or ProfileStore()
+        path = os.path.join(store.directory, self.profile_id + PROFILE_SUFFIX)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        meta = {
+            'label': self.label,
+            'outcome': outcome,
+            'duration': round(time.monotonic() - self._started, 3),
+            'traces': len(self._trace_files),
+            'screenshots': self.screenshots,
+            'python_profile': python_profile is not None
+        }
+        import zipfile
+        try:
+            with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr('meta.json', json.dumps(meta, ensure_ascii=False, indent=2))
+                archive.writestr('steps.json', json.dumps(self.steps, ensure_ascii=False, indent=2))
+                if python_profile is not None:
+                    archive.writestr('profile.txt', python_profile[0])
+                    archive.write(python_profile[1], 'profile.pstats')
+                for trace_path in self._trace_files:
+                    # Trace'ler zaten sıkıştırılmış zip'lerdir
+                    archive.write(trace_path, os.path.basename(trace_path), zipfile.ZIP_STORED)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[WARNING] Profil yazılamadı: {e}")
+            return None
+        finally:
+            for name in os.listdir(self._tmpdir):
+                os.remove(os.path.join(self._tmpdir, name))
+            os.rmdir(self._tmpdir)
+
+        store.rotate()
+        summary = ", ".join(f"{s['step']} {s['duration']:.1f}s" for s in self.steps)
+        print(f"[INFO] Kontrol profili kaydedildi: {path} ({summary})")
+        return path
+
+
+class Profiler:
+    """Süreç genelinde profil isteklerini tutar; sıradaki kontrollere profil verir"""
+
+    def __init__(self, directory: str = PROFILE_DIR):
+        self.directory = directory
+        self.remaining = 0
+        self.screenshots = False
+        self._sequence = 0
+
+    def arm(self, checks: int, screenshots: bool = False):
+        """Sonraki `checks` kontrolü profille"""
+        self.remaining = max(0, min(checks, MAX_PROFILE_CHECKS))
+        self.screenshots = screenshots
+        if self.remaining:
+            print(f"[INFO] Sonraki {self.remaining} kontrol profillenecek "
+                  f"(trace{' + ekran görüntüsü' if screenshots else ''}, cProfile, adım süreleri)")
+
+    def poll(self):
+        """API'nin bıraktığı istek dosyasını oku (kontrol başına tek stat çağrısı)"""
+        path = request_path(os.getpid(), self.directory)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                request = json.load(f)
+            os.remove(path)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Profil isteği okunamadı: {e}")
+            return
+        self.arm(int(request.get('checks', 1)), bool(request.get('screenshots', False)))
+
+    def begin(self, label: str) -> Optional[CheckProfile]:
+        """Bu kontrol profillenecekse yeni CheckProfile"""
+        self.poll()
+        if self.remaining <= 0:
+            return None
+        self.remaining -= 1
+        self._sequence += 1
+        profile_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{self._sequence:03d}"
+        return CheckProfile(profile_id, label, self.screenshots)
+
+
+PROFILER = Profiler()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TCDD İzleyici - Kontrol Profilleri')
+    parser.add_argument('--dir', dest='directory', default=PROFILE_DIR, help='Profil dizini')
+    parser.add_argument('--steps', dest='profile_id', default=None, help='Bu profilin adım sürelerini yazdır')
+    args = parser.parse_args()
+
+    store = ProfileStore(args.directory)
+    if args.profile_id:
+        path = store.path(args.profile_id)
+        if path is None:
+            print(f"[ERROR] Profil bulunamadı: {args.profile_id}")
+            sys.exit(2)
+        import zipfile
+        with zipfile.ZipFile(path) as archive:
+            for step in json.loads(archive.read('steps.json').decode('utf-8')):
+                budget = f"/{step['budget']:.0f}s" if step.get('budget') else ''
+                print(f"  +{step['offset']:7.2f}s  {step['duration']:6.2f}s{budget:<6} {step['outcome']:<8} {step['step']}")
+        sys.exit(0)
+
+    for profile in store.list():
+        print(f"{profile['id']}  {profile.get('outcome', '-'):<10} {profile.get('duration', 0):6.1f}s  "
+              f"{profile['size'] / 1024:8.0f} KB  {profile.get('label', '')}")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
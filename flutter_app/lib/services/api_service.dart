@@ -11,6 +11,7 @@ class ApiService {
     required String date,
     required String wagonType,
     required int passengers,
+    double? maxPrice,  // TL; verilirse üstündeki açılışlar bildirilmez
   }) async {
     try {
       final response = await http.post(
@@ -22,11 +23,16 @@ class ApiService {
           'date': date,
           'wagon_type': wagonType,
           'passengers': passengers,
+          if (maxPrice != null) 'max_price': maxPrice,
         }),
       );
 
-      if (response.statusCode == 200) {
+      // 200: başlatıldı, 202: kuyruğa alındı (status: 'queued')
+      if (response.statusCode == 200 || response.statusCode == 202) {
         return jsonDecode(response.body);
+      } else if (response.statusCode == 429) {
+        final retryAfter = response.headers['retry-after'] ?? '?';
+        throw Exception('Sunucu kapasitesi dolu, $retryAfter sn sonra tekrar deneyin');
       } else {
         throw Exception('API Hatası: ${response.statusCode}');
       }
@@ -0,0 +1,17 @@
+"""
+gunicorn ayarları (Dockerfile: gunicorn -c gunicorn.conf.py api_server:app)
+
+api_server içe aktarılırken arka plan işi başlatmaz; günlükten geri yükleme
+ve reaper worker hazır olduğunda start_background() ile bir kez başlatılır.
+Oturumlar süreç içinde tutulduğu için tek worker kullanılır.
+"""
+
+bind = "0.0.0.0:5000"
+workers = 1
+threads = 4
+timeout = 120
+
+
+def post_worker_init(worker):
+    from api_server import start_background
+    start_background()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+TCDD İzleyici - Müsaitlik Geçmişi Analitiği
+
+history_store.py'nin kaydettiği gözlemlerden, her hat ve vagon tipi için
+DOLU durumundaki bir seferin bir sonraki gözlemde MÜSAİT'e dönme
+olasılığını kalkışa kalan gün ve günün saati bazında hesaplar.
+
+Hesaplama tamamen NumPy vektör işlemleriyle yapılır (Python döngüsü yok):
+    1. Gözlemler seri anahtarı (hat, tarih, vagon) ve zamana göre sıralanır
+    2. Ardışık gözlem çiftlerinde DOLU olanlar "deneme", DOLU → MÜSAİT
+       olanlar "açılma" sayılır
+    3. (hat+vagon, kalan gün, saat) indeksine np.bincount ile toplanır
+
+shard_runtime.py her hattın kontrol aralığını interval_scale() ile
+ölçekler: açılma olasılığı taban oranın üzerinde olan pencerelerde aralık
+kısalır, düşük olanlarda uzar (OPENING_MODEL_ENABLED=0 ile kapatılır).
+
+KULLANIM:
+    python history_analytics.py --from "Çiğli" --to "Konya" --wagon-type YATAKLI
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("[WARNING] NumPy yüklü değil. Geçmiş analitiği devre dışı.")
+
+from history_store import HistoryStore, STATUS_CODES
+
+
+# Konfigürasyon
+MAX_DAYS = 60          # Bu değerin üzerindeki kalan gün sayıları son kovada toplanır
+HOURS = 24
+SMOOTHING_ALPHA = 1.0  # Laplace düzeltmesi (az gözlemli hücrelerde aşırı uç değerleri önler)
+OPENING_MODEL_ENABLED = os.getenv("OPENING_MODEL_ENABLED", "1") == "1"
+MIN_INTERVAL_SCALE = float(os.getenv("OPENING_MIN_INTERVAL_SCALE", "0.5"))   # Sıcak pencerede aralık en fazla yarıya iner
+MAX_INTERVAL_SCALE = float(os.getenv("OPENING_MAX_INTERVAL_SCALE", "2.0"))   # Soğuk pencerede aralık en fazla iki katına çıkar
+
+
+def _local_utc_offset_ms() -> int:
+    """Gözlem zamanları yerel saatle kaydedildiği için yerel UTC farkı"""
+    offset = datetime.now().astimezone().utcoffset()
+    return int(offset.total_seconds() * 1000) if offset else 0
+
+
+class OpeningWindowModel:
+    """
+    Hat + vagon tipi başına (kalan gün x saat) açılma olasılıkları
+
+    trials[g, d, h]: DOLU gözlemini izleyen gözlem sayısı
+    flips[g, d, h]:  Bunlardan MÜSAİT'e dönenlerin sayısı
+    """
+
+    def __init__(self, groups: List[Tuple[str, str, str]], trials, flips, alpha: float = SMOOTHING_ALPHA):
+        self.groups = groups
+        self._group_index = {g: i for i, g in enumerate(groups)}
+        self.trials = trials
+        self.flips = flips
+        self.alpha = alpha
+        # Genel taban oran: düzeltmede önsel (prior) olarak kullanılır
+        total = trials.sum()
+        self.base_rate = float(flips.sum() / total) if total else 0.0
+
+    @classmethod
+    def fit(cls, store: HistoryStore, max_days: int = MAX_DAYS, alpha: float = SMOOTHING_ALPHA) -> 'OpeningWindowModel':
+        """Depodaki tüm gözlemlerden modeli hesapla"""
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy yüklü değil")
+
+        columns = store.scan()
+        ts = np.frombuffer(columns['ts'], dtype=np.int64)
+        if ts.size < 2:
+            return cls([], np.zeros((0, max_days + 1, HOURS), np.int64), np.zeros((0, max_days + 1, HOURS), np.int64), alpha)
+
+        col = {name: np.frombuffer(columns[name], dtype=np.dtype(columns[name].typecode)).astype(np.int64)
+               for name in ('from', 'to', 'date', 'wagon', 'status')}
+
+        # 1. Seri anahtarı ve zamana göre sırala (lexsort: son anahtar birincil)
+        order = np.lexsort((ts, col['wagon'], col['date'], col['to'], col['from']))
+        ts = ts[order]
+        col = {name: values[order] for name, values in col.items()}
+
+        # 2. Ardışık çiftler: aynı seride ve önceki gözlem DOLU
+        same_series = np.ones(ts.size - 1, dtype=bool)
+        for name in ('from', 'to', 'date', 'wagon'):
+            same_series &= col[name][1:] == col[name][:-1]
+        status = col['status']
+        at_risk = same_series & (status[:-1] == STATUS_CODES['DOLU'])
+        flipped = at_risk & (status[1:] == STATUS_CODES['MUSAIT'])
+
+        # Özellikler geçişin gözlendiği (ikinci) gözlemin zamanından alınır
+        obs_ts = ts[1:][at_risk] + _local_utc_offset_ms()
+        obs_day = obs_ts // 86_400_000
+        hour = (obs_ts // 3_600_000) % HOURS
+
+        # Tarih sözlük id'si -> epoch günü tablosu (geçersiz tarihler -1)
+        strings = store.strings
+        date_table = np.full(len(strings), -1, dtype=np.int64)
+        for code, value in enumerate(strings):
+            try:
+                date_table[code] = (datetime.strptime(value, "%Y-%m-%d") - datetime(1970, 1, 1)).days
+            except ValueError:
+                pass
+        travel_day = date_table[col['date'][1:][at_risk]]
+        valid = travel_day >= 0
+        days = np.clip(travel_day - obs_day, 0, max_days)
+
+        # 3. Hat + vagon grupları (sözlük id'leri bit paketlenmeden satır olarak karşılaştırılır)
+        group_key = np.stack([col[name][1:][at_risk][valid] for name in ('from', 'to', 'wagon')], axis=1)
+        unique_keys, group_ids = np.unique(group_key.reshape(-1, 3), axis=0, return_inverse=True)
+        group_ids = group_ids.reshape(-1)
+
+        cells = max_days + 1
+        flat = (group_ids * cells + days[valid]) * HOURS + hour[valid]
+        count = len(unique_keys)
+        size = count * cells * HOURS
+        trials = np.bincount(flat, minlength=size).reshape(count, cells, HOURS)
+        flips = np.bincount(flat, weights=flipped[at_risk][valid], minlength=size)
+        flips = flips.astype(np.int64).reshape(count, cells, HOURS)
+
+        groups = [tuple(store.decode(int(code)) for code in key) for key in unique_keys]
+        return cls(groups, trials, flips, alpha)
+
+    def _group(self, from_station: str, to_station: str, wagon: str) -> Optional[int]:
+        return self._group_index.get((from_station, to_station, wagon))
+
+    def probabilities(self, from_station: str, to_station: str, wagon: str):
+        """(kalan gün x saat) olasılık matrisi; geçmiş yoksa taban oran"""
+        group = self._group(from_station, to_station, wagon)
+        cells = self.trials.shape[1] if self.trials.ndim == 3 else MAX_DAYS + 1
+        if group is None:
+            return np.full((cells, HOURS), self.base_rate)
+        trials = self.trials[group]
+        flips = self.flips[group]
+        return (flips + self.alpha * self.base_rate) / (trials + self.alpha)
+
+    def probability(self, from_station: str, to_station: str, wagon: str, days_to_departure: int, hour: int) -> float:
+        """Belirli bir (kalan gün, saat) penceresinde açılma olasılığı"""
+        matrix = self.probabilities(from_station, to_station, wagon)
+        days = min(max(days_to_departure, 0), matrix.shape[0] - 1)
+        return float(matrix[days, hour % HOURS])
+
+    def priority(self, from_station: str, to_station: str, wagon: str, date: str,
+                 now: Optional[datetime] = None) -> float:
+        """
+        Zamanlayıcı için şu anki açılma olasılığı
+
+        Kalkış tarihine kalan gün ve şimdiki saate göre probability() döner.
+        """
+        now = now or datetime.now()
+        days = (datetime.strptime(date, "%Y-%m-%d").date() - now.date()).days
+        return self.probability(from_station, to_station, wagon, days, now.hour)
+
+    def interval_scale(self, from_station: str, to_station: str, date: str,
+                       wagons: Optional[List[str]] = None, now: Optional[datetime] = None) -> float:
+        """
+        Hattın kontrol aralığı için çarpan (MIN_INTERVAL_SCALE..MAX_INTERVAL_SCALE)
+
+        İzlenen vagon tiplerinden (None veya 'ALL' ise hattın geçmişteki tüm
+        vagon tipleri) en yüksek anlık açılma olasılığı taban orana bölünür;
+        oran 2 ise aralık yarıya iner. Geçmiş yoksa 1.0 döner.
+        """
+        if not wagons or 'ALL' in wagons:
+            wagons = [w for f, t, w in self.groups if f == from_station and t == to_station]
+        wagons = [w for w in wagons if self._group(from_station, to_station, w) is not None]
+        if not wagons or self.base_rate <= 0:
+            return 1.0
+        try:
+            best = max(self.priority(from_station, to_station, w, date, now) for w in wagons)
+        except ValueError:
+            return 1.0
+        ratio = best / self.base_rate
+        if ratio <= 0:
+            return MAX_INTERVAL_SCALE
+        return min(max(1.0 / ratio, MIN_INTERVAL_SCALE), MAX_INTERVAL_SCALE)
+
+    def hot_windows(self, from_station: str, to_station: str, wagon: str, top: int = 5,
+                    min_trials: int = 3) -> List[Dict]:
+        """Açılma olasılığı en yüksek (kalan gün, saat) pencereleri"""
+        group = self._group(from_station, to_station, wagon)
+        if group is None:
+            return []
+        matrix = self.probabilities(from_station, to_station, wagon)
+        trials = self.trials[group]
+        scores = np.where(trials >= min_trials, matrix, -1.0).ravel()
+        best = np.argsort(scores)[::-1][:top]
+        best = best[scores[best] >= 0]
+        hours = matrix.shape[1]
+        return [{
+            'days_to_departure': int(i // hours),
+            'hour': int(i % hours),
+            'probability': round(float(scores[i]), 4),
+            'trials': int(trials.ravel()[i]),
+            'openings': int(self.flips[group].ravel()[i])
+        } for i in best]
+
+
+def load_opening_model(store: Optional[HistoryStore] = None) -> Optional[OpeningWindowModel]:
+    """Zamanlayıcı için modeli hesapla (kapalıysa, NumPy yoksa veya hata olursa None)"""
+    if not OPENING_MODEL_ENABLED or not NUMPY_AVAILABLE:
+        return None
+    try:
+        return OpeningWindowModel.fit(store or HistoryStore())
+    except Exception as e:
+        print(f"[WARNING] Açılma modeli hesaplanamadı: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TCDD İzleyici - Açılma Penceresi Analitiği')
+    parser.add_argument('-f', '--from', dest='from_station', required=True, help='Kalkış istasyonu')
+    parser.add_argument('-t', '--to', dest='to_station', required=True, help='Varış istasyonu')
+    parser.add_argument('-w', '--wagon-type', dest='wagon_type', default='YATAKLI', help='Vagon tipi (varsayılan: YATAKLI)')
+    parser.add_argument('--top', type=int, default=10, help='Listelenecek pencere sayısı')
+    args = parser.parse_args()
+
+    if not NUMPY_AVAILABLE:
+        sys.exit(2)
+
+    model = OpeningWindowModel.fit(HistoryStore())
+    windows = model.hot_windows(args.from_station, args.to_station, args.wagon_type, top=args.top)
+    print(json.dumps({
+        'route': f"{args.from_station} → {args.to_station}",
+        'wagon_type': args.wagon_type,
+        'base_rate': round(model.base_rate, 4),
+        'windows': windows
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+TCDD İzleyici - Müsaitlik Geçmişi (Zaman Serisi) Deposu
+
+state.json yalnızca her anahtarın son durumunu tutar; geçmiş her yazımda
+kaybolur. Bu modül her gözlemi (hat, tarih, vagon tipi, durum, fiyat, zaman)
+sıkıştırılmış ve yalnızca ekleme yapılan (append-only) bir depoda
+saklar.
+
+DEPOLAMA DÜZENİ (HISTORY_DIR):
+    dictionary.json   İstasyon/vagon/tarih metinleri için sözlük (metin -> id)
+    active.log        Sabit boyutlu ikili kayıtlar (yeni gözlemler buraya eklenir)
+    seg-000001.seg    Sıkıştırılmış sütunsal (columnar) segmentler
+
+    Aktif log SEGMENT_ROWS kayda ulaşınca sütunsal bir segmente dönüştürülür:
+    zaman damgaları delta kodlanır, metinler sözlük id'leri olarak tutulur ve
+    her sütun ayrı ayrı zlib ile sıkıştırılır. Küçük segmentler periyodik
+    olarak birleştirilir (compaction).
+
+KULLANIM:
+    python history_store.py --from "Çiğli" --to "Konya" --wagon-type YATAKLI
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# Konfigürasyon
+HISTORY_DIR = os.getenv("HISTORY_DIR", "history")
+SEGMENT_ROWS = int(os.getenv("HISTORY_SEGMENT_ROWS", "4096"))
+MERGE_SEGMENT_ROWS = SEGMENT_ROWS * 16   # Bu boyutun altındaki segmentler birleştirilir
+
+SEGMENT_MAGIC = b'TCDH'
+SEGMENT_VERSION = 1
+
+# Aktif log kaydı: ts_ms, from, to, date, wagon, status, price_kurus
+# (tüm metin alanları aynı sözlüğün id'leridir; sözlük 65535'i aşabilir)
+RECORD = struct.Struct('<qIIIIBi')
+NO_PRICE = -1
+
+STATUS_CODES = {'DOLU': 0, 'MUSAIT': 1, 'UNKNOWN': 2}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+# Sütun adı -> array typecode
+COLUMNS = (
+    ('ts', 'q'),
+    ('from', 'I'),
+    ('to', 'I'),
+    ('date', 'I'),
+    ('wagon', 'I'),
+    ('status', 'B'),
+    ('price', 'i'),
+)
+
+
+def parse_price_kurus(price: Optional[str]) -> Optional[int]:
+    """
+    Fiyat metnini kuruş cinsinden tamsayıya çevir
+
+    Örnekler: "850,00 TL" -> 85000, "₺1.234,50" -> 123450, "DOLU" -> None
+    """
+    if not price:
+        return None
+    digits = ''.join(ch for ch in price if ch.isdigit() or ch in ',.')
+    if not digits or not any(ch.isdigit() for ch in digits):
+        return None
+
+    # Türkçe biçim: '.' binlik ayırıcı, ',' ondalık ayırıcı
+    if ',' in digits:
+        whole, _, frac = digits.rpartition(',')
+    else:
+        whole, frac = digits, ''
+    whole = whole.replace('.', '').replace(',', '') or '0'
+    frac = (frac + '00')[:2]
+    try:
+        return int(whole) * 100 + int(frac)
+    except ValueError:
+        return None
+
+
+@contextmanager
+def _locked(path: str):
+    """Süreçler arası kilit (fcntl yoksa kilitsiz çalışır)"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a+b') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class HistoryStore:
+    """Müsaitlik gözlemleri için yalnızca ekleme yapılan sütunsal depo"""
+
+    def __init__(self, directory: str = HISTORY_DIR, segment_rows: int = SEGMENT_ROWS):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        os.makedirs(directory, exist_ok=True)
+        self._dictionary_path = os.path.join(directory, 'dictionary.json')
+        self._active_path = os.path.join(directory, 'active.log')
+        self._lock_path = os.path.join(directory, '.lock')
+        self._strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._dictionary_mtime = None
+        self._dictionary_dirty = False
+        self._load_dictionary()
+
+    # ------------------------------------------------------------------
+    # Sözlük kodlama
+    # ------------------------------------------------------------------
+
+    def _load_dictionary(self):
+        if not os.path.exists(self._dictionary_path):
+            return
+        # Sözlük yalnızca büyüdüğü için (mtime, boyut) değişikliği yeterli bir işarettir
+        stat = os.stat(self._dictionary_path)
+        mtime = (stat.st_mtime_ns, stat.st_size)
+        if mtime == self._dictionary_mtime:
+            return
+        with open(self._dictionary_path, 'r', encoding='utf-8') as f:
+            self._strings = json.load(f).get('strings', [])
+        self._ids = {s: i for i, s in enumerate(self._strings)}
+        self._dictionary_mtime = mtime
+
+    def _save_dictionary(self):
+        tmp_path = f"{self._dictionary_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'strings': self._strings}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._dictionary_path)
+        stat = os.stat(self._dictionary_path)
+        self._dictionary_mtime = (stat.st_mtime_ns, stat.st_size)
+
+    def _encode(self, value: str) -> int:
+        """Metni sözlük id'sine çevir (yoksa ekle). Kilit altında çağrılmalı."""
+        code = self._ids.get(value)
+        if code is None:
+            code = len(self._strings)
+            self._strings.append(value)
+            self._ids[value] = code
+            self._dictionary_dirty = True
+        return code
+
+    def _lookup(self, value: Optional[str]) -> Optional[int]:
+        if value is None:
+            return None
+        self._load_dictionary()
+        return self._ids.get(value, -1)
+
+    def decode(self, code: int) -> str:
+        return self._strings[code]
+
+    @property
+    def strings(self) -> List[str]:
+        """Sözlükteki tüm metinler (id sırasıyla)"""
+        self._load_dictionary()
+        return list(self._strings)
+
+    # ------------------------------------------------------------------
+    # Yazma
+    # ------------------------------------------------------------------
+
+    def append_many(self, observations: Iterable[Dict]):
+        """
+        Gözlemleri aktif loga ekle
+
+        Her gözlem: from, to, date, wagon, status, price (metin veya None),
+        timestamp (ISO), isteğe bağlı price_kurus.
+        """
+        observations = list(observations)
+        if not observations:
+            return
+
+        with _locked(self._lock_path):
+            self._load_dictionary()
+            self._dictionary_dirty = False
+            buffer = bytearray()
+            for obs in observations:
+                ts_ms = int(datetime.fromisoformat(obs['timestamp']).timestamp() * 1000)
+                price_kurus = obs.get('price_kurus')
+                if price_kurus is None:
+                    price_kurus = parse_price_kurus(obs.get('price'))
+                buffer += RECORD.pack(
+                    ts_ms,
+                    self._encode(obs['from']),
+                    self._encode(obs['to']),
+                    self._encode(obs['date']),
+                    self._encode(obs['wagon']),
+                    STATUS_CODES.get(obs['status'], STATUS_CODES['UNKNOWN']),
+                    NO_PRICE if price_kurus is None else price_kurus
+                )
+            if self._dictionary_dirty:
+                self._save_dictionary()
+
+            with open(self._active_path, 'ab') as f:
+                f.write(buffer)
+
+            if os.path.getsize(self._active_path) >= self.segment_rows * RECORD.size:
+                self._compact_locked()
+
+    # ------------------------------------------------------------------
+    # Segmentler ve compaction
+    # ------------------------------------------------------------------
+
+    def _segment_paths(self) -> List[str]:
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith('seg-') and n.endswith('.seg'))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def _next_segment_path(self) -> str:
+        paths = self._segment_paths()
+        last = int(os.path.basename(paths[-1])[4:10]) if paths else 0
+        return os.path.join(self.directory, f"seg-{last + 1:06d}.seg")
+
+    def _read_active(self) -> Dict[str, array]:
+        columns = {name: array(code) for name, code in COLUMNS}
+        if not os.path.exists(self._active_path):
+            return columns
+        with open(self._active_path, 'rb') as f:
+            data = f.read()
+        usable = len(data) - len(data) % RECORD.size  # Yarım yazılmış son kaydı atla
+        for row in RECORD.iter_unpack(data[:usable]):
+            for (name, _), value in zip(COLUMNS, row):
+                columns[name].append(value)
+        return columns
+
+    @staticmethod
+    def _write_segment(path: str, columns: Dict[str, array]):
+        rows = len(columns['ts'])
+        # Zaman damgalarını zamana göre sırala ve delta kodla
+        order = sorted(range(rows), key=columns['ts'].__getitem__)
+        header = {'version': SEGMENT_VERSION, 'rows': rows, 'columns': []}
+        blobs = []
+        for name, code in COLUMNS:
+            values = array(code, (columns[name][i] for i in order))
+            if name == 'ts' and rows:
+                deltas = array('q', [values[0]])
+                deltas.extend(values[i] - values[i - 1] for i in range(1, rows))
+                values = deltas
+            blob = zlib.compress(values.tobytes(), 6)
+            header['columns'].append({'name': name, 'typecode': code, 'length': len(blob)})
+            blobs.append(blob)
+
+        header_bytes = json.dumps(header).encode('utf-8')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SEGMENT_MAGIC)
+            f.write(struct.pack('<I', len(header_bytes)))
+            f.write(header_bytes)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_header(f, path: str) -> Dict:
+        if f.read(4) != SEGMENT_MAGIC:
+            raise ValueError(f"Geçersiz segment dosyası: {path}")
+        (header_len,) = struct.unpack('<I', f.read(4))
+        return json.loads(f.read(header_len).decode('utf-8'))
+
+    def _segment_rows(self, path: str) -> int:
+        with open(path, 'rb') as f:
+            return self._read_header(f, path)['rows']
+
+    def _read_segment(self, path: str) -> Dict[str, array]:
+        with open(path, 'rb') as f:
+            header = self._read_header(f, path)
+            columns = {}
+            for column in header['columns']:
+                values = array(column['typecode'])
+                values.frombytes(zlib.decompress(f.read(column['length'])))
+                columns[column['name']] = values
+
+        ts = columns['ts']
+        for i in range(1, len(ts)):
+            ts[i] += ts[i - 1]
+        return columns
+
+    def _compact_locked(self, merge: bool = True):
+        active = self._read_active()
+        if len(active['ts']):
+            self._write_segment(self._next_segment_path(), active)
+            open(self._active_path, 'wb').close()
+
+        if not merge:
+            return
+        # Küçük segmentleri tek segmentte birleştir
+        small = [p for p in self._segment_paths() if self._segment_rows(p) < MERGE_SEGMENT_ROWS]
+        if len(small) < 2:
+            return
+        merged = {name: array(code) for name, code in COLUMNS}
+        for path in small:
+            columns = self._read_segment(path)
+            for name, _ in COLUMNS:
+                merged[name].extend(columns[name])
+        target = small[0]
+        self._write_segment(target, merged)
+        for path in small[1:]:
+            os.remove(path)
+
+    def compact(self):
+        """Aktif logu segmente dönüştür ve küçük segmentleri birleştir"""
+        with _locked(self._lock_path):
+            self._compact_locked(merge=True)
+
+    # ------------------------------------------------------------------
+    # Okuma ve sorgular
+    # ------------------------------------------------------------------
+
+    def scan(self, from_station: Optional[str] = None, to_station: Optional[str] = None,
+             wagon: Optional[str] = None) -> Dict[str, array]:
+        """
+        Tüm gözlemleri sütunlar halinde döndür (isteğe bağlı filtre ile)
+
+        Returns:
+            Dict[str, array]: Sütun adı -> değerler (ts milisaniye cinsinden)
+        """
+        with _locked(self._lock_path):
+            self._load_dictionary()
+            parts = [self._read_segment(p) for p in self._segment_paths()]
+            parts.append(self._read_active())
+
+        filters = {'from': self._lookup(from_station), 'to': self._lookup(to_station), 'wagon': self._lookup(wagon)}
+        filters = {name: code for name, code in filters.items() if code is not None}
+
+        result = {name: array(code) for name, code in COLUMNS}
+        for columns in parts:
+            if not filters:
+                for name, _ in COLUMNS:
+                    result[name].extend(columns[name])
+                continue
+            keep = [i for i in range(len(columns['ts']))
+                    if all(columns[name][i] == code for name, code in filters.items())]
+            for name, _ in COLUMNS:
+                column = columns[name]
+                result[name].extend(column[i] for i in keep)
+        return result
+
+    def opening_events(self, from_station: str, to_station: str, wagon: Optional[str] = None) -> List[Dict]:
+        """
+        Hat için DOLU → MÜSAİT geçişlerini döndür
+
+        Her seri (tarih, vagon tipi) zamana göre sıralanır ve ardışık
+        gözlemler arasındaki geçişler raporlanır.
+        """
+        columns = self.scan(from_station, to_station, wagon)
+        rows = len(columns['ts'])
+        series = {}
+        for i in range(rows):
+            key = (columns['date'][i], columns['wagon'][i])
+            series.setdefault(key, []).append(i)
+
+        events = []
+        for (date_id, wagon_id), indices in series.items():
+            indices.sort(key=columns['ts'].__getitem__)
+            for prev, cur in zip(indices, indices[1:]):
+                if columns['status'][prev] != STATUS_CODES['DOLU'] or columns['status'][cur] != STATUS_CODES['MUSAIT']:
+                    continue
+                opened_at = datetime.fromtimestamp(columns['ts'][cur] / 1000)
+                travel_date = self.decode(date_id)
+                try:
+                    days_before = (datetime.strptime(travel_date, "%Y-%m-%d").date() - opened_at.date()).days
+                except ValueError:
+                    days_before = None
+                price = columns['price'][cur]
+                events.append({
+                    'timestamp': opened_at.isoformat(),
+                    'date': travel_date,
+                    'wagon': self.decode(wagon_id),
+                    'price_kurus': None if price == NO_PRICE else price,
+                    'days_before': days_before,
+                    'hour': opened_at.hour
+                })
+        events.sort(key=lambda e: e['timestamp'])
+        return events
+
+    def opening_hours(self, from_station: str, to_station: str, wagon: Optional[str] = None) -> List[int]:
+        """Hat için saat bazında (0-23) DOLU → MÜSAİT geçiş sayıları"""
+        histogram = [0] * 24
+        for event in self.opening_events(from_station, to_station, wagon):
+            histogram[event['hour']] += 1
+        return histogram
+
+    def typical_opening(self, from_station: str, to_station: str, wagon: Optional[str] = None) -> Dict:
+        """"Bu hatta koltuklar genelde ne zaman açılıyor?" sorusunun özeti"""
+        events = self.opening_events(from_station, to_station, wagon)
+        histogram = [0] * 24
+        for event in events:
+            histogram[event['hour']] += 1
+        days = sorted(e['days_before'] for e in events if e['days_before'] is not None)
+        top_hours = sorted((h for h in range(24) if histogram[h]), key=lambda h: -histogram[h])[:3]
+        return {
+            'events': len(events),
+            'top_hours': top_hours,
+            'hour_histogram': histogram,
+            'median_days_before': days[len(days) // 2] if days else None
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TCDD İzleyici - Müsaitlik Geçmişi Sorgusu')
+    parser.add_argument('-f', '--from', dest='from_station', required=True, help='Kalkış istasyonu')
+    parser.add_argument('-t', '--to', dest='to_station', required=True, help='Varış istasyonu')
+    parser.add_argument('-w', '--wagon-type', dest='wagon_type', default=None, help='Vagon tipi (varsayılan: tümü)')
+    parser.add_argument('--dir', dest='directory', default=HISTORY_DIR, help='Geçmiş dizini')
+    parser.add_argument('--compact', action='store_true', help='Sorgudan önce compaction çalıştır')
+    args = parser.parse_args()
+
+    store = HistoryStore(args.directory)
+    if args.compact:
+        store.compact()
+
+    summary = store.typical_opening(args.from_station, args.to_station, args.wagon_type)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
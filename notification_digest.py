@@ -0,0 +1,94 @@
+"""
+TCDD İzleyici - Bildirim Özeti (Digest)
+
+wagon_type=ALL izlemelerde tek bir kontrol her vagon sınıfı için ayrı bir
+FCM mesajı üretebiliyordu; toplu koltuk açılışlarında (ör. yeni sefer
+eklendiğinde) bu, abone × vagon sınıfı kadar mesaj demekti. Bu modül
+DOLU → MÜSAİT geçişlerini kısa bir pencere boyunca toplar ve aynı kullanıcı
+ve hat/tarih için tek bir mesajda birleştirir (fiyat tavanı düşüşleri ayrı
+bir özette, kendi mesaj tipiyle gönderilir):
+
+    "YATAKLI 850,00 TL, BUSINESS 600,00 TL"
+
+Bir özet, son geçişten sonra DIGEST_WINDOW saniye yeni geçiş gelmeyince veya
+ilk geçişin üzerinden DIGEST_MAX_LATENCY saniye geçince gönderilmeye hazır
+olur; böylece bildirim hiçbir zaman bu süreden fazla gecikmez.
+"""
+
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+# Konfigürasyon
+DIGEST_WINDOW = float(os.getenv("NOTIFY_DIGEST_WINDOW", "3"))             # saniye
+DIGEST_MAX_LATENCY = float(os.getenv("NOTIFY_DIGEST_MAX_LATENCY", "15"))  # saniye
+
+
+class Digest(NamedTuple):
+    """Tek kullanıcı ve hat/tarih için birleştirilmiş bildirim"""
+    user_id: Optional[int]
+    from_station: str
+    to_station: str
+    date: str
+    offers: List[Tuple[str, Optional[str]]]   # (vagon tipi, fiyat), geliş sırasıyla
+    timestamp: str
+    reason: str = 'opened'                    # 'opened' (DOLU → MÜSAİT) veya 'price_drop'
+
+    def summary(self) -> str:
+        """Örn. "YATAKLI 850,00 TL, BUSINESS 600,00 TL" """
+        return ", ".join(f"{wagon} {price}" if price else wagon for wagon, price in self.offers)
+
+
+class _Pending:
+    __slots__ = ('offers', 'timestamp', 'first_at', 'last_at')
+
+    def __init__(self, now: float):
+        self.offers: Dict[str, Optional[str]] = {}
+        self.timestamp = ''
+        self.first_at = now
+        self.last_at = now
+
+
+class NotificationDigest:
+    """
+    Geçişleri (kullanıcı, hat, tarih) bazında toplayan bekleme alanı
+
+    Aynı vagon tipi pencere içinde tekrar gelirse yalnızca fiyatı güncellenir.
+    """
+
+    def __init__(self, window: float = DIGEST_WINDOW, max_latency: float = DIGEST_MAX_LATENCY):
+        self.window = window
+        self.max_latency = max(max_latency, window)
+        self._pending: Dict[tuple, _Pending] = {}
+
+    def add(self, ticket_status, wagon_type: str, user_id: Optional[int] = None, now: Optional[float] = None,
+            reason: str = 'opened'):
+        """Bir DOLU → MÜSAİT geçişini veya fiyat düşüşünü özete ekle (ticket_status: TicketStatus)"""
+        now = time.monotonic() if now is None else now
+        key = (user_id, ticket_status.from_station, ticket_status.to_station, ticket_status.date, reason)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _Pending(now)
+        pending.offers[wagon_type] = ticket_status.price
+        pending.timestamp = ticket_status.timestamp
+        pending.last_at = now
+
+    def _digest(self, key: tuple) -> Digest:
+        pending = self._pending.pop(key)
+        user_id, from_station, to_station, date, reason = key
+        return Digest(user_id, from_station, to_station, date, list(pending.offers.items()), pending.timestamp, reason)
+
+    def pop_due(self, now: Optional[float] = None) -> List[Digest]:
+        """Penceresi kapanmış veya azami gecikmeye ulaşmış özetler"""
+        now = time.monotonic() if now is None else now
+        due = [key for key, pending in self._pending.items()
+               if now - pending.last_at >= self.window or now - pending.first_at >= self.max_latency]
+        return [self._digest(key) for key in due]
+
+    def pop_all(self) -> List[Digest]:
+        """Bekleyen tüm özetler (çıkışta veya tur sonunda)"""
+        return [self._digest(key) for key in list(self._pending)]
+
+    def __len__(self) -> int:
+        return len(self._pending)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+TCDD İzleyici - Yakalamaları Çevrimdışı Yeniden Ayrıştırma
+
+capture_store.py'nin kaydettiği sonuç sayfalarını, siteye hiç istek
+atmadan, izleyicinin ayrıştırıcısından (_check_all_wagon_availability)
+tekrar geçirir. Ayrıştırıcıda yapılan bir değişiklik binlerce gerçek
+yakalama üzerinde denenebilir ve ölçülebilir:
+
+    - Boş sonuç / vagon bulunan yakalama sayısı
+    - Yakalama anındaki ayrıştırma sonucundan farklı çıkan yakalamalar
+    - Yakalama başına ayrıştırma süresi (medyan, p95)
+
+Tüm ağ istekleri engellenir; sayfa page.set_content() ile yüklenir.
+
+KULLANIM:
+    python reparse_captures.py --reason empty --diff
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+# Yeniden ayrıştırma geçmiş deposuna yazmamalı
+os.environ.setdefault("HISTORY_ENABLED", "0")
+
+from capture_store import CAPTURE_DIR, CaptureStore
+from tcdd_watcher import TCDDWatcher, WagonType, launch_browser
+
+
+def _watcher_for(record: dict) -> TCDDWatcher:
+    watcher = TCDDWatcher(
+        from_station=record['from'],
+        to_station=record['to'],
+        date=record['date'],
+        wagon_type=WagonType(record.get('wagon_type', 'ALL')),
+        passengers=int(record.get('passengers', 1)),
+        exit_on_found=False,
+        notify=False,
+        state={}
+    )
+    watcher.capture = None
+    return watcher
+
+
+async def reparse(store: CaptureStore, reason: str = None, limit: int = None, verbose: bool = False):
+    from playwright.async_api import async_playwright
+
+    rows = []
+    async with async_playwright() as p:
+        browser = await launch_browser(p)
+        context = await browser.new_context()
+        # Çevrimdışı: yakalanan sayfanın stil/görsel istekleri dahil hiçbir istek çıkmaz
+        await context.route('**/*', lambda route: route.abort())
+        page = await context.new_page()
+        try:
+            for record in store:
+                if reason and record.get('reason') != reason:
+                    continue
+                if limit is not None and len(rows) >= limit:
+                    break
+
+                watcher = _watcher_for(record)
+                await page.set_content(record['html'], wait_until='domcontentloaded')
+                output = io.StringIO()
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(sys.stdout if verbose else output):
+                    parsed = await watcher._check_all_wagon_availability(page)
+                elapsed = time.perf_counter() - started
+
+                wagons = {wagon.value: data for wagon, data in parsed['wagons'].items()}
+                rows.append({
+                    'check_id': record['check_id'],
+                    'reason': record.get('reason'),
+                    'wagons': wagons,
+                    'captured_wagons': record.get('wagons') or {},
+                    'changed': wagons != (record.get('wagons') or {}),
+                    'parse_ms': elapsed * 1000
+                })
+        finally:
+            await browser.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TCDD İzleyici - Yakalamaları Yeniden Ayrıştır')
+    parser.add_argument('--dir', dest='directory', default=CAPTURE_DIR, help='Yakalama dizini')
+    parser.add_argument('--reason', default=None, help='Yalnızca bu nedenle alınan yakalamalar (timeout, empty, all)')
+    parser.add_argument('--limit', type=int, default=None, help='En fazla bu kadar yakalama işle')
+    parser.add_argument('--diff', action='store_true', help='Sonucu yakalama anındakinden farklı olanları listele')
+    parser.add_argument('--verbose', action='store_true', help='Ayrıştırıcı çıktısını göster')
+    args = parser.parse_args()
+
+    store = CaptureStore(args.directory)
+    rows = asyncio.run(reparse(store, args.reason, args.limit, args.verbose))
+    if not rows:
+        print("[INFO] İşlenecek yakalama yok")
+        sys.exit(0)
+
+    if args.diff:
+        for row in rows:
+            if row['changed']:
+                print(json.dumps({
+                    'check_id': row['check_id'],
+                    'captured': row['captured_wagons'],
+                    'reparsed': row['wagons']
+                }, ensure_ascii=False))
+
+    timings = sorted(row['parse_ms'] for row in rows)
+    print(f"\nYakalama: {len(rows)}")
+    print(f"Vagon bulunan: {sum(1 for row in rows if row['wagons'])}")
+    print(f"Boş sonuç: {sum(1 for row in rows if not row['wagons'])}")
+    print(f"Yakalama anından farklı: {sum(1 for row in rows if row['changed'])}")
+    print(f"Ayrıştırma süresi: medyan {statistics.median(timings):.1f} ms, "
+          f"p95 {timings[min(len(timings) - 1, int(len(timings) * 0.95))]:.1f} ms")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
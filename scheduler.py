@@ -0,0 +1,249 @@
+"""
+TCDD İzleyici - Adil Paylaşımlı Zamanlama ve Kabul Kontrolü
+
+api_server'da her istemci /api/watch'a sabit 1,5 dakika aralıkla izleme
+başlatabiliyordu ve bir kapasite kavramı yoktu. Bu modül:
+
+KAPASİTE MODELİ (CapacityModel):
+    Sunucunun dakikada kaldırabileceği kontrol sayısı, son kontrol
+    sürelerinin medyanından tahmin edilir:
+        kapasite = CHECK_WORKERS × 60 / medyan_süre × TARGET_UTILIZATION
+    Bir izlemenin talebi dakikada 1 / aralık kontrol kadardır.
+
+ADİL PAYLAŞIM (FairScheduler):
+    Her kullanıcının payı ağırlığıyla orantılıdır (USER_WEIGHTS); boş iş
+    yuvaları ağırlığı 1 olan kullanıcılar gibi sayılır, böylece yeni gelenlere
+    her zaman yer kalır. Talebi payını aşan izleme daha uzun (degrade)
+    aralıkla kabul edilir.
+
+KABUL KONTROLÜ:
+    - Pay, MAX_DEGRADED_INTERVAL'dan kısa bir aralığa yetiyorsa: kabul
+    - İş yuvaları (MAX_WATCH_JOBS) doluysa veya pay yetmiyorsa: kuyruk
+      (ağırlıklı adil kuyruk: sanal bitiş zamanı en küçük olan önce çıkar)
+    - Kuyruk da doluysa (MAX_QUEUE): ret (HTTP 429)
+"""
+
+import os
+import statistics
+import time
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+# Konfigürasyon
+CHECK_WORKERS = int(os.getenv("CHECK_WORKERS", str(os.cpu_count() or 1)))   # eşzamanlı kontrol (çekirdek)
+MAX_WATCH_JOBS = int(os.getenv("MAX_WATCH_JOBS", "8"))
+MAX_QUEUE = int(os.getenv("MAX_QUEUE", "50"))
+TARGET_UTILIZATION = float(os.getenv("TARGET_UTILIZATION", "0.8"))
+MAX_DEGRADED_INTERVAL = float(os.getenv("MAX_DEGRADED_INTERVAL", "10"))    # dakika
+DEFAULT_CHECK_SECONDS = 30.0      # Ölçüm yokken varsayılan kontrol süresi
+DEFAULT_JOB_MINUTES = 60.0        # Ölçüm yokken varsayılan iş ömrü (bekleme tahmini için)
+LATENCY_WINDOW = 50
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """USER_WEIGHTS: "7:2,12:0.5" -> {'7': 2.0, '12': 0.5}"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        user, _, weight = item.partition(':')
+        try:
+            weights[user.strip()] = max(float(weight), 0.01)
+        except ValueError:
+            print(f"[WARNING] Geçersiz kullanıcı ağırlığı: {item}")
+    return weights
+
+
+USER_WEIGHTS = parse_weights(os.getenv("USER_WEIGHTS", ""))
+
+
+class CapacityModel:
+    """Son kontrol sürelerinden dakikadaki kontrol kapasitesi"""
+
+    def __init__(self, workers: int = CHECK_WORKERS, utilization: float = TARGET_UTILIZATION):
+        self.workers = max(1, workers)
+        self.utilization = utilization
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._job_minutes = deque(maxlen=LATENCY_WINDOW)
+
+    def record_check(self, seconds: float):
+        self._latencies.append(seconds)
+
+    def record_job(self, minutes: float):
+        self._job_minutes.append(minutes)
+
+    def latency(self) -> float:
+        """Kontrol süresi tahmini (saniye)"""
+        return statistics.median(self._latencies) if self._latencies else DEFAULT_CHECK_SECONDS
+
+    def job_minutes(self) -> float:
+        """Bir izleme işinin ortalama ömrü (dakika)"""
+        return statistics.median(self._job_minutes) if self._job_minutes else DEFAULT_JOB_MINUTES
+
+    def checks_per_minute(self) -> float:
+        return self.workers * 60.0 / max(self.latency(), 0.1) * self.utilization
+
+
+class Grant(NamedTuple):
+    """Kabul edilmiş izleme"""
+    user: str
+    requested_interval: float     # dakika
+    interval: float               # verilen aralık (dakika)
+    weight: float
+    started_at: float
+    payload: Any = None
+
+    @property
+    def degraded(self) -> bool:
+        return self.interval > self.requested_interval
+
+    @property
+    def demand(self) -> float:
+        """Dakikadaki kontrol sayısı"""
+        return 1.0 / self.interval
+
+
+class _Waiting(NamedTuple):
+    tag: float                    # Sanal bitiş zamanı (WFQ)
+    user: str
+    interval: float
+    weight: float
+    payload: Any
+    enqueued_at: float
+
+
+class Decision(NamedTuple):
+    """Kabul kararı: 'admitted', 'queued' veya 'rejected'"""
+    outcome: str
+    interval: Optional[float] = None
+    degraded: bool = False
+    position: Optional[int] = None
+    estimated_wait: Optional[float] = None   # saniye
+
+
+class FairScheduler:
+    """Kullanıcı başına ağırlıklı adil paylaşım ve kabul kontrolü"""
+
+    def __init__(self, capacity: Optional[CapacityModel] = None, max_jobs: int = MAX_WATCH_JOBS,
+                 max_queue: int = MAX_QUEUE, weights: Optional[Dict[str, float]] = None,
+                 max_interval: float = MAX_DEGRADED_INTERVAL):
+        self.capacity = capacity or CapacityModel()
+        self.max_jobs = max(1, max_jobs)
+        self.max_queue = max_queue
+        self.weights = USER_WEIGHTS if weights is None else weights
+        self.max_interval = max_interval
+        self.active: Dict[str, Grant] = {}
+        self._queue: List[_Waiting] = []
+        self._finish_tags: Dict[str, float] = {}
+        self._virtual_time = 0.0
+
+    def weight(self, user: str) -> float:
+        return self.weights.get(str(user), 1.0)
+
+    def _grant_interval(self, user: str, interval: float) -> Optional[float]:
+        """Yeni izlemeye verilebilecek aralık (yetmiyorsa None)"""
+        if len(self.active) >= self.max_jobs:
+            return None
+        capacity = self.capacity.checks_per_minute()
+        weight = self.weight(user)
+        # Boş yuvalar ağırlığı 1 olan kullanıcılar sayılır: yeni gelenlere pay kalır
+        free_slots = self.max_jobs - len(self.active) - 1
+        total_weight = sum(g.weight for g in self.active.values()) + weight + free_slots
+        share = capacity * weight / total_weight
+        remaining = capacity - sum(g.demand for g in self.active.values())
+        rate = min(1.0 / interval, share, remaining)
+        if rate <= 0 or 1.0 / rate > self.max_interval:
+            return None
+        return max(interval, 1.0 / rate)
+
+    def _estimated_wait(self, position: int) -> float:
+        """Kuyruktaki sıra için tahmini bekleme (saniye)"""
+        return self.capacity.job_minutes() * 60.0 * position / self.max_jobs
+
+    def admit(self, user: str, interval: float, payload: Any = None) -> Decision:
+        """
+        İzleme isteğini değerlendir
+
+        Aynı kullanıcının önceki izlemesi ve kuyruktaki isteği bu istekle
+        değiştirilir (çağıran önceki işi durdurmalıdır).
+        """
+        user = str(user)
+        self.active.pop(user, None)
+        self._queue = [w for w in self._queue if w.user != user]
+
+        if not self._queue:
+            granted = self._grant_interval(user, interval)
+            if granted is not None:
+                self.active[user] = Grant(user, interval, granted, self.weight(user), time.time(), payload)
+                return Decision('admitted', interval=granted, degraded=granted > interval)
+
+        if len(self._queue) >= self.max_queue:
+            return Decision('rejected', estimated_wait=self._estimated_wait(len(self._queue) + 1))
+
+        weight = self.weight(user)
+        tag = max(self._virtual_time, self._finish_tags.get(user, 0.0)) + 1.0 / weight
+        self._finish_tags[user] = tag
+        self._queue.append(_Waiting(tag, user, interval, weight, payload, time.time()))
+        self._queue.sort()
+        position = self.position(user)
+        return Decision('queued', position=position, estimated_wait=self._estimated_wait(position))
+
+    def release(self, user: str, payload: Any = None) -> List[tuple]:
+        """
+        İzleme bitti veya durduruldu; boşalan kapasiteyle kuyruktan kabul et
+
+        payload verilirse yalnızca o isteğe ait kabul/kuyruk kaydı silinir
+        (kullanıcı bu arada yeni bir izleme başlatmış olabilir).
+
+        Returns:
+            List[tuple]: Başlatılması gereken (kullanıcı, verilen aralık, payload) üçlüleri
+        """
+        user = str(user)
+        grant = self.active.get(user)
+        if grant is not None and (payload is None or grant.payload is payload):
+            del self.active[user]
+            self.capacity.record_job((time.time() - grant.started_at) / 60.0)
+        self._queue = [w for w in self._queue if w.user != user or (payload is not None and w.payload is not payload)]
+
+        started = []
+        while self._queue:
+            head = self._queue[0]
+            granted = self._grant_interval(head.user, head.interval)
+            if granted is None:
+                break
+            self._queue.pop(0)
+            self._virtual_time = head.tag
+            self.active[head.user] = Grant(head.user, head.interval, granted, head.weight, time.time(), head.payload)
+            started.append((head.user, granted, head.payload))
+        # Sanal zamanın gerisinde kalan etiketler artık sırayı etkilemez
+        self._finish_tags = {u: tag for u, tag in self._finish_tags.items() if tag > self._virtual_time}
+        return started
+
+    def position(self, user: str) -> Optional[int]:
+        """Kullanıcının kuyruktaki sırası (1'den başlar)"""
+        for index, waiting in enumerate(self._queue):
+            if waiting.user == str(user):
+                return index + 1
+        return None
+
+    def cancel(self, user: str) -> bool:
+        """Kullanıcının kuyruktaki isteğini sil"""
+        before = len(self._queue)
+        self._queue = [w for w in self._queue if w.user != str(user)]
+        return len(self._queue) != before
+
+    def status(self) -> Dict:
+        capacity = self.capacity.checks_per_minute()
+        demand = sum(g.demand for g in self.active.values())
+        # Şimdi gelen yeni bir isteğin tahmini beklemesi
+        saturated = bool(self._queue) or len(self.active) >= self.max_jobs
+        return {
+            'active_jobs': len(self.active),
+            'max_jobs': self.max_jobs,
+            'queue_depth': len(self._queue),
+            'estimated_wait_seconds': round(self._estimated_wait(len(self._queue) + 1)) if saturated else 0,
+            'capacity_checks_per_minute': round(capacity, 2),
+            'demand_checks_per_minute': round(demand, 2),
+            'utilization': round(demand / capacity, 3) if capacity else None,
+            'check_latency_seconds': round(self.capacity.latency(), 1),
+            'degraded_jobs': sum(1 for g in self.active.values() if g.degraded)
+        }
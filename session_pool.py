@@ -0,0 +1,257 @@
+"""
+TCDD İzleyici - Site Oturum Havuzu
+
+Her kontrol yeni bir browser context'i ile başladığı için BASE_URL'e her
+sorguda TLS el sıkışması, çerez anlaşması ve sitenin oturum token'ları
+baştan yapılıyordu. Bu modül iki katmanda yeniden kullanım sağlar:
+
+    SessionJar   Sitenin oturum çerezleri (token'lar dahil) süreç genelinde
+                 tek kopya tutulur; yeni açılan her context bununla
+                 tohumlanır. Oturum, en kısa ömürlü çerezin bitişinden veya
+                 SESSION_MAX_AGE'den SESSION_REFRESH_MARGIN saniye önce
+                 yenilenir; yenilemeyi tek bir kontrol yapar (single-flight),
+                 diğerleri o sırada geçerli oturumu kullanmaya devam eder.
+
+    SessionPool  Browser başına en fazla SESSION_POOL_SIZE context açık
+                 tutulur; kontroller bu context'lerde yeni bir sayfa açar,
+                 böylece keep-alive bağlantılar ve bağlantı havuzu sıcak
+                 kalır. Bir context aynı anda tek kontrole verilir; hata
+                 alan, SESSION_MAX_AGE'i dolan veya eski oturumla kalan
+                 context kapatılıp yerine yenisi açılır.
+
+SESSION_POOL_SIZE=0 (varsayılan) iken her kontrol eskisi gibi kendi
+context'ini açar ve kapatır; çerez paylaşımı yine de yapılır.
+
+Havuz browser nesnesinin bir özniteliğinde tutulur; havuzun context açan
+fonksiyonu browser'ı referansladığı için ayrı bir (zayıf anahtarlı bile
+olsa) tabloda tutulması browser'ı hiç serbest bırakmazdı.
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+# Konfigürasyon
+SESSION_POOL_SIZE = int(os.getenv("SESSION_POOL_SIZE", "0"))             # browser başına açık context
+SESSION_MAX_AGE = float(os.getenv("SESSION_MAX_AGE", "1200"))           # saniye
+SESSION_REFRESH_MARGIN = float(os.getenv("SESSION_REFRESH_MARGIN", "120"))
+
+
+class SessionJar:
+    """Tüm context'lerin paylaştığı site oturumu"""
+
+    def __init__(self, max_age: float = SESSION_MAX_AGE, margin: float = SESSION_REFRESH_MARGIN):
+        self.max_age = max_age
+        self.margin = margin
+        self.cookies: List[Dict] = []
+        self.expires_at = 0.0
+        self.generation = 0          # Her yenilemede artar; eski context'ler emekliye ayrılır
+        self.refreshing = False
+
+    def valid(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return bool(self.cookies) and now < self.expires_at
+
+    def due_for_refresh(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return not self.cookies or now >= self.expires_at - self.margin
+
+    def begin_refresh(self) -> bool:
+        """Yenileme gerekiyorsa ve başka bir kontrol yapmıyorsa yenilemeyi üstlen"""
+        if self.refreshing or not self.due_for_refresh():
+            return False
+        self.refreshing = True
+        return True
+
+    def end_refresh(self):
+        self.refreshing = False
+
+    def update(self, cookies: List[Dict], renewed: bool = False):
+        """
+        Context'ten okunan çerezleri kaydet
+
+        Args:
+            renewed: Çerezler taze bir oturumdan geldi (generation artar)
+        """
+        if not cookies:
+            return
+        now = time.time()
+        if renewed or not self.cookies:
+            self.generation += 1
+            self.expires_at = now + self.max_age
+        self.cookies = cookies
+        # Oturum en kısa ömürlü kalıcı çerez kadar geçerlidir (-1: tarayıcı oturumu çerezi)
+        expiries = [cookie['expires'] for cookie in cookies if cookie.get('expires', -1) > 0]
+        if expiries:
+            self.expires_at = min(self.expires_at, min(expiries))
+
+
+class _Slot:
+    __slots__ = ('context', 'created_at', 'generation')
+
+    def __init__(self, context, generation: int):
+        self.context = context
+        self.created_at = time.monotonic()
+        self.generation = generation
+
+
+class Lease:
+    """Bir kontrole verilen sayfa; close() ile havuza iade edilir"""
+
+    __slots__ = ('page', '_pool', '_slot', '_refresh')
+
+    def __init__(self, page, pool: 'SessionPool', slot: _Slot, refresh: bool):
+        self.page = page
+        self._pool = pool
+        self._slot = slot
+        self._refresh = refresh
+
+    async def close(self, ok: bool = True):
+        """
+        Sayfayı bırak
+
+        Args:
+            ok: Kontrol başarılı mı? Başarısız kontrolün context'i yeniden kullanılmaz.
+        """
+        await self._pool._release(self, ok)
+
+
+class SessionPool:
+    """Bir browser'ın oturumu paylaşan context havuzu"""
+
+    def __init__(self, new_context: Callable[[], Awaitable], base_url: str, jar: SessionJar,
+                 size: int = SESSION_POOL_SIZE):
+        self._new_context = new_context
+        self.base_url = base_url
+        self.jar = jar
+        self.size = size
+        self._idle: List[_Slot] = []
+        self._open = 0
+        self._available: Optional[asyncio.Condition] = None
+
+    async def _create(self, seed: bool) -> _Slot:
+        context = await self._new_context()
+        if seed:
+            await context.add_cookies(self.jar.cookies)
+        return _Slot(context, self.jar.generation if seed else 0)
+
+    def _stale(self, slot: _Slot) -> bool:
+        return (slot.generation != self.jar.generation or not self.jar.valid()
+                or time.monotonic() - slot.created_at > self.jar.max_age)
+
+    async def acquire(self) -> Lease:
+        """Kontrol için sayfa (gerekirse context açılır veya boş context beklenir)"""
+        refresh = self.jar.begin_refresh()
+        try:
+            if self.size <= 0:
+                # Havuzsuz mod: tek kullanımlık context; yenilemede tohumlanmaz
+                slot = await self._create(seed=not refresh and self.jar.valid())
+            else:
+                slot = await self._checkout(refresh)
+            page = await slot.context.new_page()
+        except BaseException:
+            if refresh:
+                self.jar.end_refresh()
+            raise
+        return Lease(page, self, slot, refresh)
+
+    async def _checkout(self, refresh: bool) -> _Slot:
+        if self._available is None:
+            self._available = asyncio.Condition()
+        async with self._available:
+            while True:
+                while self._idle:
+                    slot = self._idle.pop()
+                    if not refresh and not self._stale(slot):
+                        return slot
+                    # Yenileme boş bir context'in yerine tohumsuz yenisini açar
+                    self._open -= 1
+                    await self._discard(slot)
+                    if refresh:
+                        break
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                await self._available.wait()
+        try:
+            return await self._create(seed=not refresh and self.jar.valid())
+        except BaseException:
+            await self._returned(None)
+            raise
+
+    async def _release(self, lease: Lease, ok: bool):
+        slot = lease._slot
+        try:
+            # Eski oturumla açılmış context'in çerezleri yeni oturumu ezmemeli
+            if ok and (lease._refresh or slot.generation == self.jar.generation):
+                try:
+                    self.jar.update(await slot.context.cookies([self.base_url]), renewed=lease._refresh)
+                    if lease._refresh:
+                        slot.generation = self.jar.generation
+                except Exception as e:
+                    print(f"[WARNING] Oturum çerezleri okunamadı: {e}")
+                    ok = False
+        finally:
+            if lease._refresh:
+                self.jar.end_refresh()
+
+        if self.size <= 0:
+            await self._discard(slot)
+            return
+        try:
+            await lease.page.close()
+        except Exception:
+            ok = False
+        if ok and not self._stale(slot):
+            await self._returned(slot)
+        else:
+            await self._returned(None, discard=slot)
+
+    async def _returned(self, slot: Optional[_Slot], discard: Optional[_Slot] = None):
+        """Context'i boşta listesine geri koy (None: kapatıldı) ve bekleyeni uyandır"""
+        if slot is None:
+            self._open -= 1
+            if discard is not None:
+                await self._discard(discard)
+        if self._available is None:
+            self._available = asyncio.Condition()
+        async with self._available:
+            if slot is not None:
+                self._idle.append(slot)
+            self._available.notify()
+
+    @staticmethod
+    async def _discard(slot: _Slot):
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        self._open -= len(idle)
+        for slot in idle:
+            await self._discard(slot)
+
+
+# Süreç genelinde tek site oturumu; havuzlar browser ile birlikte yok olur
+SITE_SESSION = SessionJar()
+POOL_ATTRIBUTE = '_tcdd_session_pool'
+
+
+async def open_page(browser, new_context: Callable[[], Awaitable], base_url: str) -> Lease:
+    """
+    Browser'ın oturum havuzundan kontrol sayfası al
+
+    Args:
+        browser: Playwright browser
+        new_context: Yeni context açan fonksiyon (UA, viewport, locale ayarlı)
+        base_url: Çerezlerin okunacağı site adresi
+    """
+    pool = getattr(browser, POOL_ATTRIBUTE, None)
+    if pool is None:
+        pool = SessionPool(new_context, base_url, SITE_SESSION)
+        setattr(browser, POOL_ATTRIBUTE, pool)
+    return await pool.acquire()
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+TCDD İzleyici - Çok Çekirdekli Shard Çalışma Zamanı
+
+Chromium render'ı ve Playwright sürücüsü CPU yoğundur; tek Python süreci
+tek çekirdeği doyurur. Bu modül izlemeleri N worker sürecine (varsayılan:
+çekirdek başına bir tane) dağıtır. Her worker kendi browser havuzunu yönetir.
+
+Hatlar shard'lara (from, to, date) üzerinden tutarlı hash (consistent
+hashing) ile atanır; böylece aynı hat hep aynı worker'a gider ve worker
+içindeki izleyici önbellekleri sıcak kalır. Bir worker ölürse hash
+halkasından çıkarılır, bekleyen işleri diğer shard'lara yeniden dağıtılır
+ve worker yeniden başlatılır.
+
+KULLANIM:
+    python shard_runtime.py --config watches.json --workers 16 --interval 1.5
+
+watches.json örneği (user_id, fcm_token ve max_price (TL) isteğe bağlıdır):
+    [
+        {"from": "Çiğli", "to": "Konya", "date": "2026-01-20", "wagon_type": "YATAKLI", "passengers": 1,
+         "user_id": 7, "fcm_token": "...", "max_price": 900}
+    ]
+
+Aynı hattı izleyen tüm abonelikler için turda tek kontrol yapılır; sonuç
+subscriptions.SubscriptionIndex ile abonelere çözülür.
+"""
+
+import argparse
+import asyncio
+import bisect
+import hashlib
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+# Konfigürasyon
+VIRTUAL_NODES = 64          # Her shard için hash halkasındaki sanal düğüm sayısı
+MAX_WORKER_RESTARTS = 5     # Sürekli çöken bir shard'ı halkadan kalıcı olarak çıkar
+BROWSERS_PER_WORKER = int(os.getenv("BROWSERS_PER_WORKER", "1"))
+OPENING_MODEL_REFIT = float(os.getenv("OPENING_MODEL_REFIT_MINUTES", "60")) * 60   # Açılma modelinin yenilenme aralığı (sn)
+
+
+def route_key(from_station: str, to_station: str, date: str) -> str:
+    """Shard ataması için hat anahtarı"""
+    return f"{from_station}|{to_station}|{date}"
+
+
+def job_id_for(watch: Dict) -> str:
+    """İzleme tanımı için benzersiz iş kimliği"""
+    return (f"{watch['from']}_{watch['to']}_{watch['date']}_"
+            f"{watch.get('wagon_type', 'ALL')}_{watch.get('passengers', 1)}p")
+
+
+class HashRing:
+    """
+    Sanal düğümlü tutarlı hash halkası
+
+    Bir shard eklendiğinde/çıkarıldığında yalnızca o shard'ın aralığındaki
+    anahtarlar yer değiştirir.
+    """
+
+    def __init__(self, nodes=(), vnodes: int = VIRTUAL_NODES):
+        self.vnodes = vnodes
+        self._hashes: List[int] = []
+        self._owners: Dict[int, int] = {}
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+    def add(self, node: int):
+        """Shard'ı halkaya ekle"""
+        for i in range(self.vnodes):
+            h = self._hash(f"shard-{node}#{i}")
+            if h in self._owners:
+                continue
+            bisect.insort(self._hashes, h)
+            self._owners[h] = node
+
+    def remove(self, node: int):
+        """Shard'ı halkadan çıkar"""
+        kept = [h for h in self._hashes if self._owners[h] != node]
+        for h in self._hashes:
+            if self._owners[h] == node:
+                del self._owners[h]
+        self._hashes = kept
+
+    def nodes(self) -> List[int]:
+        return sorted(set(self._owners.values()))
+
+    def get(self, key: str) -> Optional[int]:
+        """Anahtarın sahibi olan shard"""
+        if not self._hashes:
+            return None
+        idx = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._owners[self._hashes[idx]]
+
+
+class BrowserPool:
+    """
+    Worker içi browser havuzu
+
+    Sabit sayıda Chromium açık tutulur; her kontrol havuzdan bir browser
+    alır, kendi context'ini açar ve bitince browser'ı geri bırakır.
+    Bağlantısı kopmuş browser'lar yeniden başlatılır.
+    """
+
+    def __init__(self, playwright, size: int = 1):
+        self.playwright = playwright
+        self.size = max(1, size)
+        self._available: asyncio.Queue = asyncio.Queue()
+        self._browsers = []
+
+    async def start(self):
+        from tcdd_watcher import launch_browser
+
+        for _ in range(self.size):
+            browser = await launch_browser(self.playwright)
+            self._browsers.append(browser)
+            self._available.put_nowait(browser)
+
+    async def acquire(self):
+        from tcdd_watcher import launch_browser
+
+        browser = await self._available.get()
+        if not browser.is_connected():
+            print("[WARNING] Browser bağlantısı kopmuş, yeniden başlatılıyor...")
+            self._browsers.remove(browser)
+            browser = await launch_browser(self.playwright)
+            self._browsers.append(browser)
+        return browser
+
+    def release(self, browser):
+        self._available.put_nowait(browser)
+
+    async def close(self):
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self._browsers = []
+
+
+async def _run_job(pool: BrowserPool, watchers: Dict, job: Dict, result_queue, shard_id: int):
+    """Tek bir izleme işini havuzdaki bir browser ile çalıştır"""
+    from tcdd_watcher import TCDDWatcher, WagonType
+
+    job_id = job['id']
+    watcher = watchers.get(job_id)
+    if watcher is None:
+        # İzleyici worker ömrü boyunca saklanır (state ve önbellekler sıcak kalır)
+        watcher = TCDDWatcher(
+            from_station=job['from'],
+            to_station=job['to'],
+            date=job['date'],
+            wagon_type=WagonType(job.get('wagon_type', 'ALL')),
+            passengers=int(job.get('passengers', 1)),
+            exit_on_found=False,
+            notify=False  # Bildirimler ana süreçte abonelik indeksiyle toplu gönderilir
+        )
+        watchers[job_id] = watcher
+
+    started = time.monotonic()
+    browser = await pool.acquire()
+    try:
+        result = await watcher.check(browser=browser)
+        error = None if result is not None else 'check_failed'
+    except Exception as e:
+        result, error = None, str(e)
+    finally:
+        pool.release(browser)
+
+    result_queue.put({
+        'id': job_id,
+        'shard': shard_id,
+        'result': result,
+        'error': error,
+        'duration': time.monotonic() - started
+    })
+
+
+async def _worker_loop(shard_id: int, job_queue, result_queue, browsers_per_worker: int):
+    from playwright.async_api import async_playwright
+
+    loop = asyncio.get_running_loop()
+    watchers: Dict = {}
+    tasks = set()
+
+    async with async_playwright() as p:
+        pool = BrowserPool(p, browsers_per_worker)
+        await pool.start()
+        print(f"[INFO] Shard {shard_id} hazır (pid={os.getpid()}, browser={pool.size})")
+
+        try:
+            while True:
+                job = await loop.run_in_executor(None, job_queue.get)
+                if job is None:
+                    break
+                task = asyncio.create_task(_run_job(pool, watchers, job, result_queue, shard_id))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await pool.close()
+
+
+def _worker_main(shard_id: int, job_queue, result_queue, browsers_per_worker: int):
+    """Worker süreci giriş noktası"""
+    try:
+        asyncio.run(_worker_loop(shard_id, job_queue, result_queue, browsers_per_worker))
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardSupervisor:
+    """
+    Worker süreçlerini başlatan, işleri hash halkasına göre dağıtan ve
+    ölen worker'ları yeniden dengeleyen ana süreç bileşeni
+    """
+
+    def __init__(self, workers: Optional[int] = None, browsers_per_worker: int = BROWSERS_PER_WORKER):
+        self.num_workers = workers or os.cpu_count() or 1
+        self.browsers_per_worker = browsers_per_worker
+        self.ring = HashRing()
+        self.result_queue = mp.Queue()
+        self._processes: Dict[int, mp.Process] = {}
+        self._job_queues: Dict[int, mp.Queue] = {}
+        self._restarts: Dict[int, int] = {}
+        # job_id -> (shard_id, job)
+        self.inflight: Dict[str, Tuple[int, Dict]] = {}
+
+    def start(self):
+        for shard_id in range(self.num_workers):
+            self._spawn(shard_id)
+            self.ring.add(shard_id)
+        print(f"[INFO] {self.num_workers} shard başlatıldı")
+
+    def _spawn(self, shard_id: int):
+        job_queue = mp.Queue()
+        process = mp.Process(
+            target=_worker_main,
+            args=(shard_id, job_queue, self.result_queue, self.browsers_per_worker),
+            name=f"tcdd-shard-{shard_id}",
+            daemon=True
+        )
+        process.start()
+        self._processes[shard_id] = process
+        self._job_queues[shard_id] = job_queue
+
+    def shard_for(self, watch: Dict) -> Optional[int]:
+        return self.ring.get(route_key(watch['from'], watch['to'], watch['date']))
+
+    def submit(self, watch: Dict) -> Optional[int]:
+        """İzleme işini sahibi olan shard'a gönder"""
+        job = dict(watch)
+        job['id'] = job.get('id') or job_id_for(watch)
+        if job['id'] in self.inflight:
+            return self.inflight[job['id']][0]
+
+        shard_id = self.shard_for(job)
+        if shard_id is None:
+            print("[ERROR] Çalışan shard kalmadı, iş gönderilemedi")
+            return None
+
+        self._job_queues[shard_id].put(job)
+        self.inflight[job['id']] = (shard_id, job)
+        return shard_id
+
+    def collect(self, timeout: float = 0.5) -> List[Dict]:
+        """Tamamlanan iş sonuçlarını topla"""
+        results = []
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.result_queue.get(timeout=max(0.0, remaining)) if remaining > 0 \
+                    else self.result_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.inflight.pop(item['id'], None)
+            results.append(item)
+        return results
+
+    def check_workers(self) -> List[int]:
+        """
+        Ölen worker'ları tespit et ve yeniden dengele
+
+        Returns:
+            List[int]: Ölmüş olarak tespit edilen shard'lar
+        """
+        dead = [sid for sid, proc in self._processes.items() if not proc.is_alive()]
+        for shard_id in dead:
+            exitcode = self._processes[shard_id].exitcode
+            print(f"[WARNING] Shard {shard_id} sonlandı (exitcode={exitcode}), yeniden dengeleniyor...")
+            self.ring.remove(shard_id)
+            del self._processes[shard_id]
+            self._job_queues.pop(shard_id, None)
+
+            # Ölen shard'daki işleri yeni sahiplerine dağıt
+            orphaned = [job for sid, job in self.inflight.values() if sid == shard_id]
+            for job in orphaned:
+                del self.inflight[job['id']]
+                self.submit(job)
+
+            self._restarts[shard_id] = self._restarts.get(shard_id, 0) + 1
+            if self._restarts[shard_id] > MAX_WORKER_RESTARTS:
+                print(f"[ERROR] Shard {shard_id} çok sık çöktü, yeniden başlatılmayacak")
+                continue
+
+            self._spawn(shard_id)
+            self.ring.add(shard_id)
+        return dead
+
+    def stop(self, timeout: float = 30):
+        for job_queue in self._job_queues.values():
+            job_queue.put(None)
+        for process in self._processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes.clear()
+        self._job_queues.clear()
+
+    def run(self, watches: List[Dict], interval_minutes: float):
+        """
+        İzlemeleri periyodik olarak shard'lar üzerinde çalıştır
+
+        İzleme tanımları bir abonelik indeksine eklenir; her hat (from, to,
+        date) için turda yalnızca bir kontrol yapılır ve sonuç, DOLU → MÜSAİT
+        koşulu tetiklenen tüm abonelere çözülür. Geçişler kısa bir pencere
+        boyunca toplanıp kullanıcı ve hat/tarih başına tek mesajda birleştirilerek
+        toplu gönderilir (bkz. notification_digest.py). Bildirim alan veya vagon
+        tipi hatta olmayan abonelikler indeksten çıkarılır.
+        """
+        from notification_digest import NotificationDigest
+        from subscriptions import Subscription, SubscriptionIndex, price_ceiling_kurus
+        from tcdd_watcher import NotificationService
+
+        index = SubscriptionIndex()
+        notifications = NotificationService()
+        digest = NotificationDigest()
+        for watch in watches:
+            user_id = int(watch.get('user_id', 0))
+            index.add(Subscription.create(watch['from'], watch['to'], watch['date'],
+                                          watch.get('wagon_type', 'ALL'), int(watch.get('passengers', 1)), user_id,
+                                          price_ceiling_kurus(watch.get('max_price'))))
+            if watch.get('fcm_token'):
+                notifications.register_token(user_id, watch['fcm_token'])
+
+        try:
+            self._run_rounds(index, notifications, digest, interval_minutes)
+        finally:
+            # Durdurulurken bekleyen özetler kaybolmasın
+            asyncio.run(notifications.send_digests(digest.pop_all()))
+
+    def _run_rounds(self, index, notifications, digest, interval_minutes: float):
+        """
+        Kontrol turları: abonelik kalmayana veya tüm shard'lar çökene kadar
+
+        Her hattın kendi sonraki kontrol zamanı vardır; burst takvimi
+        (bkz. burst_windows.py) ayarlıysa pencere boyunca aralık daraltılır,
+        BURST_RATE_BUDGET o an burst'te olan hatlara bölünür ve ilk kontrol
+        ön ısıtma anında yapılır. Normal aralık, müsaitlik geçmişinden
+        hesaplanan açılma olasılığına göre ölçeklenir (bkz.
+        history_analytics.OpeningWindowModel.interval_scale).
+        """
+        from burst_windows import load_burst_calendar
+        from history_analytics import load_opening_model
+        from tcdd_watcher import TicketStatus
+
+        calendar = load_burst_calendar()
+        model = load_opening_model()
+        model_fitted = time.monotonic()
+        route_status: Dict[tuple, Dict[str, str]] = {}
+        route_prices: Dict[tuple, Dict[str, Optional[int]]] = {}   # Fiyat düşüşü tespiti için (kuruş)
+        job_routes: Dict[str, tuple] = {}
+        next_check: Dict[tuple, float] = {}
+        # Hat başına (from, to, date) adları bir kez çözülür; abonelik eklenmediği
+        # için yalnızca hat indeksten düştüğünde silinir
+        keys: Dict[tuple, tuple] = {}
+        for route in index.routes():
+            sample = index.subscribers(route)[0]
+            keys[route] = (sample.from_station, sample.to_station, sample.date)
+        bursting, bursting_minute = 0, None   # Bütçeyi paylaşan, şu an burst'te olan hat sayısı
+
+        while len(index):
+            now = time.monotonic()
+            if model is not None and now - model_fitted >= OPENING_MODEL_REFIT:
+                model = load_opening_model() or model
+                model_fitted = now
+            due = [route for route in index.routes() if now >= next_check.get(route, 0.0)]
+            if due and calendar is not None and int(now // 60) != bursting_minute:
+                # Burst'teki hat sayısı tüm hatları taradığı için dakikada bir hesaplanır
+                bursting_minute = int(now // 60)
+                wall = datetime.now()
+                phases = (calendar.phase(key, wall) for key in keys.values())
+                bursting = sum(1 for phase in phases if phase is not None and phase.bursting(wall))
+            for route in due:
+                from_station, to_station, date = keys[route]
+                job = {'from': from_station, 'to': to_station, 'date': date,
+                       'wagon_type': 'ALL', 'passengers': 1}
+                job['id'] = job_id_for(job)
+                job_routes[job['id']] = route
+                self.submit(job)
+                interval = interval_minutes
+                if model is not None:
+                    wagons = [s.wagon_type for s in index.subscribers(route)]
+                    interval *= model.interval_scale(from_station, to_station, date, wagons)
+                if calendar is None:
+                    next_check[route] = now + interval * 60
+                else:
+                    next_check[route] = now + calendar.wait_seconds(keys[route], interval, load=bursting)
+
+            for item in self.collect(timeout=1.0):
+                route = job_routes.get(item['id'])
+                if item['error'] or route is None:
+                    print(f"[WARNING] {item['id']} (shard {item['shard']}): {item['error']}")
+                    continue
+
+                result = item['result']
+                wagons = result['wagons']
+                matches = index.match(route, wagons, route_status.get(route, {}), route_prices.get(route))
+                route_status[route] = {getattr(w, 'value', w): data['status'] for w, data in wagons.items()}
+                route_prices[route] = {getattr(w, 'value', w): data.get('price_kurus') for w, data in wagons.items()}
+                print(f"[INFO] {item['id']} (shard {item['shard']}) kontrol edildi: "
+                      f"{item['duration']:.1f} sn, {len(index.subscribers(route))} abone, {len(matches)} eşleşme")
+
+                if matches:
+                    for m in matches:
+                        digest.add(TicketStatus(m.subscription.from_station, m.subscription.to_station,
+                                                m.subscription.date, 'MUSAIT', m.price, result['timestamp']),
+                                   m.wagon_type, m.subscription.user_id, reason=m.reason)
+                    for match in matches:
+                        index.remove(match.subscription)
+                    drops = sum(1 for match in matches if match.reason == 'price_drop')
+                    print(f"[SUCCESS] {item['id']}: BİLET BULUNDU! {len(matches)} eşleşme bildirim özetine eklendi"
+                          + (f" ({drops} fiyat düşüşü)." if drops else "."))
+
+                # Seferde hiç bulunmayan vagon tipini bekleyen abonelikler
+                if wagons:
+                    present = set(route_status[route])
+                    for subscription in index.subscribers(route):
+                        if subscription.wagon_type != 'ALL' and subscription.wagon_type not in present:
+                            index.remove(subscription)
+                            print(f"[INFO] {subscription.state_key()}: Vagon tipi mevcut değil, izleme sonlandırıldı.")
+
+                if not index.wagon_codes(route):
+                    # Abonesi kalmayan hat artık taranmaz
+                    keys.pop(route, None)
+                    next_check.pop(route, None)
+
+            # Olay döngüsü yalnızca gönderilecek özet varsa kurulur
+            due_digests = digest.pop_due()
+            if due_digests:
+                asyncio.run(notifications.send_digests(due_digests))
+
+            self.check_workers()
+            if not self.ring.nodes():
+                print("[ERROR] Tüm shard'lar çöktü, çıkılıyor.")
+                break
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TCDD İzleyici - Shard Çalışma Zamanı')
+    parser.add_argument('-c', '--config', required=True,
+                        help='İzleme tanımlarını içeren JSON/YAML dosyası')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker süreci sayısı (varsayılan: CPU çekirdek sayısı)')
+    parser.add_argument('--browsers-per-worker', type=int, default=BROWSERS_PER_WORKER,
+                        help='Worker başına açık tutulan browser sayısı (varsayılan: 1)')
+    parser.add_argument('--interval', dest='interval_minutes', type=float, default=10,
+                        help='İzleme aralığı (dakika, varsayılan: 10)')
+    args = parser.parse_args()
+
+    from tcdd_watcher import load_watch_config
+
+    try:
+        watches = load_watch_config(args.config)
+    except Exception as e:
+        print(f"[ERROR] Konfigürasyon okunamadı: {e}")
+        sys.exit(2)
+    if not watches:
+        print("[ERROR] Konfigürasyonda izleme tanımı yok")
+        sys.exit(2)
+
+    supervisor = ShardSupervisor(workers=args.workers, browsers_per_worker=args.browsers_per_worker)
+    supervisor.start()
+    try:
+        supervisor.run(watches, args.interval_minutes)
+    except KeyboardInterrupt:
+        print("\n[INFO] Kullanıcı tarafından durduruldu.")
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Sanal zamanlı kapasite simülasyonu
+
+Ölçeklenme sınırlarını gerçek TCDD sitesine karşı deneyemeyiz. Bu script
+shard_runtime'ın kontrol döngüsünü sahte bir saat ve sentetik bir site
+modeliyle deterministik olarak çalıştırır. Gerçek bileşenler kullanılır:
+
+    - subscriptions.SubscriptionIndex   Hat başına tek kontrol (birleştirme)
+                                        ve DOLU → MÜSAİT eşleşmesi
+    - notification_digest               Kullanıcı ve hat başına özet bildirimi
+    - burst_windows.BurstCalendar       (--burst-calendar) hat başına aralık
+
+tcdd_watcher'ın sonuç bölgesi parmak izi kullanılmaz; değişmeyen sonuçlar
+yalnızca önceki durum dict'iyle karşılaştırılarak sayılır.
+
+Site modeli:
+    - Her hattın 1-3 vagon tipi vardır; her vagon DOLU ↔ MÜSAİT arasında
+      üstel dağılımlı sürelerle geçiş yapar (--open-rate, --close-rate)
+    - Kontrol süresi log-normaldir (--latency medyan, --latency-sigma)
+    - Kontrollerin --error-rate kadarı hata verir (zaman aşımları
+      CHECK_DEADLINE kadar sürer)
+    - --hedge-after verilirse bu sürede bitmeyen kontrol için ikinci bir
+      getirme başlatılır (bkz. CHECK_HEDGE_AFTER)
+
+Çekirdek başına --checks-per-core eşzamanlı kontrol çalışır. Rapor: saatlik
+site getirmesi, kuyruk gecikmesi ve tespit/bildirim gecikmesi yüzdelikleri,
+kaçırılan açılışlar ve çekirdek başına kapasite.
+
+KULLANIM:
+    python simulate_capacity.py --subscriptions 10000 --cores 8 --hours 6
+    python simulate_capacity.py --sweep 1000,10000,100000 --cores 16 --interval 1.5
+"""
+
+import argparse
+import heapq
+import math
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+os.environ.setdefault("HISTORY_ENABLED", "0")
+
+from burst_windows import load_burst_calendar
+from notification_digest import NotificationDigest
+from subscriptions import SAMPLE_STATIONS, Status, Subscription, SubscriptionIndex, WAGON_NAMES
+from tcdd_watcher import CHECK_DEADLINE, HEDGE_AFTER, TicketStatus
+
+WAGONS = WAGON_NAMES[:4]
+TARGET_UTILIZATION = 0.8
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class SiteModel:
+    """Hat ve vagon başına iki durumlu (DOLU/MÜSAİT) Markov süreci"""
+
+    def __init__(self, rng: random.Random, open_rate: float, close_rate: float):
+        self.rng = rng
+        self.open_rate = open_rate / 3600.0     # saniye başına
+        self.close_rate = close_rate / 3600.0
+        # (hat, vagon) -> [durum, sonraki geçiş, açılış zamanı, açılış görüldü mü]
+        self._wagons: Dict[tuple, list] = {}
+        self.openings = 0
+        self.missed = 0                         # Kapanmadan hiç görülmeyen açılışlar
+
+    def _flip_after(self, status: Status) -> float:
+        rate = self.open_rate if status == Status.DOLU else self.close_rate
+        return self.rng.expovariate(rate) if rate > 0 else math.inf
+
+    def add_route(self, route: tuple) -> List[str]:
+        """Hatta 1-3 vagon tipi oluştur (hepsi DOLU başlar)"""
+        wagons = self.rng.sample(WAGONS, self.rng.randint(1, 3))
+        for wagon in wagons:
+            self._wagons[(route, wagon)] = [Status.DOLU, self._flip_after(Status.DOLU), None, False]
+        return wagons
+
+    def observe(self, route: tuple, wagons: List[str], now: float) -> Dict[str, Dict]:
+        """Hattın `now` anındaki sonuç sayfası (watcher'ın wagons çıktısı biçiminde)"""
+        snapshot = {}
+        for wagon in wagons:
+            state = self._wagons[(route, wagon)]
+            while state[1] <= now:
+                if state[0] == Status.DOLU:
+                    state[0], state[2], state[3] = Status.MUSAIT, state[1], False
+                    self.openings += 1
+                else:
+                    if not state[3]:
+                        self.missed += 1
+                    state[0] = Status.DOLU
+                state[1] += self._flip_after(state[0])
+            if state[0] == Status.MUSAIT:
+                state[3] = True
+            snapshot[wagon] = {'status': state[0].name, 'price': '850,00 TL' if state[0] == Status.MUSAIT else None}
+        return snapshot
+
+    def opened_at(self, route: tuple, wagon: str) -> Optional[float]:
+        return self._wagons[(route, wagon)][2]
+
+
+class Simulation:
+    """shard_runtime._run_rounds'un sanal saatli karşılığı"""
+
+    def __init__(self, args, subscriptions: int):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.site = SiteModel(self.rng, args.open_rate, args.close_rate)
+        self.index = SubscriptionIndex()
+        self.digest = NotificationDigest()
+        self.calendar = load_burst_calendar(args.burst_calendar) if args.burst_calendar else None
+        self.start = datetime.strptime(args.start, '%Y-%m-%d %H:%M')
+        self.slots = args.cores * args.checks_per_core
+
+        self._build(subscriptions)
+        self.routes = self.index.routes()
+        self._route_wagons = {}
+        self._samples = {}
+        for route in self.routes:
+            self._route_wagons[route] = self.site.add_route(route)
+            self._samples[route] = self.index.subscribers(route)[0]
+
+        # Ölçümler
+        self.fetches = 0
+        self.hedges = 0
+        self.errors = 0
+        self.checks = 0
+        self.unchanged = 0
+        self.busy_seconds = 0.0
+        self.queue_delays: List[float] = []
+        self.detection_delays: List[float] = []
+        self.notify_delays: List[float] = []
+        self.matches = 0
+        self.messages = 0
+
+    def _build(self, count: int):
+        start = datetime.strptime(self.args.start, '%Y-%m-%d %H:%M').date()
+        users = max(1, self.args.users or count // 3)
+        for _ in range(count):
+            from_station, to_station = self.rng.sample(SAMPLE_STATIONS, 2)
+            travel_date = (start + timedelta(days=self.rng.randrange(self.args.dates))).isoformat()
+            self.index.add(Subscription.create(from_station, to_station, travel_date,
+                                               self.rng.choice(WAGON_NAMES), self.rng.randint(1, 4),
+                                               self.rng.randrange(users)))
+
+    def _latency(self) -> float:
+        return self.rng.lognormvariate(math.log(self.args.latency), self.args.latency_sigma)
+
+    def _wait(self, route: tuple, now: float, bursting: int) -> float:
+        if self.calendar is None:
+            return self.args.interval * 60
+        sample = self._samples[route]
+        key = (sample.from_station, sample.to_station, sample.date)
+        return self.calendar.wait_seconds(key, self.args.interval, self.start + timedelta(seconds=now), load=bursting)
+
+    def _bursting(self, now: float) -> int:
+        wall = self.start + timedelta(seconds=now)
+        count = 0
+        for sample in self._samples.values():
+            phase = self.calendar.phase((sample.from_station, sample.to_station, sample.date), wall)
+            if phase is not None and phase.bursting(wall):
+                count += 1
+        return count
+
+    def _run_check(self) -> tuple:
+        """(süre, getirme sayısı, hata mı)"""
+        fetches = 1
+        latency = self._latency()
+        hedge_after = self.args.hedge_after
+        if hedge_after > 0 and latency > hedge_after:
+            fetches += 1
+            latency = min(latency, hedge_after + self._latency())
+        if self.rng.random() < self.args.error_rate:
+            # Zaman aşımı bütçenin tamamını yer; diğer hatalar erken döner
+            return (CHECK_DEADLINE if self.rng.random() < 0.5 else latency / 2), fetches, True
+        return min(latency, CHECK_DEADLINE), fetches, False
+
+    def _flush(self, now: float, pending: Dict[tuple, List[float]], final: bool = False):
+        digests = self.digest.pop_all() if final else self.digest.pop_due(now)
+        for digest in digests:
+            self.messages += 1
+            key = (digest.user_id, digest.from_station, digest.to_station, digest.date)
+            for opened in pending.pop(key, []):
+                self.notify_delays.append(now - opened)
+
+    def run(self) -> Dict:
+        horizon = self.args.hours * 3600
+        events = []   # (zaman, sıra, tür, hat)
+        sequence = 0
+        for route in self.routes:
+            # İlk tur yayılarak başlar (shard'lara dağıtım sırası gibi)
+            events.append((self.rng.uniform(0, min(60.0, self.args.interval * 60)), sequence, 'due', route))
+            sequence += 1
+        heapq.heapify(events)
+
+        queue = deque()
+        submitted = set()          # Kuyrukta veya çalışan hatlar (shard submit tekilleştirmesi)
+        free = self.slots
+        route_status: Dict[tuple, Dict[str, str]] = {}
+        pending_notify: Dict[tuple, List[float]] = {}
+        bursting, bursting_minute = 0, -1
+        started_at = {}
+
+        while events:
+            now, _, kind, route = heapq.heappop(events)
+            if now > horizon:
+                break
+
+            if kind == 'due':
+                if route not in submitted:
+                    submitted.add(route)
+                    queue.append((route, now))
+                if self.calendar is not None and int(now // 60) != bursting_minute:
+                    bursting_minute, bursting = int(now // 60), self._bursting(now)
+                heapq.heappush(events, (now + self._wait(route, now, bursting), sequence, 'due', route))
+                sequence += 1
+
+            elif kind == 'done':
+                free += 1
+                submitted.discard(route)
+                self.busy_seconds += now - started_at.pop(route)
+                snapshot = self.site.observe(route, self._route_wagons[route], now)
+                self.checks += 1
+                previous = route_status.get(route, {})
+                current = {wagon: data['status'] for wagon, data in snapshot.items()}
+                if current == previous:
+                    self.unchanged += 1
+                matches = self.index.match(route, snapshot, previous)
+                route_status[route] = current
+                for match in matches:
+                    subscription = match.subscription
+                    opened = self.site.opened_at(route, match.wagon_type)
+                    self.detection_delays.append(now - opened)
+                    self.digest.add(TicketStatus(subscription.from_station, subscription.to_station, subscription.date,
+                                                 'MUSAIT', match.price, ''), match.wagon_type, subscription.user_id, now=now)
+                    key = (subscription.user_id, subscription.from_station, subscription.to_station, subscription.date)
+                    pending_notify.setdefault(key, []).append(opened)
+                self.matches += len(matches)
+
+            elif kind == 'failed':
+                free += 1
+                submitted.discard(route)
+                self.busy_seconds += now - started_at.pop(route)
+                self.checks += 1
+                self.errors += 1
+
+            # Boş yuvalara kuyruktan iş ver
+            while free > 0 and queue:
+                next_route, enqueued = queue.popleft()
+                self.queue_delays.append(now - enqueued)
+                duration, fetches, error = self._run_check()
+                self.fetches += fetches
+                self.hedges += fetches - 1
+                free -= 1
+                started_at[next_route] = now
+                heapq.heappush(events, (now + duration, sequence, 'failed' if error else 'done', next_route))
+                sequence += 1
+
+            self._flush(now, pending_notify)
+
+        self._flush(horizon, pending_notify, final=True)
+        return self._report(horizon, len(queue))
+
+    def _report(self, horizon: float, backlog: int) -> Dict:
+        hours = horizon / 3600
+        demand = len(self.routes) * 60 / self.args.interval           # saatlik istenen kontrol
+        successful = self.checks - self.errors
+        mean_busy = self.busy_seconds / self.checks if self.checks else self.args.latency
+        per_core = self.args.checks_per_core * 3600 / mean_busy       # doygun çekirdeğin saatlik kontrolü
+        return {
+            'subscriptions': len(self.index),
+            'routes': len(self.routes),
+            'fetches_per_hour': self.fetches / hours,
+            'checks_per_hour': self.checks / hours,
+            'demand_per_hour': demand,
+            'hedge_ratio': self.hedges / self.fetches if self.fetches else 0.0,
+            'error_ratio': self.errors / self.checks if self.checks else 0.0,
+            'unchanged_ratio': self.unchanged / successful if successful else 0.0,
+            'utilization': self.busy_seconds / (self.slots * horizon),
+            'backlog': backlog,
+            'queue_p50': percentile(self.queue_delays, 50),
+            'queue_p99': percentile(self.queue_delays, 99),
+            'detect_p50': percentile(self.detection_delays, 50),
+            'detect_p90': percentile(self.detection_delays, 90),
+            'detect_p99': percentile(self.detection_delays, 99),
+            'notify_p50': percentile(self.notify_delays, 50),
+            'notify_p99': percentile(self.notify_delays, 99),
+            'openings': self.site.openings,
+            'missed': self.site.missed,
+            'matches': self.matches,
+            'messages': self.messages,
+            'per_core_capacity': per_core,
+            'cores_needed': math.ceil(demand / (per_core * TARGET_UTILIZATION))
+        }
+
+
+def _seconds(value: Optional[float]) -> str:
+    return '-' if value is None else f"{value:.0f}s"
+
+
+def print_report(report: Dict, cores: int, elapsed: float):
+    print(f"\n{'='*60}")
+    print(f"{report['subscriptions']:,} abonelik, {report['routes']:,} hat "
+          f"(birleştirme x{report['subscriptions'] / max(report['routes'], 1):.1f}), {cores} çekirdek")
+    print(f"{'='*60}")
+    print(f"Site getirme       : {report['fetches_per_hour']:,.0f}/saat "
+          f"(hedge %{report['hedge_ratio'] * 100:.1f}, hata %{report['error_ratio'] * 100:.1f})")
+    print(f"Kontrol            : {report['checks_per_hour']:,.0f}/saat (istenen {report['demand_per_hour']:,.0f}/saat)")
+    print(f"Ayrıştırma atlandı : %{report['unchanged_ratio'] * 100:.0f} (sonuç değişmedi)")
+    print(f"Kullanım           : %{report['utilization'] * 100:.0f}, kuyrukta kalan {report['backlog']:,} hat")
+    print(f"Kuyruk gecikmesi   : p50 {_seconds(report['queue_p50'])}, p99 {_seconds(report['queue_p99'])}")
+    print(f"Tespit gecikmesi   : p50 {_seconds(report['detect_p50'])}, p90 {_seconds(report['detect_p90'])}, "
+          f"p99 {_seconds(report['detect_p99'])}")
+    print(f"Bildirim gecikmesi : p50 {_seconds(report['notify_p50'])}, p99 {_seconds(report['notify_p99'])}")
+    print(f"Açılış             : {report['openings']:,} (kaçırılan {report['missed']:,}), "
+          f"{report['matches']:,} eşleşme → {report['messages']:,} mesaj")
+    print(f"Çekirdek kapasitesi: {report['per_core_capacity']:,.0f} kontrol/saat; "
+          f"gereken çekirdek (%{TARGET_UTILIZATION * 100:.0f} kullanım): {report['cores_needed']}")
+    print(f"(simülasyon {elapsed:.1f} sn sürdü)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sanal zamanlı kapasite simülasyonu')
+    parser.add_argument('--subscriptions', type=int, default=10_000, help='Abonelik sayısı (varsayılan: 10000)')
+    parser.add_argument('--sweep', default=None, help='Virgülle ayrılmış abonelik sayıları (ör. 1000,10000,100000)')
+    parser.add_argument('--users', type=int, default=0, help='Kullanıcı sayısı (varsayılan: abonelik / 3)')
+    parser.add_argument('--dates', type=int, default=60, help='Sefer tarihlerinin yayıldığı gün sayısı')
+    parser.add_argument('--cores', type=int, default=os.cpu_count() or 1, help='Çekirdek sayısı')
+    parser.add_argument('--checks-per-core', type=int, default=2, help='Çekirdek başına eşzamanlı kontrol')
+    parser.add_argument('--interval', type=float, default=10, help='Hat başına kontrol aralığı (dakika)')
+    parser.add_argument('--hours', type=float, default=6, help='Sanal süre (saat)')
+    parser.add_argument('--start', default='2026-01-10 06:00', help='Sanal başlangıç zamanı')
+    parser.add_argument('--latency', type=float, default=12, help='Kontrol süresi medyanı (saniye)')
+    parser.add_argument('--latency-sigma', type=float, default=0.4, help='Log-normal kontrol süresi sapması')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='Hatalı kontrol oranı')
+    parser.add_argument('--hedge-after', type=float, default=HEDGE_AFTER, help='İkinci getirme eşiği (saniye, 0 = kapalı)')
+    parser.add_argument('--open-rate', type=float, default=0.05, help='Vagon başına saatlik DOLU → MÜSAİT oranı')
+    parser.add_argument('--close-rate', type=float, default=2.0, help='Vagon başına saatlik MÜSAİT → DOLU oranı')
+    parser.add_argument('--burst-calendar', default=None, help='Burst pencereleri takvimi (bkz. burst_windows.py)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sweep.split(',')] if args.sweep else [args.subscriptions]
+    for size in sizes:
+        started = time.perf_counter()
+        report = Simulation(args, size).run()
+        print_report(report, args.cores, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
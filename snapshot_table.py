@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+TCDD İzleyici - Süreçler Arası Paylaşımlı Hat Anlık Görüntüsü Tablosu
+
+İzleyiciler ayrı süreçlerde çalışır (api_server alt süreçleri, shard
+worker'ları); her süreç gördüğü vagon durumlarını yalnızca kendi belleğinde
+tutuyordu ve /api/status başka bir sürecin aynı hat için getirdiği sonucu
+göremiyordu. Bu modül (kalkış, varış, tarih) anahtarlı son durumları tek bir
+mmap edilmiş dosyada tutar; tüm süreçler aynı sayfaları eşler, bellek worker
+sayısıyla büyümez.
+
+DOSYA DÜZENİ (SNAPSHOT_FILE):
+    Başlık (64 bayt)    magic, sürüm, yuva sayısı, kayıt boyutu
+    Yuvalar             SNAPSHOT_SLOTS × RECORD_SIZE bayt, açık adresleme
+                        (hash % yuva, en fazla PROBE_LIMIT yuva ileri bakılır;
+                        pencere doluysa en eski güncellenen kayıt silinir)
+
+    Kayıt: seq, yazan pid, anahtar hash'i, güncellenme zamanı, vagon sayısı,
+    anahtar metni ve WAGON_SLOTS adet (vagon, durum, fiyat_kuruş, gözlem zamanı).
+
+    Dosyayı ilk açan süreç düzeni belirler; sonrakiler başlıktaki yuva sayısını
+    kullanır. Dosya yalnızca dosya kilidi altında oluşturulur veya uzatılır,
+    hiçbir zaman kısaltılmaz; uyumsuz başlıkta tablo açılmaz. Dosya kilidi
+    POSIX'te flock, Windows'ta msvcrt.locking'dir; ikisi de yoksa tablo
+    kullanılmaz.
+
+SEQLOCK:
+    Yazıcı (dosya kilidi altında) seq'i tek sayıya çıkarır, kaydı yazar ve
+    seq'i çift sayıya çıkarır. Okuyucular kilit almaz: seq çift ve kayıt
+    okunduktan sonra değişmemişse okuma tutarlıdır, değilse tekrar dener.
+    Alanlar struct.unpack_from ile doğrudan eşlenmiş sayfalardan okunur.
+    Yazarken çöken sürecin bıraktığı tek seq bir sonraki yazımda düzelir.
+
+KULLANIM:
+    python snapshot_table.py --max-age 600
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from history_store import STATUS_CODES, STATUS_NAMES, NO_PRICE, parse_price_kurus
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:  # POSIX
+    msvcrt = None
+
+
+# Konfigürasyon
+_SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE", os.path.join(_SHM_DIR, "tcdd_snapshots.bin"))   # boş = kapalı
+SNAPSHOT_SLOTS = int(os.getenv("SNAPSHOT_SLOTS", "4096"))
+PROBE_LIMIT = 32
+SEQLOCK_RETRIES = 1000
+
+MAGIC = b'TCSS'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')             # magic, sürüm, ayrılmış, yuva, kayıt boyutu
+HEADER_SIZE = 64
+# seq, yazan pid, anahtar hash'i, güncellenme zamanı, vagon sayısı, anahtar metni
+RECORD_HEAD = struct.Struct('<IIQdI4x96s')
+# vagon adı, durum kodu, fiyat (kuruş), gözlem zamanı
+WAGON_ENTRY = struct.Struct('<12sB3xid')
+WAGON_SLOTS = 6
+RECORD = struct.Struct(RECORD_HEAD.format + WAGON_ENTRY.format[1:] * WAGON_SLOTS)
+RECORD_SIZE = 320
+SEQ = struct.Struct('<I')
+KEY_HASH = struct.Struct('<Q')
+KEY_HASH_OFFSET = 8
+
+assert RECORD.size <= RECORD_SIZE
+
+
+def _normalize(name: str) -> str:
+    """Türkçe karakter duyarlı küçük harf (İ → i, I → ı)"""
+    return name.strip().replace('İ', 'i').replace('I', 'ı').lower()
+
+
+def snapshot_key(from_station: str, to_station: str, date: str) -> str:
+    """Süreçler arası ortak hat anahtarı (büyük/küçük harf duyarsız)"""
+    return f"{_normalize(from_station)}|{_normalize(to_station)}|{date}"
+
+
+def _key_hash(key: str) -> int:
+    # 0 boş yuvayı gösterir
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+
+def _text(raw: bytes) -> str:
+    return raw.rstrip(b'\0').decode('utf-8', errors='ignore')
+
+
+def _fit(text: str, size: int) -> bytes:
+    """Metni UTF-8 karakterini bölmeden size bayta sığdır"""
+    return text.encode('utf-8')[:size].decode('utf-8', errors='ignore').encode('utf-8')
+
+
+class Snapshot(NamedTuple):
+    """Bir hattın süreçler arası son gözlenen durumu"""
+    from_station: str
+    to_station: str
+    date: str
+    updated_at: float
+    writer_pid: int
+    wagons: Dict[str, Dict]     # vagon -> {status, price_kurus, observed_at}
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now or time.time()) - self.updated_at
+
+    def to_dict(self) -> Dict:
+        return {
+            'from': self.from_station,
+            'to': self.to_station,
+            'date': self.date,
+            'updated_at': datetime.fromtimestamp(self.updated_at).isoformat(),
+            'age_seconds': round(self.age(), 1),
+            'writer_pid': self.writer_pid,
+            'wagons': {wagon: dict(data, observed_at=datetime.fromtimestamp(data['observed_at']).isoformat())
+                       for wagon, data in self.wagons.items()}
+        }
+
+
+class SnapshotTable:
+    """mmap edilmiş, seqlock'lu sabit kayıtlı hat tablosu"""
+
+    def __init__(self, path: str = SNAPSHOT_FILE, slots: int = SNAPSHOT_SLOTS):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            with self._write_lock():
+                self.slots = self._ensure_layout(max(slots, PROBE_LIMIT))
+            self._map = mmap.mmap(self._fd, HEADER_SIZE + self.slots * RECORD_SIZE)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def _ensure_layout(self, slots: int) -> int:
+        """
+        Dosya yeniyse başlat, kısaysa uzat; mevcut yuva sayısını döndür (kilit altında)
+
+        Dosya başka süreçlerce eşlenmiş olabileceği için asla kısaltılmaz veya
+        yeniden yazılmaz (eşlenmiş sayfanın kesilmesi okuyucuda SIGBUS'a yol
+        açar). Başlık bu sürümle uyuşmuyorsa ValueError fırlatılır.
+        """
+        size = os.fstat(self._fd).st_size
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        header = os.read(self._fd, HEADER.size) if size else b''
+        if header.strip(b'\0'):
+            if len(header) < HEADER.size:
+                raise ValueError(f"Anlık görüntü tablosu başlığı eksik ({size} bayt)")
+            magic, version, _, existing, record_size = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE or existing < PROBE_LIMIT:
+                raise ValueError(f"Anlık görüntü tablosu başka bir düzende (magic={magic!r}, sürüm={version}, "
+                                 f"kayıt={record_size}); dosyayı silin veya SNAPSHOT_FILE'ı değiştirin")
+            slots = existing
+        else:
+            # Yeni dosya (veya başlığı yazılamadan yarım kalmış oluşturma)
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            os.write(self._fd, HEADER.pack(MAGIC, VERSION, 0, slots, RECORD_SIZE))
+        required = HEADER_SIZE + slots * RECORD_SIZE
+        if size < required:
+            os.ftruncate(self._fd, required)
+        return slots
+
+    def _write_lock(self):
+        return _FileLock(self._fd, self._thread_lock)
+
+    def _offset(self, slot: int) -> int:
+        return HEADER_SIZE + slot * RECORD_SIZE
+
+    def _probe(self, key_hash: int):
+        start = key_hash % self.slots
+        for step in range(min(PROBE_LIMIT, self.slots)):
+            yield (start + step) % self.slots
+
+    def _read(self, offset: int) -> Optional[tuple]:
+        """Kaydı seqlock ile tutarlı oku (yazım sürerken tekrar dener)"""
+        for attempt in range(SEQLOCK_RETRIES):
+            (seq,) = SEQ.unpack_from(self._map, offset)
+            if seq & 1:
+                if attempt > 10:
+                    time.sleep(0)
+                continue
+            fields = RECORD.unpack_from(self._map, offset)
+            if SEQ.unpack_from(self._map, offset)[0] == seq:
+                return fields
+        return None
+
+    @staticmethod
+    def _decode(fields: tuple) -> Snapshot:
+        _, pid, _, updated_at, count, key = fields[:6]
+        from_station, to_station, date = _text(key).split('|', 2)
+        wagons = {}
+        for i in range(min(count, WAGON_SLOTS)):
+            name, status, price, observed_at = fields[6 + i * 4: 10 + i * 4]
+            wagons[_text(name)] = {
+                'status': STATUS_NAMES.get(status, 'UNKNOWN'),
+                'price_kurus': None if price == NO_PRICE else price,
+                'observed_at': observed_at
+            }
+        return Snapshot(from_station, to_station, date, updated_at, pid, wagons)
+
+    def _find(self, key: str, key_hash: int, locked: bool = False):
+        """
+        (yuva ofseti, kayıt alanları); kayıt yoksa alanlar None
+
+        locked: Yazma kilidi tutuluyorsa başka yazıcı olamaz; tek seq çöken bir
+        yazıcıdan kalmıştır ve kayıt seqlock beklemeden okunur.
+        """
+        for slot in self._probe(key_hash):
+            offset = self._offset(slot)
+            (slot_hash,) = KEY_HASH.unpack_from(self._map, offset + KEY_HASH_OFFSET)
+            if slot_hash == 0:
+                return offset, None
+            if slot_hash != key_hash:
+                continue
+            fields = RECORD.unpack_from(self._map, offset) if locked else self._read(offset)
+            if fields is None:
+                continue
+            from_station, to_station, date = _text(fields[5]).split('|', 2)
+            if fields[2] == key_hash and snapshot_key(from_station, to_station, date) == key:
+                return offset, fields
+        return None, None
+
+    def get(self, from_station: str, to_station: str, date: str,
+            max_age: Optional[float] = None) -> Optional[Snapshot]:
+        """Hattın son durumu (kilitsiz; yoksa veya max_age saniyeden eskiyse None)"""
+        key = snapshot_key(from_station, to_station, date)
+        _, fields = self._find(key, _key_hash(key))
+        if fields is None:
+            return None
+        snapshot = self._decode(fields)
+        if max_age is not None and snapshot.age() > max_age:
+            return None
+        return snapshot
+
+    def publish(self, from_station: str, to_station: str, date: str, wagons: Dict[str, tuple],
+                observed_at: Optional[float] = None):
+        """
+        Hattın gözlenen vagon durumlarını yaz
+
+        Args:
+            wagons: vagon -> (durum, fiyat metni); bu kontrolde görülmeyen
+                vagonların önceki kayıtları korunur (izleyiciler farklı
+                vagon tiplerini filtreleyebilir)
+        """
+        observed_at = observed_at or time.time()
+        key = snapshot_key(from_station, to_station, date)
+        key_hash = _key_hash(key)
+        with self._write_lock():
+            offset, fields = self._find(key, key_hash, locked=True)
+            merged = self._decode(fields).wagons if fields is not None else {}
+            for wagon, (status, price) in wagons.items():
+                merged[wagon] = {'status': status, 'price_kurus': parse_price_kurus(price),
+                                 'observed_at': observed_at}
+            if offset is None:
+                offset = self._evict(key_hash)
+
+            latest = sorted(merged.items(), key=lambda item: item[1]['observed_at'], reverse=True)[:WAGON_SLOTS]
+            values = []
+            for wagon, data in latest:
+                price = data['price_kurus']
+                values += [_fit(wagon, 12), STATUS_CODES.get(data['status'], STATUS_CODES['UNKNOWN']),
+                           NO_PRICE if price is None else price, data['observed_at']]
+            values += [b'', 0, 0, 0.0] * (WAGON_SLOTS - len(latest))
+            display_key = _fit(f"{from_station}|{to_station}|{date}", 96)
+
+            (seq,) = SEQ.unpack_from(self._map, offset)
+            writing = seq | 1
+            SEQ.pack_into(self._map, offset, writing)
+            RECORD.pack_into(self._map, offset, writing, os.getpid(), key_hash, observed_at,
+                             len(latest), display_key, *values)
+            SEQ.pack_into(self._map, offset, (writing + 1) & 0xFFFFFFFF)
+
+    def _evict(self, key_hash: int) -> int:
+        """Sonda penceresi doluysa en eski güncellenen kaydın yuvası (kilit altında)"""
+        oldest, oldest_at = None, None
+        for slot in self._probe(key_hash):
+            offset = self._offset(slot)
+            (updated_at,) = struct.unpack_from('<d', self._map, offset + 16)
+            if oldest_at is None or updated_at < oldest_at:
+                oldest, oldest_at = offset, updated_at
+        return oldest
+
+    def snapshots(self, max_age: Optional[float] = None) -> List[Snapshot]:
+        """Tablodaki tüm hatlar (kilitsiz tarama)"""
+        result = []
+        now = time.time()
+        for slot in range(self.slots):
+            offset = self._offset(slot)
+            if KEY_HASH.unpack_from(self._map, offset + KEY_HASH_OFFSET)[0] == 0:
+                continue
+            fields = self._read(offset)
+            if fields is None:
+                continue
+            snapshot = self._decode(fields)
+            if max_age is None or snapshot.age(now) <= max_age:
+                result.append(snapshot)
+        return result
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+# Windows'ta kilitlenen bayt: dosya sonunun ötesinde, böylece kilit başlığın
+# os.read ile okunmasını engellemez (msvcrt kilitleri zorunlu kilittir)
+_MSVCRT_LOCK_OFFSET = 0x7FFFFFFE
+
+
+class _FileLock:
+    """Yazıcılar arası kilit: süreç içinde thread kilidi, süreçler arasında flock (Windows'ta msvcrt.locking)"""
+
+    def __init__(self, fd: int, thread_lock: threading.Lock):
+        self.fd = fd
+        self.thread_lock = thread_lock
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            os.lseek(self.fd, _MSVCRT_LOCK_OFFSET, os.SEEK_SET)
+            while True:
+                try:
+                    msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue   # LK_LOCK ~10 sn dener; kilit bırakılana kadar beklenir
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            os.lseek(self.fd, _MSVCRT_LOCK_OFFSET, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+        self.thread_lock.release()
+
+
+_table: Optional[SnapshotTable] = None
+_table_failed = False
+
+
+def snapshot_table() -> Optional[SnapshotTable]:
+    """Süreç başına tek eşleme (SNAPSHOT_FILE boşsa, açılamazsa veya dosya kilidi yoksa None)"""
+    global _table, _table_failed
+    if _table is None and not _table_failed and SNAPSHOT_FILE and fcntl is None and msvcrt is None:
+        # Süreçler arası kilit olmadan yazıcıların seq artışları karışır, okuyucular yırtık kayıt kabul eder
+        _table_failed = True
+        print("[WARNING] Dosya kilidi desteklenmiyor, anlık görüntü tablosu kapalı")
+    if _table is None and not _table_failed and SNAPSHOT_FILE:
+        try:
+            _table = SnapshotTable()
+        except (OSError, ValueError) as e:
+            _table_failed = True
+            print(f"[WARNING] Anlık görüntü tablosu açılamadı ({SNAPSHOT_FILE}): {e}")
+    return _table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Paylaşımlı hat anlık görüntülerini listele')
+    parser.add_argument('--file', default=SNAPSHOT_FILE, help='Tablo dosyası')
+    parser.add_argument('--max-age', type=float, default=None, help='Bu kadar saniyeden eski kayıtları gösterme')
+    args = parser.parse_args()
+
+    if not args.file or not os.path.exists(args.file):
+        print(f"[ERROR] Tablo dosyası yok: {args.file}")
+        sys.exit(1)
+    table = SnapshotTable(args.file)
+    snapshots = sorted(table.snapshots(args.max_age), key=lambda s: s.updated_at, reverse=True)
+    for snapshot in snapshots:
+        wagons = ', '.join(
+            f"{wagon}: {data['status']}" + (f" {data['price_kurus'] / 100:.2f} TL" if data['price_kurus'] is not None else '')
+            for wagon, data in snapshot.wagons.items())
+        print(f"{snapshot.from_station} → {snapshot.to_station} {snapshot.date} "
+              f"({snapshot.age():.0f} sn önce, pid {snapshot.writer_pid}): {wagons}")
+    print(f"{len(snapshots)} hat / {table.slots} yuva")
+    table.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+"""
+TCDD İzleyici - Kompakt Abonelik Modeli
+
+Her izleme eskiden f"{from}_{to}_{date}_{wagon}_{n}p" metin anahtarları ve
+serbest dict'lerle temsil ediliyordu. 100 bin aboneliği makul bir makinede
+bellekte tutabilmek için:
+
+    - İstasyon adları bir kez intern edilip küçük tamsayı id'lerle tutulur
+    - Vagon tipi ve durum küçük tamsayı enum'lardır
+    - Abonelik değiştirilemez bir NamedTuple'dır (instance __dict__ yok)
+
+state.json ile uyumluluk için state_key() eski metin anahtarını üretir;
+durum kayıtları state.json'daki dict biçiminde kalır.
+
+Aboneliğin isteğe bağlı fiyat tavanı (kuruş) vardır: tavanın üstündeki
+açılışlar bildirim üretmez; MÜSAİT kalan vagonun fiyatı tavanın üstünden
+tavana veya altına indiğinde "fiyat düştü" eşleşmesi oluşur (tavansız
+aboneliklerde fiyat değişimi bildirim üretmez). Çok aboneli (hat, vagon) gruplarında tavan ve yolcu
+karşılaştırması NumPy ile vektörel yapılır. NumPy yalnızca böyle bir grup
+ilk kez değerlendirildiğinde içe aktarılır; tcdd_watcher'ın (cron modunda
+her çalıştırmada ödenen) başlangıç süresine eklenmez.
+"""
+
+import bisect
+import importlib.util
+import sys
+from datetime import date as Date, datetime
+from enum import IntEnum
+from typing import Dict, List, NamedTuple, Optional, Union
+
+# Paketin varlığı içe aktarmadan kontrol edilir
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+
+class Status(IntEnum):
+    """Bilet durumu (history_store.STATUS_CODES ile aynı kodlar)"""
+    DOLU = 0
+    MUSAIT = 1
+    UNKNOWN = 2
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> 'Status':
+        return cls.__members__.get(value or 'UNKNOWN', cls.UNKNOWN)
+
+
+# Vagon tipleri (tcdd_watcher.WagonType değerleri ile aynı sıra)
+WAGON_NAMES = ('EKONOMİ', 'BUSINESS', 'YATAKLI', 'LOCA', 'ALL')
+WAGON_CODES = {name: code for code, name in enumerate(WAGON_NAMES)}
+
+NO_CEILING = 0    # Subscription.max_price: tavan yok
+
+
+def price_ceiling_kurus(value: Union[None, int, float, str]) -> Optional[int]:
+    """
+    Fiyat tavanını kuruşa çevir (TL sayı veya fiyat metni; boş/0 ise None)
+
+    Örnekler: 850 -> 85000, 1234.5 -> 123450, "1.234,50 TL" -> 123450
+    """
+    if value in (None, ''):
+        return None
+    if isinstance(value, str):
+        from history_store import parse_price_kurus
+        kurus = parse_price_kurus(value)
+    else:
+        kurus = round(float(value) * 100)
+    return kurus if kurus and kurus > 0 else None
+
+
+def format_price_kurus(price_kurus: Optional[int]) -> Optional[str]:
+    """Kuruşu sitedeki fiyat biçimine çevir (123450 -> "1.234,50 TL")"""
+    if price_kurus is None:
+        return None
+    lira, kurus = divmod(price_kurus, 100)
+    return f"{lira:,}".replace(',', '.') + f",{kurus:02d} TL"
+
+
+def crossed_ceiling(previous_kurus: Optional[int], current_kurus: Optional[int],
+                    ceiling_kurus: Optional[int]) -> bool:
+    """Fiyat tavanın üstündeyken tavana veya altına indi mi? (tavan yoksa False)"""
+    if not ceiling_kurus or previous_kurus is None or current_kurus is None:
+        return False
+    return previous_kurus > ceiling_kurus >= current_kurus
+
+
+class Interner:
+    """
+    Metin <-> küçük tamsayı id eşlemesi
+
+    Aynı istasyon adı kaç abonelikte geçerse geçsin bellekte tek bir
+    (sys.intern edilmiş) kopya tutulur.
+    """
+
+    __slots__ = ('_names', '_ids')
+
+    def __init__(self):
+        self._names: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def id(self, name: str) -> int:
+        code = self._ids.get(name)
+        if code is None:
+            name = sys.intern(name)
+            code = len(self._names)
+            self._names.append(name)
+            self._ids[name] = code
+        return code
+
+    def name(self, code: int) -> str:
+        return self._names[code]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+# Süreç genelinde paylaşılan istasyon tablosu
+STATIONS = Interner()
+
+# Sentetik iş yükleri için istasyon adları (bench_subscriptions, simulate_capacity)
+SAMPLE_STATIONS = ("Çiğli", "Konya", "Ankara Gar", "İstanbul(Söğütlüçeşme)", "Eskişehir", "Kars",
+                   "Erzurum", "Sivas", "Kayseri", "Adana", "Diyarbakır", "Tatvan Gar", "Balıkesir",
+                   "Afyon A.Çetinkaya", "Bandırma Şehir", "Karaman", "Malatya", "Kurtalan")
+
+
+class Subscription(NamedTuple):
+    """Değiştirilemez, kompakt abonelik kaydı"""
+    from_id: int
+    to_id: int
+    date_ordinal: int
+    wagon: int
+    passengers: int
+    user_id: int = 0
+    max_price: int = NO_CEILING    # Fiyat tavanı (kuruş)
+
+    @classmethod
+    def create(cls, from_station: str, to_station: str, date: str, wagon_type: str = 'ALL',
+               passengers: int = 1, user_id: int = 0, max_price: Optional[int] = None) -> 'Subscription':
+        return cls(
+            STATIONS.id(from_station),
+            STATIONS.id(to_station),
+            datetime.strptime(date, "%Y-%m-%d").toordinal(),
+            WAGON_CODES[wagon_type],
+            passengers,
+            user_id,
+            max_price or NO_CEILING
+        )
+
+    def accepts_price(self, price_kurus: Optional[int]) -> bool:
+        """Fiyat tavanı aşılmıyor mu? (fiyat okunamadıysa açılış kaçırılmaz)"""
+        return self.max_price == NO_CEILING or price_kurus is None or price_kurus <= self.max_price
+
+    @property
+    def from_station(self) -> str:
+        return STATIONS.name(self.from_id)
+
+    @property
+    def to_station(self) -> str:
+        return STATIONS.name(self.to_id)
+
+    @property
+    def date(self) -> str:
+        return Date.fromordinal(self.date_ordinal).isoformat()
+
+    @property
+    def wagon_type(self) -> str:
+        return WAGON_NAMES[self.wagon]
+
+    @property
+    def route(self):
+        """(from, to, date) üçlüsü - aynı sayfa sonucunu paylaşan abonelikler"""
+        return (self.from_id, self.to_id, self.date_ordinal)
+
+    def state_key(self, wagon_type: Optional[str] = None, passengers: Optional[int] = None) -> str:
+        """state.json ile uyumlu metin anahtarı (ihtiyaç anında üretilir)"""
+        wagon_type = wagon_type or self.wagon_type
+        passengers = self.passengers if passengers is None else passengers
+        return f"{self.from_station}_{self.to_station}_{self.date}_{wagon_type}_{passengers}p"
+
+
+class Match(NamedTuple):
+    """Bir anlık görüntüde koşulu tetiklenen abonelik"""
+    subscription: Subscription
+    wagon_type: str
+    price: Optional[str]
+    reason: str = 'opened'     # 'opened' (DOLU → MÜSAİT) veya 'price_drop'
+
+
+def _price_kurus(data: Dict) -> Optional[int]:
+    """Anlık görüntü girdisinin fiyatı (sayfada ayrıştırılmışsa price_kurus)"""
+    if 'price_kurus' in data:
+        return data['price_kurus']
+    from history_store import parse_price_kurus
+    return parse_price_kurus(data.get('price'))
+
+
+class _Thresholds:
+    """Bir (hat, vagon) için yolcu sayısına göre sıralı aboneler"""
+
+    __slots__ = ('passengers', 'members', 'ceilings', '_vectors')
+
+    def __init__(self):
+        self.passengers: List[int] = []              # Sıralı, tekil yolcu sayıları
+        self.members: Dict[int, set] = {}            # yolcu sayısı -> abonelikler
+        self.ceilings = 0                            # Fiyat tavanı olan abonelik sayısı
+        self._vectors = None                         # (abonelikler, yolcu, tavan) dizileri; değişince düşer
+
+    def add(self, subscription: Subscription):
+        members = self.members.get(subscription.passengers)
+        if members is None:
+            bisect.insort(self.passengers, subscription.passengers)
+            members = self.members[subscription.passengers] = set()
+        if subscription not in members:
+            members.add(subscription)
+            self.ceilings += subscription.max_price != NO_CEILING
+            self._vectors = None
+
+    def discard(self, subscription: Subscription) -> bool:
+        members = self.members.get(subscription.passengers)
+        if not members or subscription not in members:
+            return False
+        members.discard(subscription)
+        self.ceilings -= subscription.max_price != NO_CEILING
+        self._vectors = None
+        if not members:
+            del self.members[subscription.passengers]
+            self.passengers.pop(bisect.bisect_left(self.passengers, subscription.passengers))
+        return True
+
+    def eligible(self, seats: Optional[int], price_kurus: Optional[int]):
+        """Yolcu sayısı seats'i aşmayan ve tavanı price_kurus'un altında kalmayan aboneler"""
+        if price_kurus is None or not self.ceilings:
+            return list(self.upto(seats))
+        if self._vectors is None:
+            subscriptions = list(self.upto(None))
+            passengers = [s.passengers for s in subscriptions]
+            # Tavansız abonelikler her fiyatı kabul eder
+            ceilings = [s.max_price if s.max_price != NO_CEILING else 2 ** 62 for s in subscriptions]
+            if NUMPY_AVAILABLE:
+                import numpy as np
+                passengers, ceilings = np.array(passengers, dtype=np.int64), np.array(ceilings, dtype=np.int64)
+            self._vectors = (subscriptions, passengers, ceilings)
+        subscriptions, passengers, ceilings = self._vectors
+        if not NUMPY_AVAILABLE:
+            return [s for s, n, c in zip(subscriptions, passengers, ceilings)
+                    if c >= price_kurus and (seats is None or n <= seats)]
+        import numpy as np
+        mask = ceilings >= price_kurus
+        if seats is not None:
+            mask &= passengers <= seats
+        return [subscriptions[i] for i in np.flatnonzero(mask)]
+
+    def upto(self, seats: Optional[int]):
+        """Yolcu sayısı seats'i aşmayan aboneler (seats None ise hepsi)"""
+        end = len(self.passengers) if seats is None else bisect.bisect_right(self.passengers, seats)
+        for passengers in self.passengers[:end]:
+            yield from self.members[passengers]
+
+    def __len__(self) -> int:
+        return sum(len(m) for m in self.members.values())
+
+
+class SubscriptionIndex:
+    """
+    Ters abonelik indeksi: (from, to, date) -> vagon tipi -> yolcu eşiği
+
+    Bir hattın tek bir taze anlık görüntüsü, DOLU → MÜSAİT (veya fiyat
+    düşüşü) koşulu tetiklenen abonelerin kümesine çözülür; tavansız
+    gruplarda yaklaşık O(eşleşme) sürer. ALL abonelikleri her vagon tipinin
+    açılmasıyla eşleşir.
+    """
+
+    def __init__(self):
+        self._routes: Dict[tuple, Dict[int, _Thresholds]] = {}
+        self._count = 0
+
+    def add(self, subscription: Subscription):
+        wagons = self._routes.setdefault(subscription.route, {})
+        thresholds = wagons.get(subscription.wagon)
+        if thresholds is None:
+            thresholds = wagons[subscription.wagon] = _Thresholds()
+        before = len(thresholds.members.get(subscription.passengers, ()))
+        thresholds.add(subscription)
+        self._count += len(thresholds.members[subscription.passengers]) - before
+
+    def remove(self, subscription: Subscription) -> bool:
+        wagons = self._routes.get(subscription.route)
+        if not wagons or subscription.wagon not in wagons:
+            return False
+        removed = wagons[subscription.wagon].discard(subscription)
+        if removed:
+            self._count -= 1
+            if not wagons[subscription.wagon].members:
+                del wagons[subscription.wagon]
+            if not wagons:
+                del self._routes[subscription.route]
+        return removed
+
+    def routes(self) -> List[tuple]:
+        """En az bir abonesi olan (from_id, to_id, date_ordinal) hatları"""
+        return list(self._routes)
+
+    def subscribers(self, route: tuple) -> List[Subscription]:
+        return [s for thresholds in self._routes.get(route, {}).values() for s in thresholds.upto(None)]
+
+    def wagon_codes(self, route: tuple) -> List[int]:
+        return list(self._routes.get(route, {}))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def match(self, route: tuple, snapshot: Dict, previous: Dict,
+              previous_prices: Optional[Dict] = None) -> List[Match]:
+        """
+        Anlık görüntüyü abonelere çöz
+
+        Args:
+            route: (from_id, to_id, date_ordinal)
+            snapshot: vagon tipi -> {'status', 'price', 'price_kurus'?, 'seats'?} (watcher'ın wagons çıktısı)
+            previous: vagon tipi -> önceki durum ('DOLU' / 'MUSAIT' / Status)
+            previous_prices: vagon tipi -> önceki fiyat (kuruş); verilirse
+                MÜSAİT kalan vagonun fiyatı bir aboneliğin tavanını aşağı doğru
+                geçtiğinde 'price_drop' eşleşmesi üretilir (crossed_ceiling)
+
+        Returns:
+            List[Match]: Koşulu tetiklenen ve fiyat tavanı aşılmayan abonelikler
+        """
+        wagons = self._routes.get(route)
+        if not wagons:
+            return []
+
+        previous = {getattr(k, 'value', k): Status.parse(getattr(v, 'name', v)) for k, v in previous.items()}
+        previous_prices = {getattr(k, 'value', k): v for k, v in (previous_prices or {}).items()}
+        matches = []
+        all_code = WAGON_CODES['ALL']
+        for wagon_key, data in snapshot.items():
+            wagon_name = getattr(wagon_key, 'value', wagon_key)
+            if Status.parse(data.get('status')) != Status.MUSAIT:
+                continue
+            price = _price_kurus(data)
+            was = previous.get(wagon_name)
+            previous_price = previous_prices.get(wagon_name)
+            if was == Status.DOLU:
+                reason = 'opened'
+            elif was == Status.MUSAIT and price is not None and previous_price is not None and price < previous_price:
+                reason = 'price_drop'
+            else:
+                continue
+            # Sitenin boş koltuk bilgisi güvenilir değilse (None) tüm eşikler tetiklenir
+            seats = data.get('seats')
+            for code in (WAGON_CODES.get(wagon_name), all_code):
+                thresholds = wagons.get(code)
+                if thresholds is None:
+                    continue
+                eligible = thresholds.eligible(seats, price)
+                if reason == 'price_drop':
+                    # Yalnızca tavanı bu düşüşle geçilen abonelikler (önceki fiyat tavanın üstündeydi)
+                    if not thresholds.ceilings:
+                        continue
+                    eligible = [s for s in eligible if crossed_ceiling(previous_price, price, s.max_price)]
+                matches.extend(Match(s, wagon_name, data.get('price'), reason) for s in eligible)
+        return matches
@@ -16,24 +16,45 @@ KRİTERLER:
     - Cron/zamanlanmış çalışmaya uygun (while loop yok)
 """
 
-import asyncio
-import sys
-
-# stdout flush et
-sys.stdout.reconfigure(line_buffering=True)
-print("Watcher script başlatılıyor...", flush=True)
+from __future__ import annotations
 
+import asyncio
+import contextlib
+import importlib.util
 import json
 import os
+import signal
 import sys
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple, TYPE_CHECKING
 import argparse
 from enum import Enum
 from dataclasses import dataclass
 
-from playwright.async_api import async_playwright, Page, Browser
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Playwright ve firebase_admin ağır modüllerdir; yalnızca gerçekten
+# kullanıldıkları anda içe aktarılırlar (cron modunda her çalıştırmada
+# başlangıç maliyeti ödenir).
+if TYPE_CHECKING:
+    from playwright.async_api import Page, Browser
+
+from browser_cache import asset_cache, load_storage_state, observe_page
+from burst_windows import BURST_WINDOWS_FILE, BurstCalendar, load_burst_calendar
+from capture_store import CAPTURE_MODE, SNAPSHOT_JS, CaptureStore, new_check_id
+from check_profiler import PROFILER, CheckProfile
+from history_store import HistoryStore, parse_price_kurus
+from notification_digest import Digest, NotificationDigest
+from session_pool import Lease, open_page
+from snapshot_table import snapshot_table
+from subscriptions import Subscription, crossed_ceiling, format_price_kurus, price_ceiling_kurus
+from watch_log import LEVELS, LOG_LEVEL, install_log_filter
 
 
 class WagonType(str, Enum):
@@ -46,11 +67,9 @@ class WagonType(str, Enum):
 
 
 
-try:
-    from firebase_admin import credentials, messaging, initialize_app, get_app
-    FIREBASE_AVAILABLE = True
-except ImportError:
-    FIREBASE_AVAILABLE = False
+# Paketin varlığı içe aktarmadan kontrol edilir
+FIREBASE_AVAILABLE = importlib.util.find_spec("firebase_admin") is not None
+if not FIREBASE_AVAILABLE:
     print("[WARNING] Firebase Admin SDK yüklü değil. Bildirim özelliği devre dışı.")
 
 try:
@@ -65,60 +84,326 @@ except ImportError:
 # Konfigürasyon
 BASE_URL = os.getenv("BASE_URL", "https://ebilet.tcddtasimacilik.gov.tr")
 STATE_FILE = os.getenv("STATE_FILE", "state.json")
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") == "1"
+FCM_BATCH_SIZE = 500  # messaging.send_each istek başına en fazla 500 mesaj kabul eder
+# Sıcak oturum (--warm): arama sayfası en fazla bu kadar saniye yeniden kullanılır
+WARM_SESSION_MAX_AGE = int(os.getenv("WARM_SESSION_MAX_AGE", "1800"))
+# Kontrol başına toplam süre bütçesi (saniye) ve adımlara düşen pay üst sınırları.
+# Paylar toplamı 1'i aşabilir; toplam süre yine de CHECK_DEADLINE ile sınırlıdır.
+CHECK_DEADLINE = float(os.getenv("CHECK_DEADLINE", "90"))
+STEP_BUDGET = {
+    'ana sayfa': 0.35,
+    'istasyon seçimi': 0.35,
+    'tarih seçimi': 0.2,
+    'sefer arama': 0.35,
+    'yerinde arama': 0.5,
+    'sonuç değerlendirme': 0.2,
+}
+# İlk deneme bu kadar saniyede sonuç sayfasına ulaşamazsa ikinci bir context
+# aynı aramayı başlatır, ilk biten kazanır (0 = kapalı)
+HEDGE_AFTER = float(os.getenv("CHECK_HEDGE_AFTER", "0"))
+# Hata sınıfına göre yeniden deneme gecikmesi (saniye); ardışık hatalarda ikiye katlanır
+RETRY_DELAYS = {'timeout': 30, 'network': 30, 'browser': 5, 'unexpected': 60}
+RETRY_MAX_DELAY = 600
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
 
-@dataclass
-class TicketStatus:
-    """Bilet durumu bilgisi"""
-    from_station: str
-    to_station: str
-    date: str
-    status: str  # 'DOLU' | 'MUSAIT' | 'UNKNOWN'
-    price: Optional[str]
-    timestamp: str
+# Chromium başlatma profili (BROWSER_PROFILE): "default", "minimal" veya
+# LAUNCH_OPTIONS anahtarlarının virgülle ayrılmış listesi (ör. "no_gpu,js_heap_cap").
+# Browser başına bellek, bir konteynere sığan eşzamanlı izleme sayısını belirler;
+# seçeneklerin etkisi bench_browser.py ile ölçülür.
+BROWSER_PROFILE = os.getenv("BROWSER_PROFILE", "default")
+BROWSER_JS_HEAP_MB = int(os.getenv("BROWSER_JS_HEAP_MB", "256"))
+BROWSER_RENDERER_LIMIT = int(os.getenv("BROWSER_RENDERER_LIMIT", "2"))
+# Ayrı kurulmuş chrome-headless-shell (veya başka bir Chromium) ikilisi
+BROWSER_EXECUTABLE = os.getenv("BROWSER_EXECUTABLE") or None
+
+BASE_LAUNCH_ARGS = ['--disable-blink-features=AutomationControlled']
+LAUNCH_OPTIONS = {
+    'no_gpu': ['--disable-gpu', '--disable-software-rasterizer'],
+    'no_extensions': ['--disable-extensions', '--disable-component-extensions-with-background-pages'],
+    'no_background': ['--disable-background-networking', '--disable-component-update', '--disable-default-apps',
+                      '--disable-sync', '--disable-domain-reliability', '--no-first-run',
+                      '--disable-client-side-phishing-detection'],
+    # --disable-features Playwright'ın kendi listesini ezdiği için kullanılmaz
+    'no_site_isolation': ['--disable-site-isolation-trials'],
+    'no_dev_shm': ['--disable-dev-shm-usage'],
+    'renderer_limit': [f'--renderer-process-limit={BROWSER_RENDERER_LIMIT}'],
+    'js_heap_cap': [f'--js-flags=--max-old-space-size={BROWSER_JS_HEAP_MB}'],
+    # Sayfa önbelleği her kontrolde yeniden kullanılmadığı için küçültülebilir
+    'small_cache': ['--disk-cache-size=1048576', '--aggressive-cache-discard'],
+}
+LAUNCH_PROFILES = {
+    'default': [],
+    'minimal': ['no_gpu', 'no_extensions', 'no_background', 'no_site_isolation',
+                'no_dev_shm', 'renderer_limit', 'js_heap_cap'],
+}
+
+
+def launch_options(profile: Optional[str] = None) -> Dict:
+    """
+    Profil adından chromium.launch() argümanlarını üret
 
+    Raises:
+        ValueError: Bilinmeyen profil/seçenek
+    """
+    profile = profile or BROWSER_PROFILE
+    names = LAUNCH_PROFILES.get(profile)
+    if names is None:
+        names = [name.strip() for name in profile.split(',') if name.strip()]
+    unknown = [name for name in names if name not in LAUNCH_OPTIONS]
+    if unknown:
+        raise ValueError(f"Bilinmeyen başlatma seçeneği: {', '.join(unknown)}")
+
+    args = list(BASE_LAUNCH_ARGS)
+    for name in names:
+        args.extend(LAUNCH_OPTIONS[name])
+    options = {
+        'headless': True,  # Sunucu ortamında True olmalı
+        'args': args
+    }
+    if BROWSER_EXECUTABLE:
+        options['executable_path'] = BROWSER_EXECUTABLE
+    return options
 
-class NotificationService:
+
+async def launch_browser(playwright, profile: Optional[str] = None) -> Browser:
     """
-    Firebase Cloud Messaging Bildirim Servisi
+    Chromium başlat
 
-    TCDD bilet durumu MÜSAİT olduğunda mobil uygulamaya bildirim gönderir.
+    Tek seferlik kontrol, shard worker'ları ve diğer çalışma modları aynı
+    başlatma ayarlarını (BROWSER_PROFILE) kullanır.
     """
+    return await playwright.chromium.launch(**launch_options(profile))
+
+
+class CheckCancelled(Exception):
+    """Kontrol bir adım sınırında iptal edildi"""
+
+
+class CheckTimeout(Exception):
+    """Bir adım kendisine ayrılan süre bütçesini aştı"""
+
+    def __init__(self, step: str, budget: float):
+        super().__init__(f"'{step}' adımı {budget:.1f} sn bütçeyi aştı")
+        self.step = step
+        self.budget = budget
+
+
+class CheckDeadline:
+    """Tek bir kontrolün toplam süre bütçesi"""
+
+    def __init__(self, seconds: float = CHECK_DEADLINE):
+        self.total = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self, step: str) -> float:
+        """Adıma ayrılan süre: payı ile kalan sürenin küçüğü"""
+        return min(self.remaining(), self.total * STEP_BUDGET.get(step, 1.0))
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Kontrol hatasını yeniden deneme politikası için sınıflandır
+
+    Returns:
+        str: 'timeout' | 'network' | 'browser' | 'unexpected'
+    """
+    if isinstance(error, (CheckTimeout, asyncio.TimeoutError)):
+        return 'timeout'
+    name = type(error).__name__
+    message = str(error)
+    if 'Timeout' in name or 'Timeout' in message:
+        return 'timeout'
+    if 'net::ERR' in message or 'NS_ERROR' in message:
+        return 'network'
+    if any(marker in message for marker in ('Target closed', 'has been closed', 'crashed', 'disconnected')):
+        return 'browser'
+    return 'unexpected'
+
+
+def retry_delay(error_kind: Optional[str], consecutive_failures: int) -> float:
+    """Hata sınıfına ve ardışık hata sayısına göre bekleme süresi (saniye)"""
+    base = RETRY_DELAYS.get(error_kind or 'unexpected', RETRY_DELAYS['unexpected'])
+    return min(RETRY_MAX_DELAY, base * 2 ** max(0, consecutive_failures - 1))
 
-    def __init__(self):
-        self.enabled = FIREBASE_AVAILABLE and ENV_AVAILABLE
-        self._app_initialized = False
-        self.fcm_topic = os.getenv("FIREBASE_NOTIFICATION_TOPIC", "tcdd-bilet-alerts")
 
-        if self.enabled:
-            self._initialize_firebase()
+# Süreç genelinde iptal isteği: SIGTERM/SIGINT (Windows'ta CTRL_BREAK) ile
+# ayarlanır, kontrol bir sonraki adım sınırında durur ve browser kapatılır
+CANCEL_EVENT = threading.Event()
 
-    def _initialize_firebase(self):
-        """Firebase'i başlat"""
+
+def request_cancel(signum=None, frame=None):
+    """
+    Mevcut kontrolün bir sonraki adım sınırında durmasını iste
+
+    Sinyal işleyicisi ana thread'de çalışır ve o sırada LeveledStream kilidi
+    tutuluyor olabilir; bu yüzden burada print() yapılmaz, iptal olayı
+    kontrol eden adımda (_checkpoint / bekleme döngüsü) raporlanır.
+    """
+    CANCEL_EVENT.set()
+
+
+def install_cancel_handlers():
+    """Sonlandırma sinyallerini işbirlikçi iptale yönlendir"""
+    for name in ('SIGTERM', 'SIGINT', 'SIGBREAK'):
+        signum = getattr(signal, name, None)
+        if signum is not None:
+            signal.signal(signum, request_cancel)
+
+
+# Firebase app süreç başına bir kez, ilk gerçek bildirimde başlatılır
+_firebase_lock = threading.Lock()
+_firebase_ready: Optional[bool] = None
+
+
+def _initialize_firebase_once() -> bool:
+    """
+    Firebase'i (gerekirse) başlat
+
+    Returns:
+        bool: Firebase kullanıma hazır mı?
+    """
+    global _firebase_ready
+    if _firebase_ready is not None:
+        return _firebase_ready
+
+    with _firebase_lock:
+        if _firebase_ready is not None:
+            return _firebase_ready
         try:
             project_id = os.getenv("FIREBASE_PROJECT_ID")
             private_key_path = os.getenv("FIREBASE_PRIVATE_KEY_PATH")
 
             if not project_id or not private_key_path:
                 print("[WARNING] Firebase credentials eksik. .env dosyasını kontrol edin.")
-                self.enabled = False
-                return
+                _firebase_ready = False
+                return False
+
+            from firebase_admin import credentials, initialize_app
 
             # Firebase app başlat
             cred = credentials.Certificate(private_key_path)
             try:
                 initialize_app(cred, {'projectId': project_id})
-                self._app_initialized = True
                 print("[INFO] Firebase başarıyla başlatıldı")
             except ValueError:
                 # App zaten başlatılmış
-                self._app_initialized = True
                 print("[INFO] Firebase zaten başlatılmış")
+            _firebase_ready = True
 
         except Exception as e:
             print(f"[ERROR] Firebase başlatma hatası: {e}")
+            _firebase_ready = False
+        return _firebase_ready
+
+
+@dataclass
+class TicketStatus:
+    """Bilet durumu bilgisi"""
+    __slots__ = ('from_station', 'to_station', 'date', 'status', 'price', 'timestamp')
+
+    from_station: str
+    to_station: str
+    date: str
+    status: str  # 'DOLU' | 'MUSAIT' | 'UNKNOWN'
+    price: Optional[str]
+    timestamp: str
+
+
+class NotificationService:
+    """
+    Firebase Cloud Messaging Bildirim Servisi
+
+    TCDD bilet durumu MÜSAİT olduğunda mobil uygulamaya bildirim gönderir.
+    """
+
+    def __init__(self):
+        # Servis hesabı dosyası ve initialize_app ilk bildirime kadar ertelenir
+        self.enabled = FIREBASE_AVAILABLE and ENV_AVAILABLE
+        self.fcm_topic = os.getenv("FIREBASE_NOTIFICATION_TOPIC", "tcdd-bilet-alerts")
+        self.user_tokens: Dict[int, str] = {}
+
+    def _ensure_initialized(self) -> bool:
+        """İlk gerçek bildirimde Firebase'i başlat"""
+        if self.enabled and not _initialize_firebase_once():
             self.enabled = False
+        return self.enabled
+
+    def register_token(self, user_id: int, token: str):
+        """Kullanıcıya özel FCM cihaz token'ı kaydet (yoksa topic'e gönderilir)"""
+        self.user_tokens[user_id] = token
+
+    def _build_message(self, ticket_status: TicketStatus, wagon_type: str, user_id: Optional[int] = None):
+        """Tek vagon tipi için FCM mesajı oluştur"""
+        return self._build_digest_message(Digest(
+            user_id, ticket_status.from_station, ticket_status.to_station, ticket_status.date,
+            [(wagon_type, ticket_status.price)], ticket_status.timestamp
+        ))
+
+    def _build_digest_message(self, digest: Digest):
+        """
+        Bir veya daha fazla vagon tipini tek mesajda bildiren FCM mesajı
+        (kullanıcının token'ı varsa ona, yoksa topic'e)
+        """
+        from firebase_admin import messaging
+
+        wagon_types = [wagon for wagon, _ in digest.offers]
+        price_drop = digest.reason == 'price_drop'
+        if price_drop:
+            title = f"📉 {', '.join(wagon_types)} FİYAT DÜŞTÜ!"
+        else:
+            title = f"🚂 {', '.join(wagon_types)} BİLET AÇILDI!"
+        if len(digest.offers) == 1:
+            details = f"Vagon: {wagon_types[0]}\nFiyat: {digest.offers[0][1] or 'Belirtilmedi'}"
+        else:
+            details = f"Vagonlar: {digest.summary()}"
+
+        token = self.user_tokens.get(digest.user_id) if digest.user_id is not None else None
+        return messaging.Message(
+            notification=messaging.Notification(
+                title=title,
+                body=f"{digest.from_station} → {digest.to_station}\n"
+                     f"Tarih: {digest.date}\n"
+                     f"{details}"
+            ),
+            data={
+                'type': 'price_drop' if price_drop else 'ticket_available',
+                'from_station': digest.from_station,
+                'to_station': digest.to_station,
+                'date': digest.date,
+                'wagon_type': ','.join(wagon_types),
+                'price': (digest.offers[0][1] or '') if len(digest.offers) == 1 else '',
+                'wagons': digest.summary(),
+                'timestamp': digest.timestamp
+            },
+            token=token,
+            topic=None if token else self.fcm_topic,
+            android=messaging.AndroidConfig(
+                priority='high',
+                notification=messaging.AndroidNotification(
+                    channel_id='tcdd_bilet_alerts',
+                    sound='default',
+                    click_action='FLUTTER_NOTIFICATION_CLICK'
+                )
+            ),
+            apns=messaging.APNSConfig(
+                payload=messaging.APNSPayload(
+                    aps=messaging.Aps(
+                        alert=messaging.ApsAlert(
+                            title=title,
+                            body=f'{digest.from_station} → {digest.to_station}\n'
+                                 f'Tarih: {digest.date}'
+                        ),
+                        sound='default',
+                        badge=1
+                    )
+                )
+            )
+        )
 
     async def send_ticket_available_notification(self, ticket_status: TicketStatus, wagon_type: str) -> bool:
         """
@@ -130,52 +415,15 @@ class NotificationService:
         Returns:
             bool: Bildirim başarılı mı?
         """
-        if not self.enabled or not self._app_initialized:
+        if not self._ensure_initialized():
             print("[INFO] Firebase bildirim devre dışı")
             return False
 
         try:
+            from firebase_admin import messaging
+
             # FCM mesajı oluştur
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=f"🚂 {wagon_type} BİLET AÇILDI!",
-                    body=f"{ticket_status.from_station} → {ticket_status.to_station}\n"
-                         f"Tarih: {ticket_status.date}\n"
-                         f"Vagon: {wagon_type}\n"
-                         f"Fiyat: {ticket_status.price or 'Belirtilmedi'}"
-                ),
-                data={
-                    'type': 'ticket_available',
-                    'from_station': ticket_status.from_station,
-                    'to_station': ticket_status.to_station,
-                    'date': ticket_status.date,
-                    'wagon_type': wagon_type,
-                    'price': ticket_status.price or '',
-                    'timestamp': ticket_status.timestamp
-                },
-                topic=self.fcm_topic,
-                android=messaging.AndroidConfig(
-                    priority='high',
-                    notification=messaging.AndroidNotification(
-                        channel_id='tcdd_bilet_alerts',
-                        sound='default',
-                        click_action='FLUTTER_NOTIFICATION_CLICK'
-                    )
-                ),
-                apns=messaging.APNSConfig(
-                    payload=messaging.APNSPayload(
-                        aps=messaging.Aps(
-                            alert=messaging.ApsAlert(
-                                title='🚂 YATAKLI BİLET AÇILDI!',
-                                body=f'{ticket_status.from_station} → {ticket_status.to_station}\n'
-                                     f'Tarih: {ticket_status.date}'
-                            ),
-                            sound='default',
-                            badge=1
-                        )
-                    )
-                )
-            )
+            message = self._build_message(ticket_status, wagon_type)
 
             # Mesajı gönder
             response = messaging.send(message)
@@ -186,44 +434,341 @@ class NotificationService:
             print(f"[ERROR] Bildirim gönderme hatası: {e}")
             return False
 
+    def _send_messages(self, messages: list, label: str) -> int:
+        """Mesajları FCM send_each ile 500'lük gruplar halinde gönder"""
+        from firebase_admin import messaging
+
+        sent = 0
+        for start in range(0, len(messages), FCM_BATCH_SIZE):
+            batch = messages[start:start + FCM_BATCH_SIZE]
+            try:
+                response = messaging.send_each(batch)
+                sent += response.success_count
+                if response.failure_count:
+                    print(f"[WARNING] {label}: {response.failure_count}/{len(batch)} mesaj gönderilemedi")
+            except Exception as e:
+                print(f"[ERROR] {label} gönderme hatası: {e}")
+        print(f"[INFO] {label}: {sent}/{len(messages)} mesaj gönderildi")
+        return sent
+
+    async def send_bulk(self, items: List[Tuple[TicketStatus, str, Optional[int]]]) -> int:
+        """
+        Çok sayıda bildirimi toplu gönder (FCM send_each, istek başına 500 mesaj)
+
+        Args:
+            items: (bilet durumu, vagon tipi, kullanıcı id) üçlüleri
+
+        Returns:
+            int: Başarıyla gönderilen bildirim sayısı
+        """
+        if not items:
+            return 0
+        if not self._ensure_initialized():
+            print(f"[INFO] Firebase bildirim devre dışı ({len(items)} bildirim gönderilmedi)")
+            return 0
+
+        messages = [self._build_message(ticket_status, wagon_type, user_id)
+                    for ticket_status, wagon_type, user_id in items]
+        return self._send_messages(messages, "Toplu bildirim")
+
+    async def send_digests(self, digests: List[Digest]) -> int:
+        """
+        Birleştirilmiş bildirimleri gönder (özet başına tek mesaj)
+
+        Returns:
+            int: Başarıyla gönderilen mesaj sayısı
+        """
+        if not digests:
+            return 0
+        if not self._ensure_initialized():
+            print(f"[INFO] Firebase bildirim devre dışı ({len(digests)} özet bildirim gönderilmedi)")
+            return 0
+
+        transitions = sum(len(digest.offers) for digest in digests)
+        messages = [self._build_digest_message(digest) for digest in digests]
+        return self._send_messages(messages, f"Özet bildirim ({transitions} geçiş)")
+
+
+def load_state_file() -> Dict:
+    """State dosyasını oku"""
+    if os.path.exists(STATE_FILE):
+        try:
+            with open(STATE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"[WARNING] State dosyası okunamadı: {e}")
+    return {}
+
+
+@contextlib.contextmanager
+def _state_file_lock():
+    """State dosyası için süreçler arası kilit (fcntl yoksa kilitsiz çalışır)"""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{STATE_FILE}.lock", 'a+b') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def save_state_file(new_state: Dict):
+    """
+    Yeni durumu state dosyasına kaydet
+
+    Aynı state dosyasını birden fazla izleyici/süreç (shard worker'ları,
+    api_server alt süreçleri) paylaşabildiği için oku-birleştir-yaz dosya
+    kilidi altında yapılır; dosyadaki diğer anahtarlar korunur ve dosya
+    geçici bir dosya üzerinden atomik olarak değiştirilir. Çağıranlar
+    yalnızca kendi değiştirdikleri anahtarları vermelidir.
+    """
+    try:
+        with _state_file_lock():
+            merged = {}
+            if os.path.exists(STATE_FILE):
+                try:
+                    with open(STATE_FILE, 'r', encoding='utf-8') as f:
+                        merged = json.load(f)
+                except Exception:
+                    merged = {}
+            merged.update(new_state)
+
+            tmp_file = f"{STATE_FILE}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, STATE_FILE)
+    except Exception as e:
+        print(f"[ERROR] State dosyası kaydedilemedi: {e}")
+
+
+def _normalize_station(name: str) -> str:
+    """Türkçe karakter duyarlı basit küçük harf dönüşümü"""
+    return name.replace('İ', 'i').replace('I', 'ı').lower()
+
 
 class TCDDWatcher:
     """TCDD e-bilet izleyicisi"""
 
-    def __init__(self, from_station: str, to_station: str, date: str, wagon_type: WagonType = WagonType.ALL, passengers: int = 1):
+    def __init__(self, from_station: str, to_station: str, date: str, wagon_type: WagonType = WagonType.ALL, passengers: int = 1,
+                 exit_on_found: bool = True, notify: bool = True, state: Optional[Dict] = None,
+                 max_price: Optional[int] = None):
         self.from_station = from_station
         self.to_station = to_station
         self.date = date
         self.wagon_type = wagon_type
         self.passengers = passengers
-        self.state = self._load_state()
+        # Fiyat tavanı (kuruş): üstündeki açılışlar bildirim üretmez, tavanın altına düşüş üretir
+        self.max_price = max_price
+        # Kompakt abonelik kaydı (intern edilmiş istasyonlar, küçük tamsayı kodlar)
+        self.subscription = Subscription.create(from_station, to_station, date, wagon_type.value, passengers,
+                                                max_price=max_price)
+        # Tek izleyicili CLI modunda bilet bulununca süreç sonlanır.
+        # Aynı süreçte birden fazla izleyici çalışıyorsa (shard worker) False verilir.
+        self.exit_on_found = exit_on_found
+        # Bildirimleri abonelik indeksi üzerinden toplu gönderen çalışma
+        # modlarında (shard runtime) izleyici kendisi bildirim göndermez
+        self.notify = notify
+        # Toplu modda tüm izleyiciler aynı state dict'ini paylaşır; değişen
+        # anahtarlar deferred_state'e toplanır ve dosyaya tek seferde yazılır
+        self.state = state if state is not None else self._load_state()
+        self.deferred_state: Optional[Dict] = None
         self.notification_service = NotificationService()
+        # Değişiklik tespiti: son kontroldeki sonuç bölgesinin parmak izi
+        self._last_fingerprint: Optional[str] = None
+        self._last_result: Optional[Dict] = None
+        self._last_state_keys: List[str] = []
+        # Her gözlem müsaitlik geçmişine eklenir (bkz. history_store.py)
+        self.history = HistoryStore() if HISTORY_ENABLED else None
+        # Son durumlar süreçler arası paylaşılan tabloya yazılır (bkz. snapshot_table.py)
+        self.snapshots = snapshot_table()
+        # İsteğe bağlı sonuç sayfası yakalama (bkz. capture_store.py)
+        self.capture = CaptureStore() if CAPTURE_MODE != 'off' else None
+        self._search_timed_out = False
+        # Son başarısız kontrolün hata sınıfı (bkz. classify_error)
+        self.last_error: Optional[str] = None
+        # Sıcak oturum: kontroller arasında açık tutulan arama sayfası
+        self._warm_lease: Optional[Lease] = None
+        self._warm_page: Optional[Page] = None
+        self._warm_opened_at = 0.0
+        # Paylaşılan bildirim özeti: verilirse geçişler buraya eklenir, gönderimi
+        # sahibi yapar (toplu mod); yoksa kontrol sonunda tek mesaj gönderilir
+        self.digest: Optional[NotificationDigest] = None
+        self._banner_shown = False
+        # İzleme döngülerinin kontrol sayacı (soğuk döngü ile burst arasında ortak)
+        self.check_count = 0
+        # Profillenen kontrolün kaydı (bkz. check_profiler.py); yalnızca istenince dolu
+        self._profile: Optional[CheckProfile] = None
 
     def _load_state(self) -> Dict:
         """State dosyasından önceki durumu yükle"""
-        if os.path.exists(STATE_FILE):
-            try:
-                with open(STATE_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"[WARNING] State dosyası okunamadı: {e}")
-        return {}
+        return load_state_file()
 
     def _save_state(self, new_state: Dict):
-        """Yeni durumu state dosyasına kaydet"""
-        try:
-            with open(STATE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(new_state, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"[ERROR] State dosyası kaydedilemedi: {e}")
+        """Değişen anahtarları state dosyasına kaydet (toplu modda erteleme yapılır)"""
+        if self.deferred_state is not None:
+            self.deferred_state.update(new_state)
+            return
+        save_state_file(new_state)
 
     def _get_state_key(self) -> str:
         """Bu sefer için benzersiz state anahtarı"""
-        return f"{self.from_station}_{self.to_station}_{self.date}_{self.wagon_type.value}_{self.passengers}p"
+        return self.subscription.state_key()
 
     def _get_state_key_for_wagon(self, wagon_type: WagonType, passengers: int) -> str:
         """Belirli bir vagon tipi için state anahtarı"""
-        return f"{self.from_station}_{self.to_station}_{self.date}_{wagon_type.value}_{passengers}p"
+        return self.subscription.state_key(wagon_type.value, passengers)
+
+    def _get_fingerprint_key(self) -> str:
+        """Sonuç bölgesi parmak izinin saklandığı state anahtarı"""
+        return f"{self._get_state_key()}#fp"
+
+    def _record_history(self, wagons: Dict, timestamp: str):
+        """Gözlenen vagon durumlarını geçmiş deposuna ekle"""
+        if self.history is None or not wagons:
+            return
+        try:
+            self.history.append_many({
+                'from': self.from_station,
+                'to': self.to_station,
+                'date': self.date,
+                'wagon': wagon_type.value,
+                'status': wagon_data['status'],
+                'price': wagon_data['price'],
+                'timestamp': timestamp
+            } for wagon_type, wagon_data in wagons.items())
+        except Exception as e:
+            print(f"[WARNING] Geçmiş kaydedilemedi: {e}")
+
+    def _record_observation(self, wagons: Dict, timestamp: str, recorded: Optional[set] = None):
+        """
+        Gözlemi geçmişe ve paylaşımlı tabloya bir kez yaz
+
+        recorded: Aynı sonuç sayfasını değerlendiren izleyicilerin ortak
+        kümesi (bkz. check_route_group); sayfada zaten kaydedilmiş vagon
+        tipleri tekrar yazılmaz.
+        """
+        if recorded is not None:
+            wagons = {wagon: data for wagon, data in wagons.items() if wagon not in recorded}
+            recorded.update(wagons)
+        self._record_history(wagons, timestamp)
+        self._publish_snapshot(wagons, timestamp)
+
+    def _publish_snapshot(self, wagons: Dict, timestamp: str):
+        """Gözlenen vagon durumlarını paylaşımlı anlık görüntü tablosuna yaz"""
+        if self.snapshots is None or not wagons:
+            return
+        try:
+            self.snapshots.publish(
+                self.from_station, self.to_station, self.date,
+                {wagon_type.value: (wagon_data['status'], wagon_data['price'])
+                 for wagon_type, wagon_data in wagons.items()},
+                observed_at=datetime.fromisoformat(timestamp).timestamp()
+            )
+        except Exception as e:
+            print(f"[WARNING] Anlık görüntü yazılamadı: {e}")
+
+    async def _capture_page(self, page: Page, status_data: Dict):
+        """Sonuç sayfasını yakalama moduna göre (errors/all) kaydet"""
+        if self._search_timed_out:
+            reason = 'timeout'
+        elif not status_data['wagons']:
+            reason = 'empty'
+        elif CAPTURE_MODE == 'all':
+            reason = 'all'
+        else:
+            return
+
+        try:
+            check_id = new_check_id()
+            html = await page.evaluate(SNAPSHOT_JS)
+            self.capture.save(check_id, html, {
+                'reason': reason,
+                'url': page.url,
+                'from': self.from_station,
+                'to': self.to_station,
+                'date': self.date,
+                'wagon_type': self.wagon_type.value,
+                'passengers': self.passengers,
+                'timestamp': status_data['timestamp'],
+                'fingerprint': status_data['fingerprint'],
+                'wagons': {wagon.value: data for wagon, data in status_data['wagons'].items()}
+            })
+            print(f"[INFO] Sonuç sayfası yakalandı ({reason}): {check_id}")
+        except Exception as e:
+            print(f"[WARNING] Sonuç sayfası yakalanamadı: {e}")
+
+    def _checkpoint(self, step: str):
+        """Adım sınırı: iptal istenmişse CheckCancelled fırlat"""
+        if CANCEL_EVENT.is_set():
+            print(f"[INFO] Kontrol iptal edildi ({step} adımından önce)")
+            raise CheckCancelled(step)
+
+    async def _step(self, step: str, page: Page, deadline: CheckDeadline, action):
+        """
+        Adımı süre bütçesi içinde çalıştır
+
+        Önce iptal kontrolü yapılır; Playwright'ın varsayılan zaman aşımı adım
+        bütçesine çekilir ve adım bütçeyi aşarsa CheckTimeout fırlatılır.
+        """
+        self._checkpoint(step)
+        budget = deadline.budget(step)
+        if budget <= 0:
+            raise CheckTimeout(step, 0.0)
+        page.set_default_timeout(budget * 1000)
+        profile = self._profile
+        if profile is not None:
+            await profile.trace(page.context)
+        started = time.monotonic()
+        outcome = 'error'
+        try:
+            result = await asyncio.wait_for(action(), budget)
+            outcome = 'ok'
+            return result
+        except asyncio.TimeoutError:
+            outcome = 'timeout'
+            raise CheckTimeout(step, budget)
+        finally:
+            if profile is not None:
+                profile.record_step(step, started, budget, outcome)
+
+    def _span(self, name: str):
+        """Profillenen kontrolde alt işlem süresi; aksi halde etkisiz"""
+        return self._profile.span(name) if self._profile is not None else contextlib.nullcontext()
+
+    async def _close_lease(self, lease: Lease, ok: bool = True):
+        """Sayfayı bırak; profil kaydı varsa context kapanmadan trace'i yaz"""
+        if self._profile is not None:
+            await self._profile.stop_trace(lease.page.context)
+        await lease.close(ok)
+
+    def _record_error(self, error: Exception):
+        """Hatayı sınıflandırıp last_error'a yaz (izleme döngüsü buna göre bekler)"""
+        self.last_error = classify_error(error)
+        if self.last_error == 'unexpected':
+            print(f"[ERROR] Beklenmedik hata: {error}")
+            import traceback
+            traceback.print_exc()
+        else:
+            print(f"[ERROR] Kontrol başarısız ({self.last_error}): {error}")
+
+    def _unchanged_result(self, timestamp: str, recorded: Optional[set] = None) -> Dict:
+        """
+        Sonuç bölgesi önceki kontrolle aynıysa ayrıştırma, geçiş mantığı ve
+        state yazımı atlanır; sadece bellekteki last_checked güncellenir.
+        """
+        for state_key in self._last_state_keys:
+            if state_key in self.state:
+                self.state[state_key]['last_checked'] = timestamp
+
+        print(f"[INFO] Sonuç bölgesi değişmedi (parmak izi {self._last_fingerprint}), ayrıştırma ve state yazımı atlandı")
+        self._record_observation(self._last_result['wagons'], timestamp, recorded)
+        result = dict(self._last_result)
+        result['timestamp'] = timestamp
+        result['notification_sent'] = False
+        result['unchanged'] = True
+        return result
 
     async def _fill_from_station(self, page: Page):
         """
@@ -356,6 +901,7 @@ class TCDDWatcher:
         - Neden: UI'de değişmeyecek olan text kullanılır
         """
         print("[INFO] Seferler aranıyor...")
+        self._search_timed_out = False
         search_button = page.locator('#searchSeferButton')
         await search_button.click()
 
@@ -363,14 +909,24 @@ class TCDDWatcher:
         print("[INFO] Seferler yükleniyor...")
         try:
             # Hem vagon butonlarını hem de fiyat bilgilerini içeren bir selector bekle
-            await page.wait_for_selector('.price', timeout=20000)
+            # (zaman aşımı _step'in ayarladığı adım bütçesidir)
+            await page.wait_for_selector('.price')
             print("[INFO] Seferler yüklendi")
         except Exception:
+            self._search_timed_out = True
             print("[WARNING] Sefer listesi yüklenirken beklenenden uzun sürdü veya boş sonuç döndü.")
 
-    async def _check_all_wagon_availability(self, page: Page) -> Dict:
+    async def _check_all_wagon_availability(self, page: Page, previous_fingerprint: Optional[str] = None) -> Dict:
         """
         Tüm vagon tiplerinin durumunu kontrol et
+
+        Sayfa içinde vagon butonları, durumları ve fiyatlarından ucuz bir
+        parmak izi (FNV-1a) hesaplanır. previous_fingerprint ile aynıysa sonuç
+        nesnesi hiç oluşturulmaz ve 'unchanged': True döner.
+
+        Aranan vagon tipi dışındaki butonlar sayfa içinde elenir (parmak izine
+        de girmez); fiyat sayfada kuruşa çevrilir ve fiyat tavanıyla
+        karşılaştırılır (history_store.parse_price_kurus ile aynı kurallar).
         """
         if self.wagon_type == WagonType.ALL:
             print(f"[INFO] Tüm vagon tipleri durumu kontrol ediliyor...")
@@ -378,11 +934,19 @@ class TCDDWatcher:
             print(f"[INFO] {self.wagon_type.value} vagon durumu kontrol ediliyor...")
 
         # JavaScript ile durum kontrolü
-        status_data = await page.evaluate('''() => {
-            const results = {
-                'EKONOMİ': null,
-                'BUSINESS': null,
-                'YATAKLI': null
+        evaluation = await page.evaluate('''({ previousFingerprint, wanted, maxPrice }) => {
+            const candidates = [];
+            let signature = '';
+
+            // Türkçe biçim: '.' binlik, ',' ondalık ayırıcı ("1.234,50 TL" -> 123450)
+            const parseKurus = (text) => {
+                const digits = (text || '').replace(/[^0-9.,]/g, '');
+                if (!/[0-9]/.test(digits)) return null;
+                const comma = digits.lastIndexOf(',');
+                const whole = (comma >= 0 ? digits.slice(0, comma) : digits).replace(/[.,]/g, '') || '0';
+                const frac = ((comma >= 0 ? digits.slice(comma + 1) : '') + '00').slice(0, 2);
+                if (!/^[0-9]{2}$/.test(frac)) return null;
+                return parseInt(whole, 10) * 100 + parseInt(frac, 10);
             };
 
             const buttons = document.querySelectorAll('button');
@@ -395,42 +959,99 @@ class TCDDWatcher:
                 else if (text.includes('YATAKLI')) type = 'YATAKLI';
                 else if (text.includes('LOCA')) type = 'LOCA';
 
-                if (type) {
+                if (type && (!wanted || type === wanted)) {
                     const isDisabled = btn.classList.contains('disabled') || btn.hasAttribute('disabled');
-                    const priceElement = btn.closest('.col-md-12') ? btn.closest('.col-md-12').querySelector('.price') : null;
+                    const container = btn.closest('.col-md-12');
+                    const priceElement = container ? container.querySelector('.price') : null;
                     const price = priceElement ? priceElement.textContent.trim() : '';
-                    const passengersElement = btn.closest('.col-md-12') ? btn.closest('.col-md-12').querySelector('[class*="passenger"]') : null;
-                    const passengers = passengersElement ? (parseInt(passengersElement.textContent.trim()) || 1) : 1;
-
-                    results[type] = {
-                        isDisabled,
-                        price,
-                        passengers,
-                        buttonText: text.trim()
-                    };
+                    const passengersElement = container ? container.querySelector('[class*="passenger"]') : null;
+                    const passengersText = passengersElement ? passengersElement.textContent.trim() : '';
+
+                    signature += type + '|' + isDisabled + '|' + price + '|' + passengersText + '\\n';
+                    candidates.push([type, isDisabled, price, passengersText, text]);
+                }
+            });
+
+            // FNV-1a (32 bit)
+            let hash = 0x811c9dc5;
+            for (let i = 0; i < signature.length; i++) {
+                hash ^= signature.charCodeAt(i);
+                hash = Math.imul(hash, 0x01000193) >>> 0;
+            }
+            const fingerprint = hash.toString(16).padStart(8, '0') + ':' + candidates.length;
+
+            if (previousFingerprint && fingerprint === previousFingerprint) {
+                return { fingerprint, unchanged: true, results: null };
+            }
+
+            const results = {
+                'EKONOMİ': null,
+                'BUSINESS': null,
+                'YATAKLI': null
+            };
+            // Tip başına en iyi sefer: tavan içindeki en ucuz müsait sefer, yoksa
+            // en ucuz müsait sefer (tavanın üstünde), o da yoksa DOLU
+            const rank = (entry) => [
+                entry.isDisabled || entry.price === 'DOLU' ? 1 : 0,
+                entry.withinCeiling ? 0 : 1,
+                entry.priceKurus === null ? Infinity : entry.priceKurus
+            ];
+            const better = (a, b) => {
+                const ra = rank(a), rb = rank(b);
+                for (let i = 0; i < ra.length; i++) {
+                    if (ra[i] !== rb[i]) return ra[i] < rb[i];
+                }
+                return false;
+            };
+            candidates.forEach(([type, isDisabled, price, passengersText, text]) => {
+                const priceKurus = isDisabled || price === 'DOLU' ? null : parseKurus(price);
+                const entry = {
+                    isDisabled,
+                    price,
+                    priceKurus,
+                    withinCeiling: maxPrice === null || priceKurus === null || priceKurus <= maxPrice,
+                    passengers: parseInt(passengersText) || 1,
+                    buttonText: text.trim()
+                };
+                if (!results[type] || better(entry, results[type])) {
+                    results[type] = entry;
                 }
             });
 
-            return results;
-        }''')
+            return { fingerprint, unchanged: false, results };
+        }''', {
+            'previousFingerprint': previous_fingerprint,
+            'wanted': self.wagon_type.value if self.wagon_type != WagonType.ALL else None,
+            'maxPrice': self.max_price
+        })
+
+        fingerprint = evaluation['fingerprint']
+        if evaluation['unchanged']:
+            return {
+                'wagons': None,
+                'fingerprint': fingerprint,
+                'unchanged': True,
+                'timestamp': datetime.now().isoformat()
+            }
+
+        status_data = evaluation['results']
 
         if not status_data or not any(status_data.values()):
             print("[WARNING] Vagon tipleri bulunamadı!")
             return {
                 'wagons': {},
+                'fingerprint': fingerprint,
+                'unchanged': False,
                 'timestamp': datetime.now().isoformat()
             }
 
         # Sonuçları formatla
         wagons = {}
         for wagon_name, wagon_data in status_data.items():
+            # Aranan vagon tipi dışındakiler sayfa içinde elendi (None)
             if wagon_data is None:
                 continue
 
-            # Erken filtreleme: Eğer ALL değilse ve bu vagon aranan değilse atla
-            if self.wagon_type != WagonType.ALL and wagon_name != self.wagon_type.value:
-                continue
-
             is_disabled = wagon_data['isDisabled']
             price = wagon_data['price']
             passengers = wagon_data.get('passengers', 1)
@@ -449,220 +1070,783 @@ class TCDDWatcher:
             wagons[WagonType(wagon_name)] = {
                 'status': status,
                 'price': price if price != 'DOLU' else None,
+                'price_kurus': wagon_data['priceKurus'] if status == 'MUSAIT' else None,
+                'within_ceiling': wagon_data['withinCeiling'],
                 'passengers': self.passengers  # Kullanıcının girdiği yolcu sayısını kullan
             }
 
         return {
             'wagons': wagons,
+            'fingerprint': fingerprint,
+            'unchanged': False,
             'timestamp': datetime.now().isoformat()
         }
 
-    async def check(self) -> Optional[Dict]:
+    async def check(self, browser: Optional[Browser] = None, warm: bool = False) -> Optional[Dict]:
         """
         Tek seferlik kontrol gerçekleştir
 
+        Args:
+            browser: Paylaşılan browser (verilmezse kontrol için yeni bir
+                Chromium başlatılır ve sonunda kapatılır)
+            warm: Arama sayfasını kontroller arasında açık tut ve sonraki
+                kontrollerde aramayı yerinde tekrarla (browser gerektirir)
+
         Returns:
             Dict: Kontrol sonucu
         """
         state_key = self._get_state_key()
         previous_status = self.state.get(state_key, {}).get('status')
 
-        print(f"\n{'='*60}")
-        print(f"TCDD BİLET İZLEYİCİSİ")
-        print(f"{'='*60}")
-        print(f"Hat: {self.from_station} → {self.to_station}")
-        print(f"Tarih: {self.date}")
-        print(f"Hat: {self.from_station} → {self.to_station}")
-        print(f"Tarih: {self.date}")
-        print(f"Vagon Tipi: {self.wagon_type.value if self.wagon_type != WagonType.ALL else 'TÜMÜ'}")
-        print(f"Yolcu Sayısı: {self.passengers}")
-        print(f"Önceki Durum: {previous_status or 'Yok'}")
-        print(f"{'='*60}\n")
+        if not self._banner_shown:
+            # Tam başlık yalnızca ilk kontrolde; izleme döngüsünde tekrarlanmaz
+            self._banner_shown = True
+            print(f"\n{'='*60}")
+            print(f"TCDD BİLET İZLEYİCİSİ")
+            print(f"{'='*60}")
+            print(f"Hat: {self.from_station} → {self.to_station}")
+            print(f"Tarih: {self.date}")
+            print(f"Vagon Tipi: {self.wagon_type.value if self.wagon_type != WagonType.ALL else 'TÜMÜ'}")
+            print(f"Yolcu Sayısı: {self.passengers}")
+            print(f"Önceki Durum: {previous_status or 'Yok'}")
+            print(f"{'='*60}\n")
+        else:
+            print(f"[DEBUG] Önceki durum: {previous_status or 'Yok'}")
+
+        self.last_error = None
+        # İstenmişse bu kontrolün trace, cProfile ve adım süreleri kaydedilir
+        profile = self._profile = PROFILER.begin(self._get_state_key())
+        if profile is None:
+            return await self._run_check(browser, warm)
+        outcome = 'cancelled'
+        try:
+            result = await self._run_check(browser, warm)
+            outcome = 'ok' if result is not None else (self.last_error or 'error')
+            return result
+        finally:
+            self._profile = None
+            await profile.finish(outcome)
+
+    async def _run_check(self, browser: Optional[Browser], warm: bool) -> Optional[Dict]:
+        if browser is not None:
+            if warm:
+                return await self._check_warm(browser, CheckDeadline())
+            return await self._check_with_browser(browser, CheckDeadline())
+
+        from playwright.async_api import async_playwright
 
         async with async_playwright() as p:
-            # Browser başlat (headless=False - gerçek kullanıcıya benzer)
-            # User-Agent ve diğer başlıklar ayarla
-            browser = await p.chromium.launch(
-                headless=True,  # Sunucu ortamında True olmalı
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                ]
-            )
+            browser = await launch_browser(p)
+            try:
+                return await self._check_with_browser(browser, CheckDeadline())
+            finally:
+                # Browser'ı kapat (iptal edildiyse beklemeden)
+                if not CANCEL_EVENT.is_set():
+                    await asyncio.sleep(2)  # Son görüntüleme için bekleme
+                await browser.close()
 
-            context = await browser.new_context(
-                user_agent=USER_AGENT,
-                viewport={'width': 1920, 'height': 1080},
-                locale='tr-TR'
-            )
+    async def _new_context(self, browser: Browser):
+        """Kontrol için yeni, izole bir browser context'i aç"""
+        # User-Agent ve diğer başlıklar ayarla; kayıtlı localStorage varsa onunla başla
+        # (çerezleri SessionJar tohumlar, oturum yenileyen context çerezsiz açılır)
+        context = await browser.new_context(
+            user_agent=USER_AGENT,
+            viewport={'width': 1920, 'height': 1080},
+            locale='tr-TR',
+            storage_state=load_storage_state()
+        )
+        cache = asset_cache()
+        if cache is not None:
+            await cache.attach(context)
+        return context
+
+    async def _open_page(self, browser: Browser) -> Lease:
+        """Kontrol sayfası: browser'ın oturum havuzundan (bkz. session_pool.py)"""
+        return await open_page(browser, lambda: self._new_context(browser), BASE_URL)
+
+    async def _check_with_browser(self, browser: Browser, deadline: CheckDeadline) -> Optional[Dict]:
+        """Verilen browser üzerinde oturum havuzundan bir sayfa alarak kontrolü yap"""
+        lease = None
+        ok = False
+        try:
+            lease = await self._fetch_results(browser, deadline)
+            result = await self._process_results(lease.page, deadline)
+            ok = True
+            return result
 
-            page = await context.new_page()
+        except CheckCancelled:
+            raise
+
+        except Exception as e:
+            self._record_error(e)
+            return None
 
+        finally:
+            if lease is not None:
+                await self._close_lease(lease, ok)
+
+    async def _fetch_results(self, browser: Browser, deadline: CheckDeadline):
+        """
+        Oturum havuzundan alınan sayfada sonuç sayfasını aç
+
+        HEDGE_AFTER > 0 iken ilk deneme bu sürede bitmezse ikinci bir sayfa
+        aynı aramayı başlatır; ilk başarılı olan kazanır, diğeri iptal edilip
+        bırakılır. Arama salt okunur olduğu için iki kez yapılması güvenlidir;
+        sonuç değerlendirmesi (state, bildirim) yalnızca kazanan sayfada çalışır.
+
+        Returns:
+            Lease: Çağıran _close_lease() ile sayfayı bırakmakla sorumludur
+        """
+        async def attempt():
+            lease = await self._open_page(browser)
             try:
-                # 1. Ana sayfaya git
-                print(f"[INFO] Ana sayfaya gidiliyor: {BASE_URL}")
-                await page.goto(BASE_URL, wait_until='domcontentloaded')
-                await asyncio.sleep(2)
+                await self._open_results(lease.page, deadline)
+                return lease
+            except asyncio.CancelledError:
+                await self._close_lease(lease)
+                raise
+            except BaseException:
+                await self._close_lease(lease, ok=False)
+                raise
+
+        if HEDGE_AFTER <= 0:
+            return await attempt()
+
+        primary = asyncio.ensure_future(attempt())
+        done, _ = await asyncio.wait({primary}, timeout=HEDGE_AFTER)
+        if done:
+            return primary.result()
+
+        print(f"[INFO] İlk deneme {HEDGE_AFTER:g} sn içinde bitmedi, ikinci context ile paralel deneme başlatılıyor")
+        pending = {primary, asyncio.ensure_future(attempt())}
+        winner = None
+        error = None
+        while pending and winner is None and not isinstance(error, CheckCancelled):
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    if error is None or isinstance(task.exception(), CheckCancelled):
+                        error = task.exception()
+                elif winner is None:
+                    winner = task.result()
+                else:
+                    await self._close_lease(task.result())
+
+        for task in pending:
+            task.cancel()
+        # İptal edilmeden hemen önce biten deneme sayfasını döndürmüş olabilir
+        for outcome in await asyncio.gather(*pending, return_exceptions=True):
+            if not isinstance(outcome, BaseException):
+                await self._close_lease(outcome)
+        if winner is None:
+            raise error
+        return winner
+
+    async def _check_warm(self, browser: Browser, deadline: CheckDeadline) -> Optional[Dict]:
+        """
+        Sıcak oturum ile kontrol
 
-                # 2. İstasyonları seç
+        İlk kontrolde (ve oturum bayatladığında) tam akış çalışır; sonraki
+        kontrollerde ana sayfa yüklemesi ve istasyon otomatik tamamlama
+        atlanır, yalnızca tarih seçilip arama yeniden gönderilir.
+        """
+        try:
+            if await self._warm_session_usable():
+                try:
+                    page = self._warm_page
+                    await self._step('yerinde arama', page, deadline, lambda: self._requery(page))
+                    return await self._process_results(page, deadline)
+                except CheckCancelled:
+                    raise
+                except Exception as e:
+                    print(f"[WARNING] Yerinde arama başarısız ({e}), oturum yeniden açılıyor...")
+                    await self.close_warm_session()
+
+            self._warm_lease = await self._fetch_results(browser, deadline)
+            self._warm_page = self._warm_lease.page
+            self._warm_opened_at = time.monotonic()
+            return await self._process_results(self._warm_page, deadline)
+
+        except CheckCancelled:
+            await self.close_warm_session()
+            raise
+
+        except Exception as e:
+            self._record_error(e)
+            await self.close_warm_session()
+            return None
+
+    async def _warm_session_usable(self) -> bool:
+        """Açık arama sayfası yeniden kullanılabilir mi (bayat oturum tespiti)"""
+        page = self._warm_page
+        if page is None:
+            return False
+        if page.is_closed() or not page.context.browser.is_connected():
+            print("[INFO] Sıcak oturum kapanmış, yeniden açılacak")
+            await self.close_warm_session()
+            return False
+        if time.monotonic() - self._warm_opened_at > WARM_SESSION_MAX_AGE:
+            print("[INFO] Sıcak oturum süresi doldu, sayfa yeniden açılacak")
+            await self.close_warm_session()
+            return False
+        try:
+            # Site oturumu düşürüp başka bir sayfaya yönlendirdiyse arama formu kaybolur
+            if not page.url.startswith(BASE_URL) or await page.locator('#searchSeferButton').count() == 0:
+                print("[INFO] Arama formu bulunamadı (bayat oturum), sayfa yeniden açılacak")
+                await self.close_warm_session()
+                return False
+        except Exception:
+            await self.close_warm_session()
+            return False
+        return True
+
+    async def _requery(self, page: Page):
+        """Açık sayfada tarihi (gerekirse istasyonları) değiştirip aramayı yeniden gönder"""
+        print("[INFO] Sıcak oturum: arama yerinde tekrarlanıyor")
+        from_value, to_value = await page.evaluate('''() => [
+            document.querySelector('#fromTrainInput')?.value || '',
+            document.querySelector('#toTrainInput')?.value || ''
+        ]''')
+        if _normalize_station(self.from_station) not in _normalize_station(from_value):
+            await self._fill_from_station(page)
+        if _normalize_station(self.to_station) not in _normalize_station(to_value):
+            await self._fill_to_station(page)
+
+        await self._select_date(page)
+
+        # Eski sonuçlar işaretlenir; yalnızca yeni gelen sonuçlar beklenir
+        await page.evaluate('''() => document.querySelectorAll('.price')
+            .forEach(el => el.setAttribute('data-tcdd-stale', '1'))''')
+        await page.locator('#searchSeferButton').click()
+        await page.wait_for_selector('.price:not([data-tcdd-stale])')
+        print("[INFO] Seferler yüklendi")
+
+    async def close_warm_session(self):
+        """Sıcak oturumun sayfasını bırak (uzun ömürlü context havuza dönmez)"""
+        lease, self._warm_lease, self._warm_page = self._warm_lease, None, None
+        if lease is not None:
+            try:
+                await self._close_lease(lease, ok=False)
+            except Exception:
+                pass
+
+    async def _open_results(self, page: Page, deadline: Optional[CheckDeadline] = None):
+        """
+        Ana sayfadan sefer arama sonuçlarına kadar ilerle (adım 1-3)
+
+        Her adım CheckDeadline'dan kendi payını alır; bütçeyi aşan adım
+        CheckTimeout fırlatır.
+        """
+        deadline = deadline or CheckDeadline()
+
+        # 1. Ana sayfaya git
+        async def open_home():
+            print(f"[INFO] Ana sayfaya gidiliyor: {BASE_URL}")
+            await page.goto(BASE_URL, wait_until='domcontentloaded')
+            await asyncio.sleep(2)
+        await self._step('ana sayfa', page, deadline, open_home)
+
+        # 2. İstasyonları seç
+        async def select_stations():
+            with self._span('kalkış istasyonu'):
                 await self._fill_from_station(page)
+            with self._span('varış istasyonu'):
                 await self._fill_to_station(page)
+        await self._step('istasyon seçimi', page, deadline, select_stations)
 
-                # 2.5. Tarih seç
-                await self._select_date(page)
+        # 2.5. Tarih seç
+        await self._step('tarih seçimi', page, deadline, lambda: self._select_date(page))
 
-                # 3. Sefer ara
-                await self._search_trips(page)
+        # 3. Sefer ara
+        await self._step('sefer arama', page, deadline, lambda: self._search_trips(page))
+
+        # storage_state anlık görüntüsü ve site sürümü kontrolü (bkz. browser_cache.py)
+        try:
+            await observe_page(page)
+        except Exception as e:
+            print(f"[WARNING] Browser durumu kaydedilemedi: {e}")
+
+    async def _process_results(self, page: Page, deadline: Optional[CheckDeadline] = None,
+                               recorded: Optional[set] = None) -> Dict:
+        """
+        Sonuç sayfasını değerlendir, geçişleri işle ve state'i güncelle (adım 4-6)
 
-                # 4. Tüm vagon durumlarını kontrol et
-                current_status_data = await self._check_all_wagon_availability(page)
-                wagons = current_status_data['wagons']
-                current_timestamp = current_status_data['timestamp']
+        Aynı hat ve tarihi izleyen birden fazla izleyici tek bir sonuç sayfası
+        üzerinde sırayla çağrılabilir (bkz. check_route_group).
+        """
+        # 4. Tüm vagon durumlarını kontrol et
+        # Bu noktadan sonra iptal edilmez: geçişler ve state tutarlı kalmalı
+        # Bellekte önceki sonuç varsa parmak izi sayfa içinde karşılaştırılır
+        previous_fingerprint = self._last_fingerprint if self._last_result is not None else None
+        current_status_data = await self._step(
+            'sonuç değerlendirme', page, deadline or CheckDeadline(),
+            lambda: self._check_all_wagon_availability(page, previous_fingerprint)
+        )
+        current_timestamp = current_status_data['timestamp']
+        if current_status_data['unchanged']:
+            return self._unchanged_result(current_timestamp, recorded)
+        if self.capture is not None:
+            await self._capture_page(page, current_status_data)
+
+        wagons = current_status_data['wagons']
+        fingerprint = current_status_data['fingerprint']
+        self._record_observation(wagons, current_timestamp, recorded)
+
+        # 5. Durum karşılaştırma ve aksiyon
+        result = {
+            'from': self.from_station,
+            'to': self.to_station,
+            'date': self.date,
+            'wagon_type': self.wagon_type.value if self.wagon_type != WagonType.ALL else 'ALL',
+            'passengers': self.passengers,
+            'wagons': wagons,
+            'timestamp': current_timestamp,
+            'notification_sent': False,
+            'wagon_not_found': False  # Yeni: Vagon tipi bu seferde yok mu?
+        }
 
-                # 5. Durum karşılaştırma ve aksiyon
-                result = {
-                    'from': self.from_station,
-                    'to': self.to_station,
-                    'date': self.date,
-                    'wagon_type': self.wagon_type.value if self.wagon_type != WagonType.ALL else 'ALL',
+        # Önemli: Eğer aranan vagon tipi bu seferde hiç yoksa, izlemeyi durdur
+        if self.wagon_type != WagonType.ALL:
+            wagon_exists = self.wagon_type.value in [w.value for w in wagons.keys()] # Check against enum values
+            if not wagon_exists:
+                print(f"\n⚠️  [WARNING] {self.wagon_type.value} vagon tipi bu seferde bulunmuyor!")
+                print(f"[INFO] Bu hat için {self.wagon_type.value} vagonu mevcut değil.")
+                print(f"[INFO] İzleme sonlandırılıyor...\n")
+                result['wagon_not_found'] = True
+                result['ticket_found'] = False
+                
+                # State dosyasına vagon bulunamadı durumunu kaydet
+                state_key = self._get_state_key()
+                self.state[state_key] = {
+                    'status': 'DOLU',
+                    'price': None,
                     'passengers': self.passengers,
-                    'wagons': wagons,
-                    'timestamp': current_timestamp,
-                    'notification_sent': False,
-                    'wagon_not_found': False  # Yeni: Vagon tipi bu seferde yok mu?
+                    'last_checked': current_timestamp,
+                    'wagon_not_found': True  # Özel flag
                 }
+                self._save_state({state_key: self.state[state_key]})
+                print(f"[INFO] State'e vagon bulunamadı durumu kaydedildi: {state_key}")
+                
+                return result
 
-                # Önemli: Eğer aranan vagon tipi bu seferde hiç yoksa, izlemeyi durdur
-                if self.wagon_type != WagonType.ALL:
-                    wagon_exists = self.wagon_type.value in [w.value for w in wagons.keys()] # Check against enum values
-                    if not wagon_exists:
-                        print(f"\n⚠️  [WARNING] {self.wagon_type.value} vagon tipi bu seferde bulunmuyor!")
-                        print(f"[INFO] Bu hat için {self.wagon_type.value} vagonu mevcut değil.")
-                        print(f"[INFO] İzleme sonlandırılıyor...\n")
-                        result['wagon_not_found'] = True
-                        result['ticket_found'] = False
-                        
-                        # State dosyasına vagon bulunamadı durumunu kaydet
-                        state_key = self._get_state_key()
-                        self.state[state_key] = {
-                            'status': 'DOLU',
-                            'price': None,
-                            'passengers': self.passengers,
-                            'last_checked': current_timestamp,
-                            'wagon_not_found': True  # Özel flag
-                        }
-                        self._save_state(self.state)
-                        print(f"[INFO] State'e vagon bulunamadı durumu kaydedildi: {state_key}")
-                        
-                        return result
+        # Her vagon tipi için kontrol
+        notification_sent_count = 0
+        found_wagon_types = []
+        opened: List[Tuple[TicketStatus, str, str]] = []   # (durum, vagon tipi, 'opened' / 'price_drop')
 
-                # Her vagon tipi için kontrol
-                notification_sent_count = 0
-                found_wagon_types = []
+        for wagon_type_name, wagon_data in wagons.items():
+            # Eğer spesifik bir vagon tipi aranıyorsa ve bu o değilse, loglama ve işlem yapma
+            # Ancak ALL ise hepsini işle
+            if self.wagon_type != WagonType.ALL and wagon_type_name != self.wagon_type.value:
+                continue
 
-                for wagon_type_name, wagon_data in wagons.items():
-                    # Eğer spesifik bir vagon tipi aranıyorsa ve bu o değilse, loglama ve işlem yapma
-                    # Ancak ALL ise hepsini işle
-                    if self.wagon_type != WagonType.ALL and wagon_type_name != self.wagon_type.value:
-                        continue
+            wagon_type_enum = WagonType(wagon_type_name)
+            current_status = wagon_data['status']
+            current_price = wagon_data['price']
+            current_passengers = wagon_data.get('passengers', 1)
+
+            # Önceki durumu state'den al
+            state_key = self._get_state_key_for_wagon(wagon_type_enum, current_passengers)
+            previous_status = self.state.get(state_key, {}).get('status')
+            previous_price = parse_price_kurus(self.state.get(state_key, {}).get('price'))
+            current_kurus = wagon_data.get('price_kurus')
+
+            # Sadece DOLU → MÜSAİT geçişinde ve fiyatın tavanı aşağı doğru geçmesinde aksiyon al
+            if current_passengers < self.passengers and current_status == 'MUSAIT':
+                 print(f"[INFO] {wagon_type_enum.value} MÜSAİT ancak yeterli koltuk yok ({current_passengers} < {self.passengers})")
+                 current_status = 'DOLU' # Yetersiz koltuk = DOLU muamelesi yap
+
+            price_dropped = previous_status == 'MUSAIT' and crossed_ceiling(previous_price, current_kurus, self.max_price)
+
+            if current_status == 'MUSAIT' and not wagon_data.get('within_ceiling', True):
+                print(f"\n[INFO] {wagon_type_enum.value} MÜSAİT ancak fiyat tavanın üstünde "
+                      f"({current_price} > {format_price_kurus(self.max_price)})")
+
+            elif current_status == 'MUSAIT' and (previous_status == 'DOLU' or price_dropped):
+                print("\n" + "!"*60)
+                print(f"! {wagon_type_enum.value} {'FİYAT DÜŞTÜ' if price_dropped else 'BİLET AÇILDI'} !")
+                print("!"*60)
+                print(f"Hat: {self.from_station} → {self.to_station}")
+                print(f"Tarih: {self.date}")
+                print(f"Yolcu Sayısı: {current_passengers}")
+                if price_dropped:
+                    print(f"Fiyat: {format_price_kurus(previous_price)} → {current_price}")
+                else:
+                    print(f"Fiyat: {current_price}")
+                print(f"Zaman: {current_timestamp}")
+                print("!"*60 + "\n")
+
+                # Firebase bildirimi gönder
+                ticket_status = TicketStatus(
+                    from_station=self.from_station,
+                    to_station=self.to_station,
+                    date=self.date,
+                    status=current_status,
+                    price=current_price,
+                    timestamp=current_timestamp
+                )
 
-                    wagon_type_enum = WagonType(wagon_type_name)
-                    current_status = wagon_data['status']
-                    current_price = wagon_data['price']
-                    current_passengers = wagon_data.get('passengers', 1)
-
-                    # Önceki durumu state'den al
-                    state_key = self._get_state_key_for_wagon(wagon_type_enum, current_passengers)
-                    previous_status = self.state.get(state_key, {}).get('status')
-
-                    # Sadece DOLU → MÜSAİT geçişinde aksiyon al
-                    if current_passengers < self.passengers and current_status == 'MUSAIT':
-                         print(f"[INFO] {wagon_type_enum.value} MÜSAİT ancak yeterli koltuk yok ({current_passengers} < {self.passengers})")
-                         current_status = 'DOLU' # Yetersiz koltuk = DOLU muamelesi yap
-
-                    if previous_status == 'DOLU' and current_status == 'MUSAIT':
-                        print("\n" + "!"*60)
-                        print(f"! {wagon_type_enum.value} BİLET AÇILDI !")
-                        print("!"*60)
-                        print(f"Hat: {self.from_station} → {self.to_station}")
-                        print(f"Tarih: {self.date}")
-                        print(f"Yolcu Sayısı: {current_passengers}")
-                        print(f"Fiyat: {current_price}")
-                        print(f"Zaman: {current_timestamp}")
-                        print("!"*60 + "\n")
-
-                        # Firebase bildirimi gönder
-                        ticket_status = TicketStatus(
-                            from_station=self.from_station,
-                            to_station=self.to_station,
-                            date=self.date,
-                            status=current_status,
-                            price=current_price,
-                            timestamp=current_timestamp
-                        )
-
-                        notification_sent = await self.notification_service.send_ticket_available_notification(
-                            ticket_status, wagon_type=wagon_type_enum.value
-                        )
-                        result['notification_sent'] = True
-                        result['ticket_found'] = True
-                        # Format: EKONOMİ - 150 TL
-                        found_wagon_types.append(f"{wagon_type_enum.value} - {current_price}")
-                        notification_sent_count += 1
-
-                    elif current_status == 'MUSAIT':
-                        print(f"\n[INFO] {wagon_type_enum.value} bilet zaten MÜSAİT durumunda")
-                        if current_price:
-                            print(f"[INFO] Fiyat: {current_price}")
-                        # Geriye dönük uyumluluk veya sürekli bulma için ticket_found işaretle
-                        result['ticket_found'] = True
-                        # Format: EKONOMİ - 150 TL
-                        found_wagon_types.append(f"{wagon_type_enum.value} - {current_price}")
-                    elif current_status == 'DOLU':
-                        print(f"\n[INFO] {wagon_type_enum.value} bilet DOLU durumunda")
-
-                # Bilet bulunduysa ve watching modundaysak çıkış yapmadan önce özel mesaj bas
-                if result.get('ticket_found') and found_wagon_types:
-                    # Tekrar edenleri temizle
-                    unique_types = list(set(found_wagon_types))
-                    types_str = ", ".join(unique_types)
-                    print(f"[SUCCESS] BİLET BULUNDU! ({types_str}) Kontrol sonlandırılıyor.")
-                    sys.exit(1)
-
-                # Hiç bilet açılmadıysa bilgi ver
-                if notification_sent_count == 0 and not result.get('ticket_found'):
-                    print(f"\n[INFO] Henüz {self.wagon_type.value if self.wagon_type != WagonType.ALL else 'TÜMÜ'} vagon açılmadı")
-
-                # 6. State'i güncelle
-                for wagon_type_enum, wagon_data in wagons.items():
-                    # State güncellemede de filtre uygula
-                    if self.wagon_type != WagonType.ALL and wagon_type_enum.value != self.wagon_type.value:
-                        continue 
-                        
-                    state_key = self._get_state_key_for_wagon(wagon_type_enum, wagon_data.get('passengers', 1))
-                    self.state[state_key] = {
-                        'status': wagon_data['status'],
-                        'price': wagon_data['price'],
-                        'passengers': wagon_data.get('passengers', 1),
-                        'last_checked': current_timestamp
-                    }
-                self._save_state(self.state)
+                opened.append((ticket_status, wagon_type_enum.value, 'price_drop' if price_dropped else 'opened'))
+                result['notification_sent'] = True
+                result['ticket_found'] = True
+                # Format: EKONOMİ - 150 TL
+                found_wagon_types.append(f"{wagon_type_enum.value} - {current_price}")
+                notification_sent_count += 1
+
+            elif current_status == 'MUSAIT':
+                print(f"\n[INFO] {wagon_type_enum.value} bilet zaten MÜSAİT durumunda")
+                if current_price:
+                    print(f"[INFO] Fiyat: {current_price}")
+                # Geriye dönük uyumluluk veya sürekli bulma için ticket_found işaretle
+                result['ticket_found'] = True
+                # Format: EKONOMİ - 150 TL
+                found_wagon_types.append(f"{wagon_type_enum.value} - {current_price}")
+            elif current_status == 'DOLU':
+                print(f"\n[INFO] {wagon_type_enum.value} bilet DOLU durumunda")
+
+        # Aynı kontrolde açılan vagon tipleri tek bildirimde birleştirilir
+        if opened and self.notify:
+            digest = self.digest if self.digest is not None else NotificationDigest()
+            for ticket_status, wagon_type_name, reason in opened:
+                digest.add(ticket_status, wagon_type_name, reason=reason)
+            if self.digest is None:
+                await self.notification_service.send_digests(digest.pop_all())
+
+        # Bilet bulunduysa ve watching modundaysak çıkış yapmadan önce özel mesaj bas
+        if result.get('ticket_found') and found_wagon_types:
+            # Tekrar edenleri temizle
+            unique_types = list(set(found_wagon_types))
+            types_str = ", ".join(unique_types)
+            print(f"[SUCCESS] BİLET BULUNDU! ({types_str}) Kontrol sonlandırılıyor.")
+            if self.exit_on_found:
+                sys.exit(1)
+
+        # Hiç bilet açılmadıysa bilgi ver
+        if notification_sent_count == 0 and not result.get('ticket_found'):
+            print(f"\n[INFO] Henüz {self.wagon_type.value if self.wagon_type != WagonType.ALL else 'TÜMÜ'} vagon açılmadı")
+
+        # 6. State'i güncelle
+        state_keys = []
+        for wagon_type_enum, wagon_data in wagons.items():
+            # State güncellemede de filtre uygula
+            if self.wagon_type != WagonType.ALL and wagon_type_enum.value != self.wagon_type.value:
+                continue 
+                
+            state_key = self._get_state_key_for_wagon(wagon_type_enum, wagon_data.get('passengers', 1))
+            self.state[state_key] = {
+                'status': wagon_data['status'],
+                'price': wagon_data['price'],
+                'passengers': wagon_data.get('passengers', 1),
+                'last_checked': current_timestamp
+            }
+            state_keys.append(state_key)
+
+        # Parmak izi kalıcı state'dekiyle aynıysa (ör. cron modunda yeni süreç)
+        # durumlar değişmemiştir; dosya yazımı atlanır
+        fingerprint_key = self._get_fingerprint_key()
+        persisted_fingerprint = self.state.get(fingerprint_key, {}).get('fingerprint')
+        if fingerprint != persisted_fingerprint:
+            self.state[fingerprint_key] = {
+                'fingerprint': fingerprint,
+                'last_checked': current_timestamp
+            }
+            # Yalnızca bu izleyicinin anahtarları yazılır; diğer süreçlerin güncel kayıtları ezilmez
+            self._save_state({key: self.state[key] for key in state_keys + [fingerprint_key]})
+        else:
+            print("[INFO] Durum değişmedi, state yazımı atlandı")
 
-                return result
+        self._last_fingerprint = fingerprint
+        self._last_result = result
+        self._last_state_keys = state_keys
+
+        return result
 
+
+def load_watch_config(path: str) -> List[Dict]:
+    """
+    İzleme tanımlarını JSON veya YAML dosyasından oku
+
+    Dosya bir liste ya da {"watches": [...]} olabilir. Her tanım: from, to,
+    date ve isteğe bağlı wagon_type (varsayılan ALL), passengers (varsayılan 1),
+    max_price (TL cinsinden fiyat tavanı).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.lower().endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError("YAML konfigürasyonu için PyYAML yüklü olmalı (pip install pyyaml)")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+
+    watches = data.get('watches', []) if isinstance(data, dict) else (data or [])
+    for i, watch in enumerate(watches):
+        missing = [field for field in ('from', 'to', 'date') if not watch.get(field)]
+        if missing:
+            raise ValueError(f"{i + 1}. izleme tanımında eksik alan(lar): {', '.join(missing)}")
+        watch.setdefault('wagon_type', 'ALL')
+        watch.setdefault('passengers', 1)
+    return watches
+
+
+async def check_route_group(watchers: List[TCDDWatcher], browser: Browser) -> List[Optional[Dict]]:
+    """
+    Aynı hat ve tarihi izleyen izleyicileri tek bir sonuç sayfası ile kontrol et
+
+    Arama (ana sayfa, istasyonlar, tarih) bir kez yapılır; her izleyici kendi
+    vagon tipi ve yolcu sayısına göre aynı sayfayı değerlendirir.
+    """
+    lead = watchers[0]
+    deadline = CheckDeadline()
+    lease = await lead._open_page(browser)
+    page = lease.page
+    ok = False
+    try:
+        try:
+            await lead._open_results(page, deadline)
+        except CheckCancelled:
+            raise
+        except Exception as e:
+            print(f"[ERROR] {lead.from_station} → {lead.to_station} ({lead.date}) arama hatası ({classify_error(e)}): {e}")
+            return [None] * len(watchers)
+        ok = True
+
+        results = []
+        # Sayfanın gözlemleri geçmişe izleyici başına değil, vagon tipi başına bir kez yazılır
+        recorded = set()
+        for watcher in watchers:
+            try:
+                # Her izleyicinin değerlendirmesi kendi bütçesini alır
+                results.append(await watcher._process_results(page, recorded=recorded))
+            except CheckCancelled:
+                raise
             except Exception as e:
-                print(f"[ERROR] Beklenmedik hata: {e}")
-                import traceback
-                traceback.print_exc()
-                return None
+                print(f"[ERROR] {watcher._get_state_key()} değerlendirme hatası ({classify_error(e)}): {e}")
+                results.append(None)
+        return results
+    finally:
+        await lease.close(ok)
 
-            finally:
-                # Browser'ı kapat
-                await asyncio.sleep(2)  # Son görüntüleme için bekleme
-                await browser.close()
+
+async def run_batch(watches: List[Dict], concurrency: int = 4) -> int:
+    """
+    Toplu cron modu: çok sayıda izleme tanımını tek çalıştırmada kontrol et
+
+    Tanımlar (from, to, date) bazında gruplanır, gruplar tek bir browser
+    üzerinde eşzamanlı çalıştırılır ve izleyicilerin değiştirdiği state
+    anahtarları sonda tek seferde yazılır.
+
+    Returns:
+        int: Toplam çıkış kodu (2 = en az bir kontrol başarısız,
+             1 = en az bir bildirim gönderildi, 0 = normal)
+    """
+    from playwright.async_api import async_playwright
+
+    shared_state = load_state_file()
+    # Yalnızca bu çalıştırmada değişen anahtarlar yazılır; diğer süreçlerin
+    # çalıştırma sırasında yazdığı kayıtlar yüklendiği hâliyle ezilmez
+    changed_state: Dict = {}
+    # Aynı hat/tarih için açılan vagonlar tek mesajda birleşir (bkz. notification_digest.py)
+    digest = NotificationDigest()
+    notifications = NotificationService()
+    groups: Dict[Tuple[str, str, str], List[TCDDWatcher]] = {}
+    for watch in watches:
+        watcher = TCDDWatcher(
+            from_station=watch['from'],
+            to_station=watch['to'],
+            date=watch['date'],
+            wagon_type=WagonType(watch['wagon_type']),
+            passengers=int(watch['passengers']),
+            exit_on_found=False,
+            state=shared_state,
+            max_price=price_ceiling_kurus(watch.get('max_price'))
+        )
+        watcher.deferred_state = changed_state
+        watcher.digest = digest
+        groups.setdefault((watch['from'], watch['to'], watch['date']), []).append(watcher)
+
+    print(f"[INFO] Toplu kontrol: {len(watches)} izleme, {len(groups)} hat/tarih grubu, eşzamanlılık {concurrency}")
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def flush_digests():
+        """Penceresi kapanan özetleri kontroller sürerken gönder"""
+        while True:
+            await asyncio.sleep(1)
+            await notifications.send_digests(digest.pop_due())
+
+    async with async_playwright() as p:
+        browser = await launch_browser(p)
+        flusher = asyncio.ensure_future(flush_digests())
+        try:
+            async def run_group(group):
+                async with semaphore:
+                    return await check_route_group(group, browser)
+
+            group_results = await asyncio.gather(*(run_group(g) for g in groups.values()),
+                                                 return_exceptions=True)
+        finally:
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+            await browser.close()
+            # Bekleyen özetler çıkmadan gönderilir
+            await notifications.send_digests(digest.pop_all())
+
+    # Tek transaction: tüm izleyicilerin değişiklikleri tek yazımda
+    # (iptal edildiyse o ana kadar değerlendirilen izlemeler de kaydedilir)
+    if changed_state:
+        save_state_file(changed_state)
+
+    for outcome in group_results:
+        if isinstance(outcome, CheckCancelled):
+            print("[INFO] Toplu kontrol iptal edildi.")
+            return 0
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+    exit_code = 0
+    print(f"\n{'='*60}")
+    print("TOPLU KONTROL ÖZETİ")
+    print(f"{'='*60}")
+    for group, results in zip(groups.values(), group_results):
+        for watcher, result in zip(group, results):
+            if result is None:
+                summary = "HATA"
+                exit_code = 2
+            elif result.get('wagon_not_found'):
+                summary = "Vagon tipi mevcut değil"
+            elif result.get('notification_sent'):
+                summary = "BİLET AÇILDI (bildirim gönderildi)"
+                exit_code = max(exit_code, 1)
+            elif result.get('ticket_found'):
+                summary = "MÜSAİT"
+            else:
+                summary = "DOLU"
+            print(f"  {watcher._get_state_key()}: {summary}")
+    print(f"{'='*60}\n")
+    return exit_code
+
+
+async def watch_warm(watcher: TCDDWatcher, interval_minutes: float,
+                     calendar: Optional[BurstCalendar] = None,
+                     until: Optional[datetime] = None,
+                     min_interval: Optional[float] = None) -> Optional[int]:
+    """
+    Sıcak oturumlu sürekli izleme
+
+    Browser ve arama sayfası izleme boyunca açık kalır; kontroller arasında
+    arama yalnızca yerinde tekrarlanır. Burst takvimi verilirse bekleme
+    yaklaşan ön ısıtmada kesilir ve pencere boyunca aralık daraltılır
+    (bkz. burst_windows.py).
+
+    Args:
+        until: Bu andan sonra izlemeyi bırak (soğuk döngünün burst penceresi)
+        min_interval: Burst'te bile inilmeyecek aralık (dakika, --min-interval)
+
+    Returns:
+        Optional[int]: Çıkış kodu (1 = bilet bulundu, 0 = vagon tipi mevcut
+            değil / iptal), until'e ulaşıldıysa None
+    """
+    from playwright.async_api import async_playwright
+
+    async def wait_or_cancel(seconds: float) -> bool:
+        """Bekle; iptal istenirse erken dön (True)"""
+        deadline = time.monotonic() + seconds
+        while not CANCEL_EVENT.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(remaining, 0.5))
+        return True
+
+    route = (watcher.from_station, watcher.to_station, watcher.date)
+    prewarmed_for = None
+    consecutive_failures = 0
+    async with async_playwright() as p:
+        browser = await launch_browser(p)
+        try:
+            while True:
+                watcher.check_count += 1
+                print(f"\n[INFO] ===== Kontrol #{watcher.check_count} - {datetime.now().strftime('%H:%M:%S')} =====")
+
+                if not browser.is_connected():
+                    print("[WARNING] Browser bağlantısı koptu, yeniden başlatılıyor...")
+                    await watcher.close_warm_session()
+                    browser = await launch_browser(p)
+
+                phase = calendar.phase(route) if calendar else None
+                if phase is not None and phase.start != prewarmed_for:
+                    # Pencere başlamadan oturum ve istasyon seçimi tazelenir;
+                    # burst boyunca yalnızca yerinde arama yapılır
+                    prewarmed_for = phase.start
+                    print(f"[INFO] Burst penceresi '{phase.window.name}' "
+                          f"({phase.start.strftime('%H:%M')}-{phase.end.strftime('%H:%M')}): oturum ısıtılıyor")
+                    await watcher.close_warm_session()
+
+                started = time.monotonic()
+                try:
+                    result = await watcher.check(browser=browser, warm=True)
+                except CheckCancelled:
+                    print("[INFO] İzleme iptal edildi.")
+                    return 0
+                # api_server kapasite modeli bu satırdan kontrol süresini okur
+                print(f"[INFO] Kontrol #{watcher.check_count} tamamlandı ({time.monotonic() - started:.1f} sn)")
+
+                # Vagon tipi bu seferde yoksa dur
+                if result and result.get('wagon_not_found'):
+                    print(f"[INFO] İzleme sonlandırıldı - Vagon tipi mevcut değil.")
+                    return 0
+
+                if result and result.get('ticket_found'):
+                    print(f"[SUCCESS] BİLET BULUNDU! Kontrol sonlandırılıyor.")
+                    return 1
+
+                if until is not None and datetime.now() >= until:
+                    return None
+
+                if result is None:
+                    consecutive_failures += 1
+                    wait_seconds = retry_delay(watcher.last_error, consecutive_failures)
+                    print(f"[INFO] {wait_seconds:.0f} saniye sonra tekrar denenecek ({watcher.last_error})...")
+                else:
+                    consecutive_failures = 0
+                    wait_seconds = _next_wait(calendar, route, interval_minutes, min_interval)
+                    print(f"[INFO] Bilet bulunamadı. {wait_seconds / 60:.3g} dakika sonra tekrar kontrol edilecek...")
+
+                if until is not None:
+                    wait_seconds = min(wait_seconds, max((until - datetime.now()).total_seconds(), 0))
+                if await wait_or_cancel(wait_seconds):
+                    print("[INFO] İzleme iptal edildi.")
+                    return 0
+        finally:
+            await watcher.close_warm_session()
+            await browser.close()
+
+
+def _next_wait(calendar: Optional[BurstCalendar], route: Tuple[str, str, str], interval_minutes: float,
+               min_interval: Optional[float] = None) -> float:
+    """
+    Sonraki kontrole kadar bekleme (saniye); burst takvimi varsa ona göre
+
+    BURST_RATE_BUDGET süreç başınadır; api_server'ın ayrı süreçlerdeki
+    izleyicileri bütçeyi paylaşmadığından burst aralığı min_interval'ın
+    (zamanlayıcının verdiği aralık) altına indirilmez.
+    """
+    if calendar is None:
+        return interval_minutes * 60
+    now = datetime.now()
+    phase = calendar.phase(route, now)
+    if phase is not None and phase.bursting(now):
+        print(f"[DEBUG] Burst penceresi '{phase.window.name}' ({phase.end.strftime('%H:%M')}'e kadar)")
+    return calendar.wait_seconds(route, interval_minutes, now, floor=min_interval)
 
 
 def main():
     """Ana fonksiyon - CLI argümanlarını işler"""
+    # stdout flush et
+    sys.stdout.reconfigure(line_buffering=True)
+    print("Watcher script başlatılıyor...", flush=True)
+
     parser = argparse.ArgumentParser(
         description='TCDD Taşımacılık E-Bilet İzleyicisi',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -675,6 +1859,9 @@ CRON KULLANIMI:
   # Her 3 dakikada bir kontrol
   */3 * * * * cd /path/to/tcddlisten && /usr/bin/python3 tcdd_watcher.py -f "Çiğli" -t "Konya" -d "2026-01-20" >> tcdd_watcher.log 2>&1
 
+  # Çok sayıda izleme tek çalıştırmada (tek browser, tek state yazımı)
+  */3 * * * * cd /path/to/tcddlisten && /usr/bin/python3 tcdd_watcher.py --config watches.json >> tcdd_watcher.log 2>&1
+
 NOTLAR:
   - Sadece DOLU → MÜSAİT geçişinde bildirim gönderilir
   - Otomatik satın alma yapılmaz
@@ -683,11 +1870,11 @@ NOTLAR:
         """
     )
 
-    parser.add_argument('-f', '--from', dest='from_station', required=True,
+    parser.add_argument('-f', '--from', dest='from_station',
                         help='Kalkış istasyonu (ör: Çiğli)')
-    parser.add_argument('-t', '--to', dest='to_station', required=True,
+    parser.add_argument('-t', '--to', dest='to_station',
                         help='Varış istasyonu (ör: Konya)')
-    parser.add_argument('-d', '--date', required=True,
+    parser.add_argument('-d', '--date',
                         help='Tarih (ör: 2026-01-20)')
     parser.add_argument('-w', '--wagon-type', dest='wagon_type',
                         choices=['EKONOMİ', 'BUSINESS', 'YATAKLI', 'LOCA', 'ALL'],
@@ -698,6 +1885,11 @@ NOTLAR:
                         default=1,
                         help='Yolcu sayısı (varsayılan: 1)')
     
+    parser.add_argument('--max-price', dest='max_price',
+                        type=float,
+                        default=None,
+                        help='Fiyat tavanı (TL); üstündeki açılışlar bildirilmez, tavanın altına düşüş bildirilir')
+    
     parser.add_argument('--watch', dest='watch_mode',
                         action='store_true',
                         help='Sürekli izleme modu (bulana kadar kontrol eder)')
@@ -706,9 +1898,69 @@ NOTLAR:
                         type=float,  # float - 1.5, 2.0, etc.
                         default=10,
                         help='İzleme aralığı (dakika, varsayılan: 10)')
+    parser.add_argument('--min-interval', dest='min_interval_minutes',
+                        type=float,
+                        default=None,
+                        help='Burst pencerelerinde bile inilmeyecek aralık (dakika; api_server zamanlayıcının verdiği aralığı geçirir)')
+
+    parser.add_argument('--warm', dest='warm',
+                        action='store_true',
+                        help='İzleme modunda arama sayfasını açık tut, aramayı yerinde tekrarla')
+
+    parser.add_argument('-c', '--config', dest='config',
+                        help='Toplu mod: izleme tanımlarını içeren JSON/YAML dosyası')
+    parser.add_argument('--concurrency', dest='concurrency',
+                        type=int,
+                        default=4,
+                        help='Toplu modda eşzamanlı hat/tarih grubu sayısı (varsayılan: 4)')
+
+    parser.add_argument('--burst-calendar', dest='burst_calendar',
+                        default=BURST_WINDOWS_FILE,
+                        help='İzleme modunda burst pencerelerini içeren JSON/YAML takvim (varsayılan: BURST_WINDOWS_FILE)')
+
+    parser.add_argument('--profile', dest='profile_checks',
+                        type=int,
+                        default=0,
+                        help='Sonraki N kontrolün Playwright trace, cProfile ve adım sürelerini kaydet (bkz. check_profiler.py)')
+    parser.add_argument('--profile-screenshots', dest='profile_screenshots',
+                        action='store_true',
+                        help='Profil trace\'lerine ekran görüntüsü ekle')
+
+    parser.add_argument('--log-level', dest='log_level',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        default=LOG_LEVEL if LOG_LEVEL in LEVELS else 'INFO',
+                        help='En düşük log seviyesi (varsayılan: LOG_LEVEL veya INFO)')
 
     args = parser.parse_args()
 
+    # Seviye süzgeci ve tekrar eden satırların örneklenmesi (bkz. watch_log.py)
+    install_log_filter(args.log_level)
+
+    # SIGTERM/SIGINT: mevcut adım bitince dur, browser'ı kapatarak çık
+    install_cancel_handlers()
+
+    if args.profile_checks > 0:
+        PROFILER.arm(args.profile_checks, args.profile_screenshots)
+
+    if args.config:
+        # Toplu cron modu
+        if args.watch_mode:
+            parser.error("--config ve --watch birlikte kullanılamaz")
+        try:
+            watches = load_watch_config(args.config)
+        except Exception as e:
+            print(f"[ERROR] Konfigürasyon okunamadı: {e}")
+            sys.exit(2)
+        if not watches:
+            print("[ERROR] Konfigürasyonda izleme tanımı yok")
+            sys.exit(2)
+        sys.exit(asyncio.run(run_batch(watches, args.concurrency)))
+
+    if not (args.from_station and args.to_station and args.date):
+        parser.error("--from, --to ve --date zorunludur (veya --config kullanın)")
+    if args.warm and not args.watch_mode:
+        parser.error("--warm yalnızca --watch ile kullanılabilir")
+
     # Vagon tipi enum'a çevir
     wagon_type_map = {
         'EKONOMİ': WagonType.EKONOMI,
@@ -725,49 +1977,97 @@ NOTLAR:
         to_station=args.to_station,
         date=args.date,
         wagon_type=wagon_type,
-        passengers=args.passengers
+        passengers=args.passengers,
+        max_price=price_ceiling_kurus(args.max_price)
     )
 
-    if args.watch_mode:
+    # Takvimli ön ısıtma ve sık kontrol pencereleri (bkz. burst_windows.py)
+    calendar = load_burst_calendar(args.burst_calendar) if args.watch_mode else None
+    route = (args.from_station, args.to_station, args.date)
+
+    if args.watch_mode and args.warm:
+        # Sıcak oturumlu sürekli izleme modu
+        print(f"[INFO] Sıcak oturumlu izleme başlatıldı (Her {args.interval_minutes} dakikada kontrol)")
+        try:
+            sys.exit(asyncio.run(watch_warm(watcher, args.interval_minutes, calendar,
+                                            min_interval=args.min_interval_minutes)))
+        except KeyboardInterrupt:
+            print("\n[INFO] Kullanıcı tarafından durduruldu.")
+            sys.exit(0)
+    elif args.watch_mode:
         # Sürekli izleme modu
         print(f"[INFO] Sürekli izleme başlatıldı (Her {args.interval_minutes} dakikada kontrol)")
         print(f"[INFO] Hat: {args.from_station} → {args.to_station}, Tarih: {args.date}, Vagon: {wagon_type.value}")
         
-        import time
-        check_count = 0
+        consecutive_failures = 0
         
         while True:
-            check_count += 1
-            print(f"\n[INFO] ===== Kontrol #{check_count} - {datetime.now().strftime('%H:%M:%S')} =====")
-            
-            try:
-                result = asyncio.run(watcher.check())
-                
-                # Vagon tipi bu seferde yoksa dur
-                if result and result.get('wagon_not_found'):
-                    print(f"[INFO] İzleme sonlandırıldı - Vagon tipi mevcut değil.")
+            phase = calendar.phase(route) if calendar else None
+            if phase is not None:
+                # Ön ısıtma başladı: pencere bitene kadar browser açık, sıcak oturumla sık kontrol
+                try:
+                    code = asyncio.run(watch_warm(watcher, args.interval_minutes, calendar, until=phase.end,
+                                                  min_interval=args.min_interval_minutes))
+                except KeyboardInterrupt:
+                    print("\n[INFO] Kullanıcı tarafından durduruldu.")
                     sys.exit(0)
+                if code is not None:
+                    sys.exit(code)
+                print(f"[INFO] Burst penceresi '{phase.window.name}' bitti, {args.interval_minutes} dakikalık aralığa dönülüyor")
+            else:
+                watcher.check_count += 1
+                print(f"\n[INFO] ===== Kontrol #{watcher.check_count} - {datetime.now().strftime('%H:%M:%S')} =====")
                 
-                if result and result.get('ticket_found'):
-                    print(f"[SUCCESS] BİLET BULUNDU! Kontrol sonlandırılıyor.")
-                    sys.exit(1)  # Bilet bulundu
-                else:
-                    print(f"[INFO] Bilet bulunamadı. {args.interval_minutes} dakika sonra tekrar kontrol edilecek...")
+                try:
+                    started = time.monotonic()
+                    result = asyncio.run(watcher.check())
+                    # api_server kapasite modeli bu satırdan kontrol süresini okur
+                    print(f"[INFO] Kontrol #{watcher.check_count} tamamlandı ({time.monotonic() - started:.1f} sn)")
                     
-            except KeyboardInterrupt:
-                print("\n[INFO] Kullanıcı tarafından durduruldu.")
-                sys.exit(0)
-            except Exception as e:
-                print(f"[ERROR] Hata oluştu: {e}")
-                print(f"[INFO] 1 dakika sonra tekrar denenecek...")
-                time.sleep(60)
-                continue
+                    # Vagon tipi bu seferde yoksa dur
+                    if result and result.get('wagon_not_found'):
+                        print(f"[INFO] İzleme sonlandırıldı - Vagon tipi mevcut değil.")
+                        sys.exit(0)
+                    
+                    if result and result.get('ticket_found'):
+                        print(f"[SUCCESS] BİLET BULUNDU! Kontrol sonlandırılıyor.")
+                        sys.exit(1)  # Bilet bulundu
+                    elif result is None:
+                        # Sınıflandırılmış hata: sabit 60 sn yerine hata tipine göre bekle
+                        consecutive_failures += 1
+                        wait_seconds = retry_delay(watcher.last_error, consecutive_failures)
+                        print(f"[INFO] {wait_seconds:.0f} saniye sonra tekrar denenecek ({watcher.last_error})...")
+                        if CANCEL_EVENT.wait(wait_seconds):
+                            print("[INFO] İzleme iptal edildi.")
+                            sys.exit(0)
+                        continue
+                    else:
+                        consecutive_failures = 0
+                        print(f"[INFO] Bilet bulunamadı. {args.interval_minutes} dakika sonra tekrar kontrol edilecek...")
+                        
+                except (CheckCancelled, KeyboardInterrupt):
+                    print("\n[INFO] Kullanıcı tarafından durduruldu.")
+                    sys.exit(0)
+                except Exception as e:
+                    consecutive_failures += 1
+                    wait_seconds = retry_delay(classify_error(e), consecutive_failures)
+                    print(f"[ERROR] Hata oluştu: {e}")
+                    print(f"[INFO] {wait_seconds:.0f} saniye sonra tekrar denenecek...")
+                    if CANCEL_EVENT.wait(wait_seconds):
+                        print("[INFO] İzleme iptal edildi.")
+                        sys.exit(0)
+                    continue
             
-            # Interval kadar bekle
-            time.sleep(args.interval_minutes * 60)
+            # Interval kadar bekle (iptal istenirse hemen çık); yaklaşan ön ısıtmada uyanılır
+            if CANCEL_EVENT.wait(_next_wait(calendar, route, args.interval_minutes, args.min_interval_minutes)):
+                print("[INFO] İzleme iptal edildi.")
+                sys.exit(0)
     else:
         # Tek seferlik kontrol
-        result = asyncio.run(watcher.check())
+        try:
+            result = asyncio.run(watcher.check())
+        except CheckCancelled:
+            sys.exit(0)
 
         if result:
             # Exit code: 0 = normal, 1 = bilet açıldı (notification için)
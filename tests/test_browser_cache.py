@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import browser_cache
+from browser_cache import AssetCache, load_storage_state, observe_page
+
+URL = 'https://ebilet.example/static/app.js'
+
+
+class _Request:
+    method = 'GET'
+    url = URL
+
+
+class _Response:
+    status = 200
+    headers = {'content-type': 'application/javascript', 'cache-control': 'max-age=600'}
+
+    async def body(self):
+        return b'console.log(1)'
+
+
+class _Route:
+    request = _Request()
+
+    def __init__(self):
+        self.calls = []
+
+    async def continue_(self):
+        self.calls.append('continue')
+
+    async def fulfill(self, status=None, headers=None, body=None, response=None):
+        self.calls.append(('fulfill', status or response.status, body))
+
+    async def fetch(self):
+        self.calls.append('fetch')
+        return _Response()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AssetCache(str(tmp_path))
+
+
+def test_put_and_get(cache):
+    cache.put(URL, 200, {'Content-Type': 'text/javascript', 'Content-Length': '14'}, b'console.log(1)')
+    status, headers, body = cache.get(URL)
+    assert (status, body) == (200, b'console.log(1)')
+    assert headers == {'Content-Type': 'text/javascript'}
+    assert cache.get(URL + '?v=2') is None
+
+
+def test_cached_request_is_fulfilled_and_miss_is_stored(cache):
+    route = _Route()
+    asyncio.run(cache._handle(route))
+    assert route.calls == ['fetch', ('fulfill', 200, b'console.log(1)')]
+    assert cache.get(URL)[2] == b'console.log(1)'
+
+    route = _Route()
+    asyncio.run(cache._handle(route))
+    assert route.calls == [('fulfill', 200, b'console.log(1)')]
+
+
+@pytest.mark.parametrize('damage', [
+    lambda data: data[:5],                         # başlık kesik (struct.error)
+    lambda data: data[:20],                        # meta kesik
+    lambda data: data[:14] + b'{bozuk' + data[20:],  # meta JSON değil
+])
+def test_corrupt_entry_is_dropped_and_request_continues(cache, damage):
+    cache.put(URL, 200, {'content-type': 'text/javascript'}, b'console.log(1)')
+    path = cache._path(URL)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(damage(data))
+
+    route = _Route()
+    asyncio.run(cache._handle(route))
+    assert route.calls == ['continue']
+    assert not os.path.exists(path)
+
+
+class _StatefulContext:
+    async def storage_state(self):
+        return {'cookies': [{'name': 'sid', 'value': 'eski'}],
+                'origins': [{'origin': 'https://ebilet.example', 'localStorage': [{'name': 'consent', 'value': '1'}]}]}
+
+
+class _StatefulPage:
+    context = _StatefulContext()
+
+
+def test_storage_state_never_carries_cookies(tmp_path, monkeypatch):
+    path = str(tmp_path / 'state.json')
+    monkeypatch.setattr(browser_cache, 'STORAGE_STATE_FILE', path)
+    monkeypatch.setattr(browser_cache, '_storage_state_mtime', 0.0)
+    asyncio.run(observe_page(_StatefulPage()))
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f)['cookies'] == []
+
+    # Eski sürümün çerezli dosyası da çerezsiz yüklenir
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'cookies': [{'name': 'sid', 'value': 'eski'}], 'origins': []}, f)
+    os.utime(path, (os.path.getmtime(path) + 1,) * 2)
+    assert load_storage_state() == {'cookies': [], 'origins': []}
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pytest
+
+from burst_windows import BurstCalendar, BurstWindow
+
+ROUTE = ('Ankara Gar', 'İzmir (Basmane)', '2026-02-20')
+
+
+def _calendar(*windows, rate_budget=12.0, min_interval=0.25):
+    return BurstCalendar([BurstWindow.from_dict(w) for w in windows], rate_budget, min_interval)
+
+
+DAILY = {'name': 'Gece satışı', 'at': '00:00', 'duration': 20, 'interval': 0.25, 'prewarm': 5}
+
+
+def test_window_requires_fields_and_valid_time():
+    with pytest.raises(ValueError):
+        BurstWindow.from_dict({'at': '00:00', 'duration': 20})
+    with pytest.raises(ValueError):
+        BurstWindow.from_dict({'at': '25:00', 'duration': 20, 'interval': 1})
+
+
+def test_prewarm_then_burst_then_normal():
+    calendar = _calendar(DAILY)
+    assert calendar.phase(ROUTE, datetime(2026, 1, 21, 23, 54)) is None
+
+    prewarm = calendar.phase(ROUTE, datetime(2026, 1, 21, 23, 56))
+    assert prewarm.start == datetime(2026, 1, 22, 0, 0)
+    assert not prewarm.bursting(datetime(2026, 1, 21, 23, 56))
+    assert calendar.interval(ROUTE, 10, datetime(2026, 1, 21, 23, 56)) == 10
+
+    assert calendar.interval(ROUTE, 10, datetime(2026, 1, 22, 0, 5)) == 0.25
+    assert calendar.phase(ROUTE, datetime(2026, 1, 22, 0, 20)) is None
+    assert calendar.interval(ROUTE, 10, datetime(2026, 1, 22, 0, 20)) == 10
+
+
+def test_one_shot_and_weekday_windows():
+    one_shot = _calendar({'at': '2026-01-22 18:00', 'duration': 15, 'interval': 0.5})
+    assert one_shot.phase(ROUTE, datetime(2026, 1, 22, 18, 5)) is not None
+    assert one_shot.phase(ROUTE, datetime(2026, 1, 23, 18, 5)) is None
+    assert one_shot.upcoming(ROUTE, datetime(2026, 1, 23, 12, 0)) is None
+
+    fridays = _calendar({'at': '18:00', 'weekdays': [4], 'duration': 15, 'interval': 0.5})
+    assert fridays.phase(ROUTE, datetime(2026, 1, 23, 18, 5)) is not None    # Cuma
+    assert fridays.phase(ROUTE, datetime(2026, 1, 22, 18, 5)) is None        # Perşembe
+
+
+def test_date_offset_and_routes_select_trips():
+    calendar = _calendar(dict(DAILY, date_offset=30),
+                         {'at': '12:00', 'duration': 10, 'interval': 0.5,
+                          'routes': [{'from': 'ANKARA GAR', 'to': 'izmir (basmane)'}]})
+    # 2026-01-21 00:00'da açılan satış 30 gün sonrasını (2026-02-20) etkiler
+    assert calendar.phase(ROUTE, datetime(2026, 1, 21, 0, 5)) is not None
+    assert calendar.phase(ROUTE, datetime(2026, 1, 22, 0, 5)) is None
+    assert calendar.phase(ROUTE, datetime(2026, 1, 22, 12, 5)) is not None
+    assert calendar.phase(('Konya', 'Ankara Gar', '2026-02-20'), datetime(2026, 1, 22, 12, 5)) is None
+
+
+def test_interval_shares_budget_and_respects_floor():
+    calendar = _calendar(DAILY, rate_budget=12.0)
+    now = datetime(2026, 1, 22, 0, 5)
+    assert calendar.interval(ROUTE, 10, now, load=1) == 0.25
+    assert calendar.interval(ROUTE, 10, now, load=6) == 0.5           # 6 hat / 12 kontrol/dk
+    assert calendar.interval(ROUTE, 10, now, floor=1.5) == 1.5        # zamanlayıcının aralığı
+    assert calendar.interval(ROUTE, 0.1, now) == 0.1                  # normal aralıktan uzun olmaz
+
+
+def test_wait_wakes_up_for_prewarm_and_window_start():
+    calendar = _calendar(DAILY)
+    assert calendar.wait_seconds(ROUTE, 10, datetime(2026, 1, 21, 23, 50)) == 300    # ön ısıtmaya kadar
+    assert calendar.wait_seconds(ROUTE, 10, datetime(2026, 1, 21, 23, 57)) == 180    # başlangıca kadar
+    assert calendar.wait_seconds(ROUTE, 10, datetime(2026, 1, 22, 0, 5)) == 15
+    assert calendar.wait_seconds(ROUTE, 10, datetime(2026, 1, 22, 12, 0)) == 600
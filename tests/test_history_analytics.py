@@ -0,0 +1,57 @@
+import json
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from history_analytics import MAX_INTERVAL_SCALE, MIN_INTERVAL_SCALE, OpeningWindowModel
+from history_store import HistoryStore
+
+
+def _series(wagon, statuses, hour=9, date='2026-01-20'):
+    return [{'from': 'Ankara Gar', 'to': 'Konya', 'date': date, 'wagon': wagon, 'status': status,
+             'price': None, 'timestamp': f"2026-01-10T{hour:02d}:{minute:02d}:00"}
+            for minute, status in enumerate(statuses)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    # Vagon id'leri 16 biti aşsın diye sözlük önceden doldurulur
+    with open(tmp_path / 'dictionary.json', 'w', encoding='utf-8') as f:
+        json.dump({'strings': [f"s{i}" for i in range(70000)]}, f)
+    store = HistoryStore(str(tmp_path))
+    store.append_many(_series('Yataklı', ['DOLU', 'MUSAIT'] * 4, hour=9))
+    store.append_many(_series('Ekonomi', ['DOLU'] * 8, hour=9))
+    store.append_many(_series('Yataklı', ['DOLU'] * 8, hour=15, date='2026-01-21'))
+    return store
+
+
+def test_fit_groups_by_route_and_wagon(store):
+    model = OpeningWindowModel.fit(store)
+    assert sorted(model.groups) == [('Ankara Gar', 'Konya', 'Ekonomi'), ('Ankara Gar', 'Konya', 'Yataklı')]
+
+    yatakli = model._group('Ankara Gar', 'Konya', 'Yataklı')
+    assert model.trials[yatakli, 10, 9] == 4
+    assert model.flips[yatakli, 10, 9] == 4
+    assert model.trials[yatakli, 11, 15] == 7
+    assert model.flips[model._group('Ankara Gar', 'Konya', 'Ekonomi')].sum() == 0
+    assert model.probability('Ankara Gar', 'Konya', 'Yataklı', 10, 9) > model.base_rate
+
+
+def test_interval_scale(store):
+    model = OpeningWindowModel.fit(store)
+    hot = datetime(2026, 1, 10, 9, 30)
+    cold = datetime(2026, 1, 10, 15, 30)
+    assert model.interval_scale('Ankara Gar', 'Konya', '2026-01-20', ['Yataklı'], hot) < 1.0
+    assert model.interval_scale('Ankara Gar', 'Konya', '2026-01-20', ['ALL'], hot) < 1.0
+    assert model.interval_scale('Ankara Gar', 'Konya', '2026-01-21', ['Yataklı'], cold) == MAX_INTERVAL_SCALE
+    scale = model.interval_scale('Ankara Gar', 'Konya', '2026-01-20', ['Yataklı'], hot)
+    assert MIN_INTERVAL_SCALE <= scale <= MAX_INTERVAL_SCALE
+    assert model.interval_scale('Çiğli', 'Konya', '2026-01-20', None, hot) == 1.0
+
+
+def test_fit_without_history(tmp_path):
+    model = OpeningWindowModel.fit(HistoryStore(str(tmp_path)))
+    assert model.groups == []
+    assert model.interval_scale('Ankara Gar', 'Konya', '2026-01-20') == 1.0
@@ -0,0 +1,53 @@
+import json
+
+from history_store import NO_PRICE, HistoryStore, parse_price_kurus
+
+
+def _obs(minute, status, wagon='Ekonomi', price=None, date='2026-01-20'):
+    return {
+        'from': 'Ankara Gar', 'to': 'Konya', 'date': date, 'wagon': wagon,
+        'status': status, 'price': price, 'timestamp': f"2026-01-10T08:{minute:02d}:00"
+    }
+
+
+def test_parse_price_kurus():
+    assert parse_price_kurus("850,00 TL") == 85000
+    assert parse_price_kurus("₺1.234,50") == 123450
+    assert parse_price_kurus("1.234 TL") == 123400
+    assert parse_price_kurus("99,5") == 9950
+    assert parse_price_kurus("DOLU") is None
+    assert parse_price_kurus(None) is None
+
+
+def test_append_compact_and_merge(tmp_path):
+    store = HistoryStore(str(tmp_path), segment_rows=4)
+    store.append_many([_obs(i, 'DOLU') for i in range(3)])
+    assert not store._segment_paths()
+
+    # Dördüncü kayıt aktif logu segmente çevirir
+    store.append_many([_obs(3, 'MUSAIT', price="850,00 TL")])
+    assert len(store._segment_paths()) == 1
+    store.append_many([_obs(i, 'DOLU') for i in range(4, 8)])
+    assert len(store._segment_paths()) == 1   # küçük segmentler birleştirildi
+
+    store.append_many([_obs(8, 'MUSAIT')])
+    columns = store.scan('Ankara Gar', 'Konya')
+    assert len(columns['ts']) == 9
+    assert list(columns['ts']) == sorted(columns['ts'])
+    assert columns['price'][3] == 85000
+    assert columns['price'][0] == NO_PRICE
+    assert [e['timestamp'][-5:] for e in store.opening_events('Ankara Gar', 'Konya')] == ['03:00', '08:00']
+    assert len(store.scan('Ankara Gar', 'Eskişehir')['ts']) == 0
+
+
+def test_wagon_ids_beyond_16_bits(tmp_path):
+    with open(tmp_path / 'dictionary.json', 'w', encoding='utf-8') as f:
+        json.dump({'strings': [f"s{i}" for i in range(70000)]}, f)
+    store = HistoryStore(str(tmp_path), segment_rows=2)
+    store.append_many([_obs(0, 'DOLU', wagon='Yataklı'), _obs(1, 'MUSAIT', wagon='Yataklı')])
+
+    columns = store.scan(wagon='Yataklı')
+    assert len(columns['ts']) == 2
+    assert store.decode(columns['wagon'][0]) == 'Yataklı'
+    assert store.opening_events('Ankara Gar', 'Konya', 'Yataklı')[0]['wagon'] == 'Yataklı'
+
@@ -0,0 +1,45 @@
+from notification_digest import NotificationDigest
+from tcdd_watcher import TicketStatus
+
+
+def _status(price, date='2026-01-20', to='Konya'):
+    return TicketStatus('Ankara Gar', to, date, 'MUSAIT', price, '2026-01-10T09:00:00')
+
+
+def test_openings_are_merged_per_user_and_route():
+    digest = NotificationDigest(window=3, max_latency=15)
+    digest.add(_status('850,00 TL'), 'YATAKLI', 1, now=0)
+    digest.add(_status('600,00 TL'), 'BUSINESS', 1, now=1)
+    digest.add(_status('900,00 TL'), 'YATAKLI', 1, now=2)        # aynı vagon: fiyat güncellenir
+    digest.add(_status('850,00 TL'), 'YATAKLI', 2, now=2)
+    digest.add(_status('850,00 TL', to='Eskişehir'), 'YATAKLI', 1, now=2)
+    assert len(digest) == 3
+
+    digests = {(d.user_id, d.to_station): d for d in digest.pop_all()}
+    merged = digests[(1, 'Konya')]
+    assert merged.offers == [('YATAKLI', '900,00 TL'), ('BUSINESS', '600,00 TL')]
+    assert merged.summary() == "YATAKLI 900,00 TL, BUSINESS 600,00 TL"
+    assert len(digest) == 0
+
+
+def test_digest_is_due_after_quiet_window():
+    digest = NotificationDigest(window=3, max_latency=15)
+    digest.add(_status('850,00 TL'), 'YATAKLI', 1, now=0)
+    digest.add(_status('600,00 TL'), 'BUSINESS', 1, now=2)
+    assert digest.pop_due(now=4) == []                        # son geçişten bu yana 2 sn
+    due = digest.pop_due(now=5)
+    assert [len(d.offers) for d in due] == [2]
+
+
+def test_digest_is_due_at_max_latency_even_if_openings_continue():
+    digest = NotificationDigest(window=3, max_latency=10)
+    for second in range(0, 12, 2):
+        digest.add(_status('850,00 TL'), f"V{second}", 1, now=second)
+        if second < 10:
+            assert digest.pop_due(now=second) == []
+    due = digest.pop_due(now=10)
+    assert len(due) == 1 and len(due[0].offers) == 6
+
+
+def test_max_latency_is_never_below_window():
+    assert NotificationDigest(window=5, max_latency=1).max_latency == 5
@@ -0,0 +1,66 @@
+from scheduler import CapacityModel, FairScheduler, parse_weights
+
+
+def _scheduler(workers=1, latency=30.0, max_jobs=2, max_queue=2, weights=None):
+    capacity = CapacityModel(workers=workers, utilization=1.0)
+    capacity.record_check(latency)
+    return FairScheduler(capacity, max_jobs=max_jobs, max_queue=max_queue, weights=weights or {}, max_interval=10)
+
+
+def test_admit_queue_and_reject():
+    scheduler = _scheduler(workers=4)          # 8 kontrol/dk: iki iş rahat sığar
+    assert scheduler.admit('a', 1.5).outcome == 'admitted'
+    assert scheduler.admit('b', 1.5).outcome == 'admitted'
+
+    queued = scheduler.admit('c', 1.5)
+    assert (queued.outcome, queued.position) == ('queued', 1)
+    assert scheduler.admit('d', 1.5).position == 2
+    rejected = scheduler.admit('e', 1.5)
+    assert rejected.outcome == 'rejected'
+    assert rejected.estimated_wait > queued.estimated_wait
+
+    # Biten iş kuyruğun başındakini başlatır
+    assert [(user, interval) for user, interval, _ in scheduler.release('a')] == [('c', 1.5)]
+    assert scheduler.position('d') == 1
+    assert scheduler.status()['queue_depth'] == 1
+
+
+def test_over_share_request_is_degraded():
+    scheduler = _scheduler(workers=1, latency=30.0)     # 2 kontrol/dk, iki yuva → kişi başı ~1 kontrol/dk
+    decision = scheduler.admit('a', 0.5)
+    assert decision.outcome == 'admitted'
+    assert decision.degraded
+    assert decision.interval >= 1.0
+
+
+def test_request_beyond_max_interval_is_queued():
+    scheduler = _scheduler(workers=1, latency=600.0)    # 0.1 kontrol/dk: 10 dk'dan kısa aralık verilemez
+    assert scheduler.admit('a', 1.5).outcome == 'queued'
+
+
+def test_weighted_fair_queue_order():
+    scheduler = _scheduler(workers=4, max_jobs=1, max_queue=10, weights={'vip': 4.0})
+    scheduler.admit('busy', 1.5)
+    scheduler.admit('a', 1.5)
+    scheduler.admit('b', 1.5)
+    scheduler.admit('vip', 1.5)
+    # Ağırlığı 4 olan kullanıcının sanal bitiş zamanı daha erken
+    assert scheduler.position('vip') == 1
+    assert [user for user, _, _ in scheduler.release('busy')] == ['vip']
+
+
+def test_readmit_replaces_previous_request_and_release_matches_payload():
+    scheduler = _scheduler(workers=4, max_jobs=1)
+    first, second = object(), object()
+    scheduler.admit('a', 1.5, first)
+    scheduler.admit('a', 2.0, second)
+    assert scheduler.active['a'].payload is second
+    # Eski işin bitişi yeni izlemeyi serbest bırakmaz
+    scheduler.release('a', first)
+    assert 'a' in scheduler.active
+    scheduler.release('a', second)
+    assert scheduler.active == {}
+
+
+def test_parse_weights():
+    assert parse_weights("7:2, 12:0.5,bad:x,") == {'7': 2.0, '12': 0.5}
@@ -0,0 +1,118 @@
+import asyncio
+import gc
+import time
+import weakref
+
+import session_pool
+from session_pool import SessionJar, SessionPool, open_page
+
+BASE_URL = 'https://ebilet.example'
+
+
+class _Page:
+    async def close(self):
+        pass
+
+
+class _Context:
+    def __init__(self, cookies):
+        self.seeded = None
+        self.closed = False
+        self._cookies = cookies
+
+    async def add_cookies(self, cookies):
+        self.seeded = list(cookies)
+
+    async def new_page(self):
+        return _Page()
+
+    async def cookies(self, urls):
+        return self._cookies
+
+    async def close(self):
+        self.closed = True
+
+
+class _Browser:
+    def __init__(self):
+        self.contexts = []
+
+    async def new_context(self):
+        context = _Context([{'name': 'sid', 'value': str(len(self.contexts)), 'expires': time.time() + 3600}])
+        self.contexts.append(context)
+        return context
+
+
+def test_pool_reuses_context_and_seeds_session():
+    browser = _Browser()
+    pool = SessionPool(browser.new_context, BASE_URL, SessionJar(), size=1)
+
+    async def run():
+        first = await pool.acquire()           # oturumu yenileyen ilk kontrol: tohumsuz
+        await first.close()
+        second = await pool.acquire()
+        await second.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(browser.contexts) == 1
+    assert first._slot is second._slot
+    assert pool.jar.cookies[0]['value'] == '0'
+    assert not browser.contexts[0].closed
+
+
+def test_failed_check_discards_context():
+    browser = _Browser()
+    pool = SessionPool(browser.new_context, BASE_URL, SessionJar(), size=1)
+
+    async def run():
+        lease = await pool.acquire()
+        await lease.close(ok=False)
+        lease = await pool.acquire()
+        await lease.close()
+
+    asyncio.run(run())
+    assert len(browser.contexts) == 2
+    assert browser.contexts[0].closed
+    # İkinci context ilk kontrolün yenilediği oturumla değil, başarısız olduğu için yeniden yenilenir
+    assert browser.contexts[1].seeded is None
+
+
+def test_pool_waits_for_free_context():
+    browser = _Browser()
+    pool = SessionPool(browser.new_context, BASE_URL, SessionJar(), size=1)
+    order = []
+
+    async def check(name, hold):
+        lease = await pool.acquire()
+        order.append(name)
+        await asyncio.sleep(hold)
+        await lease.close()
+
+    async def run():
+        await asyncio.gather(check('a', 0.05), check('b', 0))
+
+    asyncio.run(run())
+    assert order == ['a', 'b']
+    assert len(browser.contexts) == 1
+
+
+def test_pool_does_not_keep_browser_alive(monkeypatch):
+    monkeypatch.setattr(session_pool, 'SITE_SESSION', SessionJar())
+    browser = _Browser()
+
+    async def run():
+        pools = []
+        for _ in range(2):
+            lease = await open_page(browser, browser.new_context, BASE_URL)
+            pools.append(lease._pool)
+            await lease.close()
+        return pools
+
+    first, second = asyncio.run(run())
+    # Aynı browser aynı havuzu kullanır
+    assert first is second
+    alive = weakref.ref(browser)
+    del browser, first, second
+    gc.collect()
+    assert alive() is None
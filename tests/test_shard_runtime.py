@@ -0,0 +1,58 @@
+import json
+import multiprocessing as mp
+from collections import Counter
+
+import tcdd_watcher
+from shard_runtime import HashRing, job_id_for, route_key
+
+
+def _keys(count):
+    return [route_key(f"İstasyon {i}", f"Durak {i * 7}", f"2026-01-{i % 28 + 1:02d}") for i in range(count)]
+
+
+def test_ring_distributes_routes_evenly():
+    ring = HashRing(range(8))
+    owners = Counter(ring.get(key) for key in _keys(8000))
+    assert set(owners) == set(range(8))
+    # Sanal düğümlerle her shard ortalamanın yarısı ile iki katı arasında kalır
+    assert min(owners.values()) > 500
+    assert max(owners.values()) < 2000
+
+
+def test_removing_a_shard_only_moves_its_routes():
+    keys = _keys(2000)
+    ring = HashRing(range(4))
+    before = {key: ring.get(key) for key in keys}
+    ring.remove(2)
+    after = {key: ring.get(key) for key in keys}
+    assert ring.nodes() == [0, 1, 3]
+    for key in keys:
+        if before[key] != 2:
+            assert after[key] == before[key]
+        else:
+            assert after[key] != 2
+
+
+def test_empty_ring_and_job_ids():
+    assert HashRing().get('a|b|2026-01-01') is None
+    watch = {'from': 'Çiğli', 'to': 'Konya', 'date': '2026-01-20'}
+    assert job_id_for(watch) == 'Çiğli_Konya_2026-01-20_ALL_1p'
+
+
+def _write_keys(shard, count):
+    for i in range(count):
+        tcdd_watcher.save_state_file({f"shard{shard}_{i}": {'status': 'DOLU'}})
+
+
+def test_concurrent_state_writes_keep_every_shard_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(tcdd_watcher, 'STATE_FILE', str(tmp_path / 'state.json'))
+    ctx = mp.get_context('fork')
+    workers = [ctx.Process(target=_write_keys, args=(shard, 25)) for shard in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    with open(tmp_path / 'state.json', encoding='utf-8') as f:
+        state = json.load(f)
+    assert len(state) == 100
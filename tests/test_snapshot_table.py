@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+import snapshot_table
+from snapshot_table import HEADER, HEADER_SIZE, MAGIC, PROBE_LIMIT, RECORD_SIZE, SnapshotTable
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'snapshots.bin')
+
+
+def test_publish_and_get(path):
+    table = SnapshotTable(path, slots=64)
+    table.publish('Ankara Gar', 'Konya', '2026-01-20', {'YATAKLI': ('MUSAIT', '850,00 TL')}, observed_at=100.0)
+    table.publish('ankara gar', 'KONYA', '2026-01-20', {'BUSINESS': ('DOLU', None)}, observed_at=101.0)
+
+    snapshot = table.get('ANKARA GAR', 'konya', '2026-01-20')
+    assert snapshot.wagons == {
+        'YATAKLI': {'status': 'MUSAIT', 'price_kurus': 85000, 'observed_at': 100.0},
+        'BUSINESS': {'status': 'DOLU', 'price_kurus': None, 'observed_at': 101.0},
+    }
+    assert table.get('Ankara Gar', 'Konya', '2026-01-21') is None
+    assert len(table.snapshots()) == 1
+    table.close()
+
+
+def test_existing_layout_wins_and_file_never_shrinks(path):
+    first = SnapshotTable(path, slots=64)
+    first.publish('Ankara Gar', 'Konya', '2026-01-20', {'YATAKLI': ('MUSAIT', '850,00 TL')})
+    size = os.path.getsize(path)
+
+    # Farklı yuva sayısıyla açan süreç mevcut düzeni kullanır; dosya yeniden yazılmaz
+    second = SnapshotTable(path, slots=PROBE_LIMIT)
+    assert second.slots == 64
+    assert os.path.getsize(path) == size
+    assert second.get('Ankara Gar', 'Konya', '2026-01-20') is not None
+    assert first.get('Ankara Gar', 'Konya', '2026-01-20') is not None
+    first.close()
+    second.close()
+
+
+def test_short_file_is_extended(path):
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, snapshot_table.VERSION, 0, 64, RECORD_SIZE))
+    table = SnapshotTable(path, slots=PROBE_LIMIT)
+    assert table.slots == 64
+    assert os.path.getsize(path) == HEADER_SIZE + 64 * RECORD_SIZE
+    table.close()
+
+
+def test_mismatched_header_is_rejected_without_touching_file(path):
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, snapshot_table.VERSION, 0, 64, RECORD_SIZE * 2).ljust(4096, b'x'))
+    with pytest.raises(ValueError):
+        SnapshotTable(path)
+    with open(path, 'rb') as f:
+        assert len(f.read()) == 4096
+
+
+class _ScriptedSeq:
+    """SEQ.unpack_from yerine: verilen seq değerlerini sırayla döndürür"""
+
+    def __init__(self, values):
+        self.values = list(values)
+        self.calls = 0
+
+    def unpack_from(self, buffer, offset=0):
+        self.calls += 1
+        return (self.values.pop(0) if self.values else 4,)
+
+
+def test_seqlock_read_retries_torn_record(path, monkeypatch):
+    table = SnapshotTable(path, slots=64)
+    table.publish('Ankara Gar', 'Konya', '2026-01-20', {'YATAKLI': ('MUSAIT', '850,00 TL')})
+    key = snapshot_table.snapshot_key('Ankara Gar', 'Konya', '2026-01-20')
+    offset, _ = table._find(key, snapshot_table._key_hash(key))
+
+    # Okuma sırasında seq değişti (2 → 4), ardından yazım sürüyor (5), sonra kararlı (6)
+    seq = _ScriptedSeq([2, 4, 5, 6, 6])
+    monkeypatch.setattr(snapshot_table, 'SEQ', seq)
+    fields = table._read(offset)
+    assert fields is not None
+    assert seq.calls == 5
+    table.close()
+
+
+def test_seqlock_read_gives_up_on_stuck_writer(path, monkeypatch):
+    table = SnapshotTable(path, slots=64)
+    table.publish('Ankara Gar', 'Konya', '2026-01-20', {'YATAKLI': ('MUSAIT', '850,00 TL')})
+    key = snapshot_table.snapshot_key('Ankara Gar', 'Konya', '2026-01-20')
+    offset, _ = table._find(key, snapshot_table._key_hash(key))
+
+    # Yazarken çöken süreç seq'i tek bırakır: okuyucu sonsuza dek beklemez
+    (seq,) = snapshot_table.SEQ.unpack_from(table._map, offset)
+    snapshot_table.SEQ.pack_into(table._map, offset, seq | 1)
+    monkeypatch.setattr(snapshot_table, 'SEQLOCK_RETRIES', 20)
+    assert table._read(offset) is None
+    assert table.get('Ankara Gar', 'Konya', '2026-01-20') is None
+
+    # Sonraki yazım aynı yuvayı düzeltir
+    monkeypatch.undo()
+    table.publish('Ankara Gar', 'Konya', '2026-01-20', {'YATAKLI': ('DOLU', None)})
+    assert table._find(key, snapshot_table._key_hash(key))[0] == offset
+    assert table.get('Ankara Gar', 'Konya', '2026-01-20').wagons['YATAKLI']['status'] == 'DOLU'
+    table.close()
+
+
+def test_table_is_disabled_without_a_file_lock(path, monkeypatch):
+    monkeypatch.setattr(snapshot_table, 'SNAPSHOT_FILE', path)
+    monkeypatch.setattr(snapshot_table, 'fcntl', None)
+    monkeypatch.setattr(snapshot_table, 'msvcrt', None)
+    monkeypatch.setattr(snapshot_table, '_table', None)
+    monkeypatch.setattr(snapshot_table, '_table_failed', False)
+    assert snapshot_table.snapshot_table() is None
+    assert not os.path.exists(path)
@@ -0,0 +1,8 @@
+import os
+
+from bench_startup import eager_modules
+
+
+def test_import_does_not_load_heavy_modules():
+    env = dict(os.environ, HISTORY_ENABLED='0')
+    assert eager_modules(env) == []
@@ -0,0 +1,69 @@
+from notification_digest import NotificationDigest
+from subscriptions import Subscription, SubscriptionIndex, crossed_ceiling, price_ceiling_kurus
+
+
+def _index(*ceilings):
+    index = SubscriptionIndex()
+    subscriptions = [Subscription.create('Ankara Gar', 'Konya', '2026-01-20', 'YATAKLI', 1, user_id,
+                                         price_ceiling_kurus(ceiling))
+                     for user_id, ceiling in enumerate(ceilings, 1)]
+    for subscription in subscriptions:
+        index.add(subscription)
+    return index, subscriptions[0].route
+
+
+def _snapshot(price):
+    return {'YATAKLI': {'status': 'MUSAIT', 'price': f"{price},00 TL", 'price_kurus': price * 100}}
+
+
+def test_crossed_ceiling():
+    assert crossed_ceiling(95000, 85000, 90000)
+    assert crossed_ceiling(95000, 90000, 90000)
+    assert not crossed_ceiling(95000, 92000, 90000)     # hâlâ tavanın üstünde
+    assert not crossed_ceiling(88000, 80000, 90000)     # zaten tavanın altındaydı
+    assert not crossed_ceiling(95000, 85000, None)
+    assert not crossed_ceiling(None, 85000, 90000)
+
+
+def test_price_drop_without_ceiling_does_not_match():
+    index, route = _index(None)
+    assert index.match(route, _snapshot(800), {'YATAKLI': 'MUSAIT'}, {'YATAKLI': 95000}) == []
+
+
+def test_price_drop_still_above_ceiling_does_not_match():
+    index, route = _index(900)
+    assert index.match(route, _snapshot(920), {'YATAKLI': 'MUSAIT'}, {'YATAKLI': 95000}) == []
+
+
+def test_price_drop_below_ceiling_that_was_already_met_does_not_match():
+    index, route = _index(900)
+    assert index.match(route, _snapshot(800), {'YATAKLI': 'MUSAIT'}, {'YATAKLI': 85000}) == []
+
+
+def test_price_drop_crossing_ceiling_matches_only_crossed_subscriptions():
+    index, route = _index(900, 850, 700, None)
+    matches = index.match(route, _snapshot(800), {'YATAKLI': 'MUSAIT'}, {'YATAKLI': 95000})
+    # 900 ve 850 tavanları geçildi; 700 hâlâ aşılıyor, tavansız abonelik fiyat değişimiyle tetiklenmez
+    assert sorted(m.subscription.user_id for m in matches) == [1, 2]
+    assert {m.reason for m in matches} == {'price_drop'}
+
+
+def test_opening_respects_ceiling():
+    index, route = _index(900, 700, None)
+    matches = index.match(route, _snapshot(800), {'YATAKLI': 'DOLU'})
+    assert sorted(m.subscription.user_id for m in matches) == [1, 3]
+    assert {m.reason for m in matches} == {'opened'}
+
+
+def test_price_drops_get_their_own_digest():
+    from tcdd_watcher import TicketStatus
+
+    digest = NotificationDigest(window=3, max_latency=15)
+    status = TicketStatus('Ankara Gar', 'Konya', '2026-01-20', 'MUSAIT', '800,00 TL', '2026-01-10T09:00:00')
+    digest.add(status, 'YATAKLI', 1, now=0)
+    digest.add(status, 'BUSINESS', 1, now=1, reason='price_drop')
+    digests = sorted(digest.pop_all(), key=lambda d: d.reason)
+    assert [(d.reason, d.offers) for d in digests] == [
+        ('opened', [('YATAKLI', '800,00 TL')]),
+        ('price_drop', [('BUSINESS', '800,00 TL')]),
+    ]
@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+
+import tcdd_watcher
+from notification_digest import NotificationDigest
+from tcdd_watcher import (CheckDeadline, CheckTimeout, TCDDWatcher, WagonType, classify_error,
+                          retry_delay)
+
+
+class _Page:
+    def set_default_timeout(self, timeout):
+        pass
+
+
+@pytest.fixture
+def make_watcher(monkeypatch):
+    monkeypatch.setattr(tcdd_watcher, 'HISTORY_ENABLED', False)
+    monkeypatch.setattr(tcdd_watcher, 'snapshot_table', lambda: None)
+
+    def make(max_price=None):
+        watcher = TCDDWatcher('Ankara Gar', 'Konya', '2026-01-20', WagonType.YATAKLI, exit_on_found=False,
+                              state={}, max_price=max_price)
+        watcher.deferred_state = {}
+        watcher.digest = NotificationDigest()
+        return watcher
+    return make
+
+
+def _observe(watcher, status, price_tl, within_ceiling=True, fingerprint='fp'):
+    wagons = {WagonType.YATAKLI: {
+        'status': status,
+        'price': f"{price_tl},00 TL" if status == 'MUSAIT' else None,
+        'price_kurus': price_tl * 100 if status == 'MUSAIT' else None,
+        'within_ceiling': within_ceiling,
+        'passengers': 1,
+    }}
+
+    async def check(page, previous_fingerprint):
+        return {'wagons': wagons, 'fingerprint': f"{fingerprint}-{status}-{price_tl}",
+                'unchanged': False, 'timestamp': '2026-01-10T09:00:00'}
+
+    watcher._check_all_wagon_availability = check
+    result = asyncio.run(watcher._process_results(_Page()))
+    return result, watcher.digest.pop_all()
+
+
+def test_price_change_without_ceiling_is_silent(make_watcher):
+    watcher = make_watcher()
+    _observe(watcher, 'MUSAIT', 950)
+    result, digests = _observe(watcher, 'MUSAIT', 800)
+    assert not result['notification_sent']
+    assert digests == []
+
+
+def test_price_drop_above_ceiling_is_silent(make_watcher):
+    watcher = make_watcher(max_price=90000)
+    _observe(watcher, 'MUSAIT', 990, within_ceiling=False)
+    result, digests = _observe(watcher, 'MUSAIT', 950, within_ceiling=False)
+    assert not result['notification_sent']
+    assert digests == []
+
+
+def test_price_crossing_ceiling_sends_price_drop(make_watcher):
+    watcher = make_watcher(max_price=90000)
+    _observe(watcher, 'MUSAIT', 950, within_ceiling=False)
+    result, digests = _observe(watcher, 'MUSAIT', 850)
+    assert result['notification_sent']
+    assert [(d.reason, d.offers) for d in digests] == [('price_drop', [('YATAKLI', '850,00 TL')])]
+
+    # Tavanın altında kalan sonraki düşüşler yeniden bildirilmez
+    result, digests = _observe(watcher, 'MUSAIT', 800)
+    assert not result['notification_sent']
+
+
+def test_opening_within_ceiling_sends_opened(make_watcher):
+    watcher = make_watcher(max_price=90000)
+    _observe(watcher, 'DOLU', 0)
+    result, digests = _observe(watcher, 'MUSAIT', 850)
+    assert result['notification_sent']
+    assert [d.reason for d in digests] == ['opened']
+
+
+def test_deferred_state_collects_only_changed_keys(make_watcher):
+    watcher = make_watcher()
+    watcher.state['başka-süreç'] = {'status': 'MUSAIT'}
+    _observe(watcher, 'DOLU', 0)
+    assert watcher.deferred_state
+    assert 'başka-süreç' not in watcher.deferred_state
+    assert all(watcher.deferred_state[key] is watcher.state[key] for key in watcher.deferred_state)
+
+
+def test_deadline_budget_is_share_capped_by_remaining(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(tcdd_watcher.time, 'monotonic', lambda: clock[0])
+    deadline = CheckDeadline(60)
+    assert deadline.budget('ana sayfa') == pytest.approx(21.0)      # %35 pay
+    assert deadline.budget('bilinmeyen adım') == pytest.approx(60.0)
+    clock[0] += 50
+    assert deadline.budget('ana sayfa') == pytest.approx(10.0)      # kalan süre
+    clock[0] += 20
+    assert deadline.remaining() == 0.0
+
+
+class PlaywrightTimeoutError(Exception):
+    pass
+
+
+@pytest.mark.parametrize('error, kind', [
+    (CheckTimeout('ana sayfa', 5.0), 'timeout'),
+    (asyncio.TimeoutError(), 'timeout'),
+    (PlaywrightTimeoutError('waiting for selector'), 'timeout'),
+    (Exception('page.goto: net::ERR_CONNECTION_RESET'), 'network'),
+    (Exception('Target closed'), 'browser'),
+    (Exception('Browser has been closed'), 'browser'),
+    (ValueError('beklenmedik'), 'unexpected'),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+def test_retry_delay_backs_off_per_kind():
+    assert retry_delay('browser', 1) == 5
+    assert retry_delay('timeout', 1) == 30
+    assert retry_delay('timeout', 3) == 120
+    assert retry_delay(None, 1) == retry_delay('unexpected', 1) == 60
+    assert retry_delay('network', 20) == tcdd_watcher.RETRY_MAX_DELAY
+
+
+class _Lease:
+    def __init__(self, name, leases):
+        self.name = name
+        self.page = name
+        self.closed = None
+        leases.append(self)
+
+    async def close(self, ok=True):
+        self.closed = ok
+
+
+def test_hedge_closes_the_losing_lease_even_if_it_finished(make_watcher, monkeypatch):
+    monkeypatch.setattr(tcdd_watcher, 'HEDGE_AFTER', 0.01)
+    watcher = make_watcher()
+    leases = []
+
+    async def open_page(browser):
+        return _Lease('birincil' if not leases else 'yedek', leases)
+
+    async def open_results(page, deadline):
+        if page == 'birincil':
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                return    # iptalden hemen önce bitmiş gibi sayfayı döndürür
+        else:
+            await asyncio.sleep(0.01)
+
+    watcher._open_page = open_page
+    watcher._open_results = open_results
+    winner = asyncio.run(watcher._fetch_results(None, CheckDeadline()))
+    assert winner.name == 'yedek' and winner.closed is None
+    assert leases[0].closed is True
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+
+import watch_jobs
+from watch_jobs import WatchJob
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(watch_jobs.IS_WINDOWS, reason='POSIX sinyalleri')
+
+# Gerçek izleyicinin iptal yolu: seviyeli stdout ve işbirlikçi iptal işleyicisi
+COOPERATIVE = """
+import sys
+from tcdd_watcher import CANCEL_EVENT, install_cancel_handlers
+from watch_log import install_log_filter
+install_log_filter('INFO', 0)
+install_cancel_handlers()
+print('[INFO] hazır')
+sys.stdout.flush()
+while not CANCEL_EVENT.wait(0.001):
+    print('[INFO] kontrol sürüyor')
+print('[INFO] İzleme iptal edildi.')
+"""
+
+STUBBORN = """
+import signal, time
+signal.signal(signal.SIGTERM, signal.SIG_IGN)
+print('hazır', flush=True)
+time.sleep(60)
+"""
+
+
+def _job(script):
+    job = WatchJob([sys.executable, '-u', '-c', script], cwd=REPO_ROOT, env=dict(os.environ))
+    # İçe aktarma uyarıları (ör. eksik isteğe bağlı paketler) atlanır
+    for line in job.process.stdout:
+        if line.strip().endswith('hazır'):
+            return job
+    raise AssertionError('süreç hazır olmadan çıktı')
+
+
+def test_stop_after_exit():
+    job = WatchJob([sys.executable, '-c', 'pass'])
+    job.process.wait(timeout=10)
+    assert job.stop() == 'exited'
+    assert job.usage()['running'] is False
+    assert job.ended_at is not None
+
+
+def test_stop_is_graceful_when_watcher_honours_cancel():
+    job = _job(COOPERATIVE)
+    assert job.stop(timeout=10) == 'graceful'
+    assert job.process.returncode == 0
+    assert 'İzleme iptal edildi' in job.process.stdout.read()
+    # Tekrar durdurmak sonucu değiştirmez
+    assert job.stop() == 'graceful'
+
+
+def test_stop_kills_tree_after_timeout():
+    job = _job(STUBBORN)
+    assert job.stop(timeout=0.5) == 'killed'
+    assert not job.running
+    assert job.usage()['stop_outcome'] == 'killed'
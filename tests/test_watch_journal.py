@@ -0,0 +1,68 @@
+import json
+
+from watch_journal import WatchJournal
+
+
+def _lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_replay_restores_live_watches_in_start_order(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = WatchJournal(path)
+    journal.start('7', {'from': 'Ankara Gar', 'to': 'Konya'}, 1.5)
+    journal.start('8', {'from': 'Çiğli', 'to': 'Konya'}, 2.0)
+    journal.state('7', {'check_count': 12, 'ticket_found': False, 'logs': ['atlanır']})
+    journal.start('9', {'from': 'Eskişehir', 'to': 'Konya'}, 1.5)
+    journal.stop('8')
+    journal.close()
+
+    entries = WatchJournal(path).replay()
+    assert [e['user'] for e in entries] == ['7', '9']
+    assert entries[0]['status'] == {'check_count': 12, 'ticket_found': False}
+    assert entries[0]['interval'] == 1.5
+
+
+def test_replay_skips_torn_last_line_and_compacts(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = WatchJournal(path)
+    journal.start('7', {'from': 'Ankara Gar', 'to': 'Konya'}, 1.5)
+    for count in range(1, 6):
+        journal.state('7', {'check_count': count})
+    journal.start('8', {'from': 'Çiğli', 'to': 'Konya'}, 1.5)
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "stop", "us')    # çökme sırasında yarım kalmış satır
+
+    entries = WatchJournal(path).replay()
+    assert [e['user'] for e in entries] == ['7', '8']
+    assert entries[0]['status'] == {'check_count': 5}
+
+    # Sıkıştırılmış dosyada kullanıcı başına tek start kaydı kalır
+    records = _lines(path)
+    assert [(r['op'], r['user']) for r in records] == [('start', '7'), ('start', '8')]
+    assert records[0]['status'] == {'check_count': 5}
+    assert WatchJournal(path).replay() == entries
+
+
+def test_unchanged_state_is_not_appended_and_size_triggers_compaction(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = WatchJournal(path, compact_bytes=2048)
+    journal.replay()
+    journal.start('7', {'from': 'Ankara Gar', 'to': 'Konya'}, 1.5)
+    journal.state('7', {'check_count': 1})
+    journal.state('7', {'check_count': 1})
+    assert len(_lines(path)) == 2
+
+    for count in range(2, 60):
+        journal.state('7', {'check_count': count, 'message': 'x' * 40})
+    journal.close()
+    assert len(_lines(path)) < 30
+    assert WatchJournal(path).replay()[0]['status']['check_count'] == 59
+
+
+def test_disabled_journal(tmp_path):
+    journal = WatchJournal('')
+    journal.start('7', {}, 1.5)
+    assert journal.replay() == []
@@ -0,0 +1,69 @@
+import io
+
+from watch_log import JobLog, LeveledStream, LineSampler, parse_level
+
+
+def test_parse_level():
+    assert parse_level('[WARNING] yavaş') == 'WARNING'
+    assert parse_level('⚠️  [WARNING] vagon yok') == 'WARNING'
+    assert parse_level('[SUCCESS] BİLET BULUNDU!') == 'SUCCESS'
+    assert parse_level('Hat: Ankara Gar → Konya') == 'INFO'
+    assert parse_level('[BİLİNMEYEN] x') == 'INFO'
+
+
+def test_sampler_passes_first_and_every_nth_repeat():
+    sample = LineSampler(every=3)
+    assert [sample('[INFO] DOLU') for _ in range(7)] == [1, None, 3, None, None, 6, None]
+    assert sample('[INFO] başka') == 1
+    assert [LineSampler(every=1)('x') for _ in range(2)] == [1, 1]
+
+
+def test_stream_filters_levels_and_samples_repeats():
+    out = io.StringIO()
+    stream = LeveledStream(out, level='INFO', sample_every=2)
+    stream.write('[DEBUG] ayrıntı\n[INFO] DOLU\n')
+    stream.write('[INFO] DOLU\n[INFO] DOLU\n\n')
+    stream.write('[WARNING] yavaş\n[WARNING] yavaş\n')
+    stream.write('=' * 10 + '\n' + '=' * 10 + '\n')
+    assert out.getvalue().splitlines() == [
+        '[INFO] DOLU',
+        '[INFO] DOLU (tekrar: 2)',
+        '[WARNING] yavaş',
+        '[WARNING] yavaş',            # uyarılar örneklenmez
+        '=' * 10,
+        '=' * 10,                     # öneksiz başlık satırları bütün kalır
+    ]
+
+
+def test_stream_joins_partial_writes():
+    out = io.StringIO()
+    stream = LeveledStream(out, level='WARNING', sample_every=0)
+    stream.write('[INFO] gizli\n[ERR')
+    assert out.getvalue() == ''
+    stream.write('OR] hata\n')
+    assert out.getvalue() == '[ERROR] hata\n'
+
+
+def test_page_by_sequence_and_level():
+    log = JobLog(maxlen=5)
+    for i in range(1, 8):
+        log.append(f"[WARNING] uyarı {i}" if i % 3 == 0 else f"[INFO] satır {i}")
+
+    latest = log.page(limit=2)
+    assert [r['seq'] for r in latest['records']] == [6, 7]
+    assert (latest['next_after'], latest['first_seq'], latest['last_seq'], latest['dropped']) == (7, 3, 7, 2)
+
+    page = log.page(after=3, limit=2)
+    assert [r['message'] for r in page['records']] == ['[INFO] satır 4', '[INFO] satır 5']
+    assert page['next_after'] == 5
+    assert log.page(after=page['next_after'])['next_after'] == 7
+    assert log.page(after=7)['records'] == [] and log.page(after=7)['next_after'] == 7
+
+    warnings = log.page(after=0, level='WARNING')
+    assert [(r['seq'], r['level']) for r in warnings['records']] == [(3, 'WARNING'), (6, 'WARNING')]
+    assert log.tail(2) == ['[WARNING] uyarı 6', '[INFO] satır 7']
+
+
+def test_empty_log_page():
+    page = JobLog().page()
+    assert page == {'records': [], 'next_after': 0, 'first_seq': 1, 'last_seq': 0, 'dropped': 0}
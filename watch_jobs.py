@@ -0,0 +1,282 @@
+"""
+TCDD İzleyici - İzleme İşi Yaşam Döngüsü
+
+api_server eskiden izleyici sürecini terminate() ile öldürüp beklemiyordu;
+Chromium ve Playwright'ın Node sürücüsü yetim kalıp günlerce birikiyordu.
+Bu modül:
+
+    - İzleyiciyi kendi süreç grubunda başlatır (WatchJob)
+    - Durdururken önce işbirlikçi iptal sinyali gönderir (POSIX: SIGTERM,
+      Windows: CTRL_BREAK_EVENT); izleyici bir sonraki adım sınırında browser'ı
+      kapatıp çıkar. Süre aşılırsa tüm süreç ağacı öldürülür.
+    - İş başına CPU süresi, RSS (anlık/tepe) ve çalışma süresi tutar
+    - Sahibi ölmüş (yetim) browser süreçlerini periyodik olarak temizler
+      (JobReaper)
+
+Kaynak muhasebesi ve yetim tespiti psutil gerektirir.
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+    print("[WARNING] psutil yüklü değil. İş kaynak muhasebesi ve yetim browser temizliği devre dışı.")
+
+
+# Konfigürasyon
+GRACEFUL_STOP_TIMEOUT = float(os.getenv("GRACEFUL_STOP_TIMEOUT", "15"))  # saniye
+JOB_SAMPLE_INTERVAL = float(os.getenv("JOB_SAMPLE_INTERVAL", "5"))
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", "60"))
+REAPER_GRACE = float(os.getenv("REAPER_GRACE", "120"))  # Bundan genç süreçlere dokunulmaz
+
+# Playwright'ın başlattığı süreçler (Node sürücüsü ve Playwright'ın indirdiği
+# Chromium); kullanıcının kendi tarayıcısı eşleşmesin diye genel adlar kullanılmaz
+BROWSER_PROCESS_MARKERS = tuple(filter(None, (
+    'ms-playwright', 'playwright/driver', 'playwright\\driver', 'chrome-headless-shell',
+    os.getenv("BROWSER_EXECUTABLE")
+)))
+
+IS_WINDOWS = os.name == 'nt'
+
+
+class WatchJob:
+    """Tek bir izleyici süreci ve süreç ağacının kaynak kullanımı"""
+
+    def __init__(self, cmd: List[str], cwd: Optional[str] = None, env: Optional[Dict] = None):
+        self.cmd = cmd
+        self.process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1,  # Line buffered
+            cwd=cwd,
+            env=env,
+            # Kendi süreç grubu: iptal sinyali yalnızca bu işe gider, ağaç birlikte öldürülebilir
+            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if IS_WINDOWS else 0,
+            start_new_session=not IS_WINDOWS
+        )
+        self.pid = self.process.pid
+        self.started_at = time.time()
+        self.ended_at: Optional[float] = None
+        self.stop_outcome: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._handle = psutil.Process(self.pid) if PSUTIL_AVAILABLE else None
+        self._cpu_by_pid: Dict[int, float] = {}   # Ölen alt süreçlerin CPU süresi kaybolmasın
+        self._rss = 0
+        self._peak_rss = 0
+        self._process_count = 0
+
+    @property
+    def running(self) -> bool:
+        return self.process.poll() is None
+
+    def _tree(self) -> list:
+        if self._handle is None:
+            return []
+        try:
+            return [self._handle] + self._handle.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def sample(self):
+        """Süreç ağacının CPU ve bellek kullanımını güncelle"""
+        if self._handle is None or not self.running:
+            return
+        rss = 0
+        processes = self._tree()
+        for proc in processes:
+            try:
+                cpu = proc.cpu_times()
+                memory = proc.memory_info()
+            except psutil.Error:
+                continue
+            self._cpu_by_pid[proc.pid] = cpu.user + cpu.system
+            rss += memory.rss
+        with self._lock:
+            self._rss = rss
+            self._peak_rss = max(self._peak_rss, rss)
+            self._process_count = len(processes)
+
+    def usage(self) -> Dict:
+        """İşin kaynak muhasebesi"""
+        with self._lock:
+            end = self.ended_at or time.time()
+            return {
+                'pid': self.pid,
+                'running': self.running,
+                'exit_code': self.process.returncode,
+                'stop_outcome': self.stop_outcome,
+                'uptime_seconds': round(end - self.started_at, 1),
+                'cpu_seconds': round(sum(self._cpu_by_pid.values()), 2),
+                'rss_mb': round(self._rss / 1048576, 1) if self.running else 0.0,
+                'peak_rss_mb': round(self._peak_rss / 1048576, 1),
+                'processes': self._process_count if self.running else 0
+            }
+
+    def _send_cancel(self):
+        """İzleyiciye işbirlikçi iptal sinyali gönder (yalnızca Python sürecine)"""
+        try:
+            if IS_WINDOWS:
+                self.process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                self.process.send_signal(signal.SIGTERM)
+        except OSError:
+            pass
+
+    def _kill_tree(self, processes: Iterable):
+        """Süreç grubunu ve bilinen tüm alt süreçleri öldür"""
+        if not IS_WINDOWS:
+            try:
+                os.killpg(self.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        for proc in processes:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        if self._handle is None and IS_WINDOWS and self.running:
+            subprocess.run(['taskkill', '/T', '/F', '/PID', str(self.pid)], capture_output=True)
+
+    def stop(self, timeout: float = GRACEFUL_STOP_TIMEOUT) -> str:
+        """
+        İşi durdur ve süreç ağacının tamamen kapandığını garanti et
+
+        Returns:
+            str: 'exited' (zaten bitmişti), 'graceful' (adım sınırında çıktı)
+                 veya 'killed' (süre aşıldı, ağaç öldürüldü)
+        """
+        if not self.running:
+            self.finish()
+            return self.stop_outcome or 'exited'
+
+        self.sample()
+        # Ana süreç ölünce alt süreçler yetim kalır; listeyi önceden al
+        processes = self._tree()[1:]
+
+        self._send_cancel()
+        try:
+            self.process.wait(timeout=timeout)
+            outcome = 'graceful'
+        except subprocess.TimeoutExpired:
+            print(f"[WARNING] İzleyici (pid {self.pid}) {timeout:.0f} sn içinde kapanmadı, süreç ağacı öldürülüyor...")
+            outcome = 'killed'
+
+        # Temiz çıkışta bile geride kalan browser süreçleri temizlenir
+        self._kill_tree(processes)
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+
+        self.stop_outcome = outcome
+        self.finish()
+        print(f"[INFO] İzleyici durduruldu ({outcome}): {self.usage()}")
+        return outcome
+
+    def finish(self):
+        """Süreç bittiğinde çağrılır: zombiyi topla ve bitiş zamanını kaydet"""
+        self.process.poll()
+        if self.ended_at is None and self.process.returncode is not None:
+            self.ended_at = time.time()
+
+
+def find_orphan_browsers(grace: float = REAPER_GRACE) -> list:
+    """
+    Sahibi ölmüş Playwright/Chromium süreçleri
+
+    Kök browser süreci normalde Node sürücüsünün, sürücü de Python sürecinin
+    çocuğudur. Ebeveyni init (PID 1) olan veya ebeveyni artık yaşamayan bir
+    browser süreci sahipsiz kalmıştır. Aynı kullanıcının, REAPER_GRACE'ten
+    eski süreçleri dikkate alınır; cron veya shard modunda çalışan sağlıklı
+    izleyicilere dokunulmaz.
+    """
+    if not PSUTIL_AVAILABLE:
+        return []
+
+    try:
+        username = psutil.Process().username()
+    except psutil.Error:
+        return []
+
+    now = time.time()
+    orphans = []
+    for proc in psutil.process_iter(['pid', 'ppid', 'cmdline', 'create_time', 'username', 'status']):
+        info = proc.info
+        try:
+            if info['username'] != username or info['status'] == psutil.STATUS_ZOMBIE:
+                continue
+            if now - (info['create_time'] or now) < grace:
+                continue
+            cmdline = ' '.join(info['cmdline'] or [])
+            if not any(marker in cmdline for marker in BROWSER_PROCESS_MARKERS):
+                continue
+            ppid = info['ppid']
+            if ppid == 1 or not psutil.pid_exists(ppid):
+                orphans.append(proc)
+        except psutil.Error:
+            continue
+    return orphans
+
+
+def reap_orphan_browsers(grace: float = REAPER_GRACE) -> int:
+    """Sahipsiz browser süreçlerini alt süreçleriyle birlikte öldür"""
+    killed = 0
+    for root in find_orphan_browsers(grace):
+        try:
+            victims = root.children(recursive=True) + [root]
+        except psutil.Error:
+            continue
+        for proc in victims:
+            try:
+                proc.kill()
+                killed += 1
+            except psutil.Error:
+                pass
+    if killed:
+        print(f"[WARNING] {killed} yetim browser süreci temizlendi")
+    return killed
+
+
+class JobReaper(threading.Thread):
+    """
+    Arka plan bakım thread'i
+
+    Her JOB_SAMPLE_INTERVAL saniyede canlı işlerin kaynak kullanımını örnekler,
+    her REAPER_INTERVAL saniyede yetim browser süreçlerini temizler.
+    """
+
+    def __init__(self, jobs: Callable[[], Iterable[WatchJob]]):
+        super().__init__(name='job-reaper', daemon=True)
+        self._jobs = jobs
+        self._stop_event = threading.Event()
+
+    def run(self):
+        last_reap = 0.0
+        while not self._stop_event.wait(JOB_SAMPLE_INTERVAL):
+            for job in list(self._jobs()):
+                if job.running:
+                    job.sample()
+                else:
+                    job.finish()
+            if time.monotonic() - last_reap >= REAPER_INTERVAL:
+                last_reap = time.monotonic()
+                try:
+                    reap_orphan_browsers()
+                except Exception as e:
+                    print(f"[WARNING] Yetim süreç temizliği başarısız: {e}")
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,154 @@
+"""
+TCDD İzleyici - Çökmeye Dayanıklı İzleme Günlüğü
+
+İzleme tanımları yalnızca api_server'ın belleğinde ve izleyici alt
+süreçlerinde duruyordu; sunucu yeniden başlatıldığında (deploy, çökme) tüm
+izlemeler düşüyor ve istemcilerin yeniden POST etmesi gerekiyordu.
+
+GÜNLÜK (JOURNAL_FILE):
+    Satır başına bir JSON kaydı, yalnızca sona eklenir:
+        {"op": "start", "user": "7", "params": {...}, "interval": 1.5, "t": ...}
+        {"op": "state", "user": "7", "status": {"check_count": 12, ...}, "t": ...}
+        {"op": "stop",  "user": "7", "t": ...}
+    start/stop kayıtları fsync ile diske yazılır; state kayıtları yalnızca
+    flush edilir (süreç çökmesinde korunur, güç kesintisinde son durum
+    birkaç kontrol geride kalabilir). Yarım yazılmış son satır okumada
+    atlanır.
+
+AÇILIŞ:
+    Günlük tek geçişte kullanıcı başına son duruma indirgenir ve canlı
+    kayıtlar yeni bir dosyaya sıkıştırılır (atomik değiştirme). Dosya
+    çalışırken JOURNAL_COMPACT_BYTES'ı aşarsa yine sıkıştırılır.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+
+# Konfigürasyon
+JOURNAL_FILE = os.getenv("JOURNAL_FILE", "watch_journal.jsonl")      # boş = kapalı
+JOURNAL_COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", str(1024 * 1024)))
+
+# Günlüğe alınan durum alanları (loglar ve süreç bilgisi hariç)
+JOURNALED_STATUS = ('ticket_found', 'wagon_not_found', 'message', 'check_count', 'last_check_time')
+
+
+class WatchJournal:
+    """Kullanıcı başına izleme tanımı ve son gözlenen durumu tutan ekleme günlüğü"""
+
+    def __init__(self, path: str = JOURNAL_FILE, compact_bytes: int = JOURNAL_COMPACT_BYTES):
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self._live: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def replay(self) -> List[Dict]:
+        """
+        Günlüğü oku, canlı izlemelere indirge ve dosyayı sıkıştır
+
+        Returns:
+            List[Dict]: user, params, interval, status, started_at alanlı kayıtlar
+                        (en eski başlatılan önce)
+        """
+        if not self.path:
+            return []
+        live: Dict[str, Dict] = {}
+        skipped = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        skipped += 1  # Çökme sırasında yarım kalmış satır
+                        continue
+                    self._apply(live, record)
+        except FileNotFoundError:
+            pass
+        if skipped:
+            print(f"[WARNING] Günlükte {skipped} okunamayan satır atlandı")
+
+        with self._lock:
+            self._live = live
+            self._compact()
+        return sorted(live.values(), key=lambda entry: entry['started_at'])
+
+    @staticmethod
+    def _apply(live: Dict[str, Dict], record: Dict):
+        user = str(record.get('user'))
+        op = record.get('op')
+        if op == 'start':
+            live[user] = {'user': user, 'params': record['params'], 'interval': record['interval'],
+                          'status': record.get('status', {}), 'started_at': record.get('t', 0.0)}
+        elif op == 'state' and user in live:
+            live[user]['status'] = record['status']
+        elif op == 'stop':
+            live.pop(user, None)
+
+    def _records(self):
+        for entry in self._live.values():
+            yield {'op': 'start', 'user': entry['user'], 'params': entry['params'],
+                   'interval': entry['interval'], 'status': entry['status'], 't': entry['started_at']}
+
+    def _compact(self):
+        """Canlı kayıtları yeni dosyaya yaz ve eskisiyle atomik olarak değiştir (kilit altında)"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in self._records():
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _append(self, record: Dict, durable: bool):
+        if not self.path:
+            return
+        record['t'] = time.time()
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._apply(self._live, record)
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                self._file.write(line)
+                self._file.flush()
+                if durable:
+                    os.fsync(self._file.fileno())
+                if self._file.tell() > self.compact_bytes:
+                    self._compact()
+            except OSError as e:
+                print(f"[WARNING] İzleme günlüğüne yazılamadı: {e}")
+
+    def start(self, user: str, params: Dict, interval: float):
+        """İzleme tanımı (aynı kullanıcının önceki tanımının yerine geçer)"""
+        self._append({'op': 'start', 'user': str(user), 'params': params, 'interval': interval}, durable=True)
+
+    def state(self, user: str, status: Dict):
+        """Son gözlenen durum"""
+        if str(user) not in self._live:
+            return
+        snapshot = {key: status[key] for key in JOURNALED_STATUS if key in status}
+        if snapshot == self._live[str(user)]['status']:
+            return
+        self._append({'op': 'state', 'user': str(user), 'status': snapshot}, durable=False)
+
+    def stop(self, user: str):
+        """İzleme bitti veya durduruldu; açılışta yeniden başlatılmaz"""
+        if str(user) in self._live:
+            self._append({'op': 'stop', 'user': str(user)}, durable=True)
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,177 @@
+"""
+TCDD İzleyici - Seviyeli Log Katmanı
+
+İzleyicinin her satırı PIPE üzerinden api_server'a geçiyor, orada tekrar
+yazdırılıyor ve listelere kopyalanıyordu; her kontrolde tekrarlanan "bilet
+DOLU durumunda" satırları çok sayıda izlemede log deposunu dolduruyordu.
+
+İzleyici tarafı (LeveledStream):
+    print() çıktısı satır satır süzülür. Satırın seviyesi önekinden
+    ([DEBUG], [INFO], [SUCCESS], [WARNING], [ERROR]) okunur; LOG_LEVEL
+    altındaki ve boş satırlar atılır. Aynı INFO/DEBUG satırı tekrar
+    ettiğinde yalnızca ilk gelişi ve her LOG_SAMPLE_EVERY'inci tekrarı
+    yazılır (uyarılar, hatalar ve öneksiz başlık satırları örneklenmez).
+
+API tarafı (JobLog):
+    İş başına LOG_BUFFER_LINES satırlık halka tampon. Her kayıt sıra
+    numarası, zaman ve seviye taşır; /api/logs sıra numarasıyla sayfalanır.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+
+# Konfigürasyon
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "20"))   # 0/1 = örnekleme yok
+LOG_BUFFER_LINES = int(os.getenv("LOG_BUFFER_LINES", "1000"))
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'SUCCESS': 25, 'WARNING': 30, 'ERROR': 40}
+MAX_TRACKED_LINES = 512   # Örnekleyicinin hatırladığı farklı satır sayısı
+
+
+def parse_level(line: str) -> str:
+    """Satırın seviyesi; öneki olmayan satırlar INFO sayılır"""
+    start = line.find('[')
+    if 0 <= start <= 4:  # "⚠️  [WARNING]" gibi emoji önekleri
+        name = line[start + 1:line.find(']', start)]
+        if name in LEVELS:
+            return name
+    return 'INFO'
+
+
+class LineSampler:
+    """Tekrarlayan satırlar: ilk geliş ve her N'inci tekrar geçer"""
+
+    def __init__(self, every: int = LOG_SAMPLE_EVERY):
+        self.every = every
+        self._seen: Dict[str, int] = {}
+
+    def __call__(self, line: str) -> Optional[int]:
+        """
+        Returns:
+            Optional[int]: Satır geçiyorsa toplam görülme sayısı, atlanıyorsa None
+        """
+        count = self._seen.get(line, 0) + 1
+        if count == 1 and len(self._seen) >= MAX_TRACKED_LINES:
+            self._seen.clear()
+        self._seen[line] = count
+        if self.every <= 1 or count == 1 or count % self.every == 0:
+            return count
+        return None
+
+
+class LeveledStream:
+    """print() çıktısını seviyeye göre süzen ve örnekleyen stdout sarmalayıcısı"""
+
+    def __init__(self, stream, level: str = LOG_LEVEL, sample_every: int = LOG_SAMPLE_EVERY):
+        self._stream = stream
+        self._threshold = LEVELS.get(level.upper(), LEVELS['INFO'])
+        self._sampler = LineSampler(sample_every)
+        self._pending = ''
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            lines = (self._pending + text).split('\n')
+            self._pending = lines.pop()  # Yarım satır bir sonraki yazımı bekler
+            for line in lines:
+                self._emit(line.rstrip())
+        return len(text)
+
+    def _emit(self, line: str):
+        stripped = line.lstrip()
+        if not stripped:
+            return
+        level = LEVELS[parse_level(stripped)]
+        if level < self._threshold:
+            return
+        # Öneksiz satırlar (başlık/çerçeve blokları) bütün kalsın diye örneklenmez
+        if level < LEVELS['WARNING'] and stripped.startswith('['):
+            count = self._sampler(stripped)
+            if count is None:
+                return
+            if count > 1:
+                line = f"{line} (tekrar: {count})"
+        self._stream.write(line + '\n')
+
+    def flush(self):
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def install_log_filter(level: str = LOG_LEVEL, sample_every: int = LOG_SAMPLE_EVERY):
+    """Süreç stdout'unu seviyeli/örneklenen akışla değiştir"""
+    if not isinstance(sys.stdout, LeveledStream):
+        sys.stdout = LeveledStream(sys.stdout, level, sample_every)
+
+
+class LogRecord(NamedTuple):
+    seq: int
+    time: float
+    level: str
+    message: str
+
+
+class JobLog:
+    """İş başına sınırlı halka tampon; eski kayıtlar otomatik düşer"""
+
+    def __init__(self, maxlen: int = LOG_BUFFER_LINES):
+        self._records = deque(maxlen=maxlen)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def append(self, line: str) -> LogRecord:
+        with self._lock:
+            self._seq += 1
+            record = LogRecord(self._seq, time.time(), parse_level(line), line)
+            self._records.append(record)
+        return record
+
+    def tail(self, count: int) -> List[str]:
+        """Son satırlar (yalnızca mesaj metni)"""
+        with self._lock:
+            start = max(0, len(self._records) - count)
+            return [self._records[i].message for i in range(start, len(self._records))]
+
+    def page(self, after: Optional[int] = None, limit: int = 100, level: str = 'DEBUG') -> Dict:
+        """
+        Sıra numarasına göre sayfalanmış kayıtlar
+
+        Args:
+            after: Bu sıra numarasından sonraki kayıtlar (None = en son sayfa)
+            limit: Sayfa boyutu
+            level: En düşük seviye
+
+        Returns:
+            Dict: records, next_after (sonraki istekte after olarak verilir),
+                  first_seq/last_seq (tamponda kalan aralık), dropped (düşen kayıt sayısı)
+        """
+        threshold = LEVELS.get(level.upper(), LEVELS['DEBUG'])
+        with self._lock:
+            records = list(self._records)
+            last_seq = self._seq
+
+        if after is None:
+            matching = [r for r in records if LEVELS[r.level] >= threshold][-limit:]
+        else:
+            matching = []
+            for record in records:
+                if record.seq > after and LEVELS[record.level] >= threshold:
+                    matching.append(record)
+                    if len(matching) >= limit:
+                        break
+
+        return {
+            'records': [record._asdict() for record in matching],
+            'next_after': matching[-1].seq if matching else (last_seq if after is None else after),
+            'first_seq': records[0].seq if records else last_seq + 1,
+            'last_seq': last_seq,
+            'dropped': last_seq - len(records)
+        }